@@ -0,0 +1,163 @@
+"""EMI, repayment schedules and portfolio cash-flow projections.
+
+Loans are standard reducing-balance loans repaid in equal monthly instalments,
+the first falling due one month after disbursement. All arithmetic is done
+with NumPy over whole arrays: a schedule is one vector expression over its
+months, and a portfolio projection one matrix expression over loans x months.
+"""
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.utils import timezone
+
+from .models import Disbursement, LoanProduct
+
+# Loans per block in project_portfolio(); bounds the loans x months matrices.
+PROJECTION_BLOCK = 20000
+
+CENT = Decimal('0.01')
+
+
+def _money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def monthly_rate(annual_rate_percent):
+    return np.asarray(annual_rate_percent, dtype=float) / 1200.0
+
+
+def emi(principal, rate, months):
+    """Instalment for principal(s) at monthly ``rate``(s) over ``months``; broadcasts like NumPy."""
+    principal = np.asarray(principal, dtype=float)
+    rate = np.asarray(rate, dtype=float)
+    months = np.asarray(months, dtype=float)
+    growth = np.power(1.0 + rate, months)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amortizing = principal * rate * growth / (growth - 1.0)
+    return np.where(rate > 0, amortizing, principal / np.maximum(months, 1.0))
+
+
+def balance_after(principal, rate, instalment, paid):
+    """Outstanding balance after ``paid`` instalments (closed form, vectorized)."""
+    growth = np.power(1.0 + rate, paid)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amortizing = principal * growth - instalment * (growth - 1.0) / rate
+    return np.where(rate > 0, amortizing, principal - instalment * paid)
+
+
+def shift_month(day, months):
+    """First day of the month ``months`` after ``day``'s month."""
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def schedule(principal, annual_rate, months, start=None):
+    """Monthly rows of (instalment, due month, payment, principal, interest, balance)."""
+    principal, rate = float(principal), float(monthly_rate(annual_rate))
+    instalment = float(emi(principal, rate, months))
+    numbers = np.arange(1, months + 1)
+    opening = balance_after(principal, rate, instalment, numbers - 1)
+    interest = opening * rate
+    repaid = instalment - interest
+    # The last instalment clears whatever rounding left behind.
+    repaid[-1] = opening[-1]
+    closing = np.maximum(opening - repaid, 0.0)
+    payment = repaid + interest
+
+    first_due = shift_month(start or timezone.localdate(), 1)
+    return [
+        {
+            'number': int(n),
+            'due': shift_month(first_due, int(n) - 1),
+            'payment': _money(p),
+            'principal': _money(pr),
+            'interest': _money(i),
+            'balance': _money(b),
+        }
+        for n, p, pr, i, b in zip(numbers, payment, repaid, interest, closing)
+    ]
+
+
+def quote(amount, product, months=None, start=None):
+    """EMI, totals and schedule for borrowing ``amount`` on ``product``."""
+    months = int(months or product.tenure_months)
+    rows = schedule(amount, product.interest_rate, months, start=start)
+    amount = _money(amount)
+    total_interest = sum((row['interest'] for row in rows), Decimal('0'))
+    fee = _money(amount * product.processing_fee / 100)
+    return {
+        'amount': amount,
+        'tenure_months': months,
+        'interest_rate': product.interest_rate,
+        'emi': _money(emi(float(amount), float(monthly_rate(product.interest_rate)), months)),
+        'total_interest': total_interest,
+        'processing_fee': fee,
+        'total_payable': amount + total_interest + fee,
+        'schedule': rows,
+    }
+
+
+def project_loans(principal, annual_rate, tenure, elapsed, horizon):
+    """Scheduled (principal, interest) inflows per month for a book of loans.
+
+    ``elapsed[i]`` is how many months before the first projected month loan
+    ``i`` was disbursed; projected month ``j`` therefore collects instalment
+    ``elapsed + j`` of each loan, if that is between 1 and its tenure.
+    Returns (principal, interest, active loans) arrays of length ``horizon``.
+    """
+    principal = np.asarray(principal, dtype=float)
+    rate = monthly_rate(annual_rate)
+    tenure = np.asarray(tenure, dtype=float)
+    elapsed = np.asarray(elapsed, dtype=float)
+    instalment = emi(principal, rate, tenure)
+
+    repaid_total = np.zeros(horizon)
+    interest_total = np.zeros(horizon)
+    active_total = np.zeros(horizon, dtype=int)
+    for start in range(0, len(principal), PROJECTION_BLOCK):
+        block = slice(start, start + PROJECTION_BLOCK)
+        p, r, n, e = principal[block, None], rate[block, None], tenure[block, None], elapsed[block, None]
+        number = e + np.arange(horizon)[None, :]
+        due = (number >= 1) & (number <= n)
+        opening = balance_after(p, r, instalment[block, None], np.clip(number - 1, 0, n))
+        interest = opening * r
+        # Final instalment repays the remaining balance exactly.
+        repaid = np.where(number == n, opening, instalment[block, None] - interest)
+        repaid_total += np.where(due, repaid, 0.0).sum(axis=0)
+        interest_total += np.where(due, interest, 0.0).sum(axis=0)
+        active_total += due.sum(axis=0)
+    return repaid_total, interest_total, active_total
+
+
+def project_portfolio(months=12, start=None):
+    """Month-by-month scheduled collections across every Disbursement.
+
+    Rates and default tenures come from the loan's product; an application's
+    own tenure overrides the product default. Returns a list of dicts with
+    ``month``, ``principal``, ``interest``, ``total`` and ``active`` loans.
+    """
+    first = (start or timezone.localdate()).replace(day=1)
+    rows = Disbursement.objects.values_list(
+        'amount', 'date', 'product__interest_rate', 'product__tenure_months', 'application__tenure_months',
+    )
+    principal, rate, tenure, elapsed = [], [], [], []
+    current = first.year * 12 + first.month - 1
+    for amount, disbursed, product_rate, product_tenure, own_tenure in rows.iterator(chunk_size=5000):
+        disbursed = timezone.localdate(disbursed)
+        principal.append(amount)
+        rate.append(product_rate or 0)
+        tenure.append(own_tenure or product_tenure or LoanProduct.DEFAULT_TENURE_MONTHS)
+        elapsed.append(current - (disbursed.year * 12 + disbursed.month - 1))
+
+    repaid, interest, active = project_loans(principal, rate, tenure, elapsed, months)
+    return [
+        {
+            'month': shift_month(first, j),
+            'principal': _money(repaid[j]),
+            'interest': _money(interest[j]),
+            'total': _money(repaid[j] + interest[j]),
+            'active': int(active[j]),
+        }
+        for j in range(months)
+    ]
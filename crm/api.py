@@ -0,0 +1,232 @@
+"""Read-only JSON API.
+
+Every endpoint answers conditional GETs. List ETags are built from the
+version counters (crm.versions) of the tables a resource serializes,
+related names included, so a client presenting one gets a 304 without any
+query. Detail ETags and Last-Modified come from the row's ``updated_at``
+plus the same counters.
+"""
+import hashlib
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from . import versions
+from .listing import decode_cursor, encode_cursor, filter_applications, parse_int
+from .metrics import DASHBOARD_VERSION
+from .models import Disbursement, Employee, LoanApplication, LoanProduct
+from .reference import EMPLOYEES_VERSION, PRODUCTS_VERSION
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class Resource:
+    """An exposed model: public field name -> ORM path, plus list filters.
+
+    ``versions`` names the version counters bumped whenever a row this
+    resource serializes changes, including rows it only reads a name from.
+    """
+
+    def __init__(self, model, fields, versions, default_fields=None, filter=None):
+        self.model = model
+        self.fields = fields
+        self.versions = versions
+        self.default_fields = default_fields or list(fields)
+        self.filter = filter
+
+    def queryset(self, params):
+        queryset = self.model.objects.all()
+        if self.filter is not None:
+            queryset = self.filter(queryset, params)
+        return queryset
+
+
+def _filter_disbursements(queryset, params):
+    product = parse_int(params.get('product'))
+    if product is not None:
+        queryset = queryset.filter(product_id=product)
+    banker = parse_int(params.get('banker'))
+    if banker is not None:
+        queryset = queryset.filter(banker_id=banker)
+    return queryset
+
+
+RESOURCES = {
+    'applications': Resource(
+        LoanApplication,
+        {
+            'id': 'pk',
+            'name': 'name',
+            'phone': 'phone',
+            'email': 'email',
+            'loan_type_id': 'loan_type_id',
+            'loan_type': 'loan_type__name',
+            'employment_type': 'employment_type',
+            'amount': 'amount',
+            'status': 'status',
+            'document_status': 'document_status',
+            'assigned_to_id': 'assigned_to_id',
+            'assigned_to': 'assigned_to__name',
+            'notes': 'notes',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        # DASHBOARD_VERSION is bumped by every application and disbursement
+        # write, including imports and bulk transitions.
+        versions=(DASHBOARD_VERSION, PRODUCTS_VERSION, EMPLOYEES_VERSION),
+        default_fields=['id', 'name', 'loan_type', 'amount', 'status', 'document_status', 'assigned_to', 'updated_at'],
+        filter=filter_applications,
+    ),
+    'products': Resource(
+        LoanProduct,
+        {
+            'id': 'pk',
+            'name': 'name',
+            'interest_rate': 'interest_rate',
+            'processing_fee': 'processing_fee',
+            'min_amount': 'min_amount',
+            'max_amount': 'max_amount',
+            'eligibility_criteria': 'eligibility_criteria',
+            'description': 'description',
+            'updated_at': 'updated_at',
+        },
+        versions=(PRODUCTS_VERSION,),
+    ),
+    'employees': Resource(
+        Employee,
+        {
+            'id': 'pk',
+            'name': 'name',
+            'email': 'email',
+            'designation': 'designation',
+            'updated_at': 'updated_at',
+        },
+        versions=(EMPLOYEES_VERSION,),
+    ),
+    'disbursements': Resource(
+        Disbursement,
+        {
+            'id': 'pk',
+            'application_id': 'application_id',
+            'banker_id': 'banker_id',
+            'banker': 'banker__name',
+            'product_id': 'product_id',
+            'product': 'product__name',
+            'amount': 'amount',
+            'date': 'date',
+            'updated_at': 'updated_at',
+        },
+        versions=(DASHBOARD_VERSION, PRODUCTS_VERSION, EMPLOYEES_VERSION),
+        filter=_filter_disbursements,
+    ),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _selected_fields(resource, params):
+    """Resolve the ``fields`` parameter (sparse fieldset) to public names."""
+    requested = params.get('fields')
+    if not requested:
+        return resource.default_fields
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown:
+        raise BadRequest(f'Unknown field(s): {", ".join(unknown)}. Available: {", ".join(resource.fields)}.')
+    return names
+
+
+def _serialize(rows, names):
+    return [dict(zip(names, row)) for row in rows]
+
+
+def _data_versions(resource):
+    return [versions.get_version(name) for name in resource.versions]
+
+
+def _conditional(request, last_modified, tag_parts, build):
+    """Return 304 if the client's validators still match, else ``build()``."""
+    etag = '"%s"' % hashlib.sha1('|'.join(str(part) for part in tag_parts).encode()).hexdigest()
+    # HTTP dates have one-second resolution; the ETag catches sub-second edits.
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Always revalidate; the 304 path is cheap.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_safe
+def list_resource(request, name):
+    resource = RESOURCES[name]
+    params = request.GET
+    try:
+        names = _selected_fields(resource, params)
+    except BadRequest as e:
+        return _error(str(e))
+
+    queryset = resource.queryset(params)
+    since = params.get('updated_since')
+    if since:
+        try:
+            since_value = parse_datetime(since)
+        except ValueError:  # well formed but not a real date, e.g. month 13
+            since_value = None
+        if since_value is None:
+            return _error('updated_since must be an ISO 8601 datetime.')
+        queryset = queryset.filter(updated_at__gte=since_value)
+
+    limit = max(1, min(parse_int(params.get('limit')) or PAGE_SIZE, MAX_PAGE_SIZE))
+    cursor = decode_cursor(params.get('cursor') or '')
+    page = queryset
+    if cursor is not None:
+        page = page.filter(pk__lt=cursor[1])
+
+    def build():
+        paths = [resource.fields[field] for field in names]
+        rows = list(page.order_by('-pk').values_list('pk', *paths)[:limit + 1])
+        next_url = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            query = params.copy()
+            query['cursor'] = encode_cursor(None, rows[-1][0])
+            next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+        return JsonResponse({
+            'results': _serialize((row[1:] for row in rows), names),
+            'next': next_url,
+        })
+
+    return _conditional(request, None, [request.get_full_path(), *_data_versions(resource)], build)
+
+
+@require_safe
+def detail_resource(request, name, pk):
+    resource = RESOURCES[name]
+    try:
+        names = _selected_fields(resource, request.GET)
+    except BadRequest as e:
+        return _error(str(e))
+
+    paths = [resource.fields[field] for field in names]
+    row = resource.model.objects.filter(pk=pk).values_list('updated_at', *paths).first()
+    if row is None:
+        return _error(f'No {name} with id {pk}.', status=404)
+    updated_at = row[0]
+    return _conditional(
+        request, updated_at, [request.get_full_path(), updated_at, *_data_versions(resource)],
+        lambda: JsonResponse(dict(zip(names, row[1:]))),
+    )
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CrmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'crm'
+
+    def ready(self):
+        # Register signal receivers that live outside models.py
+        from . import blobs, events, instrumentation, metrics, reference, stats, trends  # noqa: F401
@@ -0,0 +1,105 @@
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Employee, EmployeeStats
+
+LEAST_LOADED = 'least_loaded'
+ROUND_ROBIN = 'round_robin'
+STRATEGIES = (LEAST_LOADED, ROUND_ROBIN)
+
+# Last banker handed a lead round-robin, so the rotation carries on across
+# requests and imports instead of restarting at the first banker.
+CURSOR_KEY = 'crm:assignment:cursor'
+
+
+class NoAssigneeAvailable(Exception):
+    pass
+
+
+class AssignmentScheduler:
+    """Hands out new leads to bankers, one ``assign()`` at a time.
+
+    Bankers are kept in a binary heap keyed by their open workload
+    (applications not yet Converted or Rejected) for ``least_loaded``, or by
+    rotation round for ``round_robin``. The heap is seeded with one grouped
+    query; after that each assignment is a heap pop and push, O(log n) in
+    the number of bankers. Only bankers whose designation is in
+    ``settings.ASSIGNMENT_DESIGNATIONS`` take leads, unless nobody has one.
+    """
+
+    def __init__(self, workloads, strategy=LEAST_LOADED, cursor=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f'Unknown assignment strategy "{strategy}".')
+        self.strategy = strategy
+        self.load = dict(workloads)
+        self.last = cursor
+        # Round-robin resumes after the cursor: bankers with a higher pk go
+        # first (round 0), the rest follow in round 1.
+        self.rounds = {pk: 0 if cursor is None or pk > cursor else 1 for pk in self.load}
+        self.heap = [self._entry(pk) for pk in self.load]
+        heapq.heapify(self.heap)
+
+    @classmethod
+    def load_from_db(cls, strategy=None, designations=None):
+        strategy = strategy or settings.ASSIGNMENT_STRATEGY
+        designations = settings.ASSIGNMENT_DESIGNATIONS if designations is None else designations
+        bankers = Employee.objects.annotate(
+            open_count=Count('applications', filter=Q(applications__status__in=EmployeeStats.OPEN_STATUSES)),
+        )
+        workloads, everyone = {}, {}
+        for row in bankers.values('pk', 'designation', 'open_count'):
+            everyone[row['pk']] = row['open_count']
+            if not designations or row['designation'] in designations:
+                workloads[row['pk']] = row['open_count']
+        cursor = cache.get(CURSOR_KEY) if strategy == ROUND_ROBIN else None
+        return cls(workloads or everyone, strategy, cursor)
+
+    def _entry(self, pk):
+        if self.strategy == ROUND_ROBIN:
+            return (self.rounds[pk], pk)
+        return (self.load[pk], pk)
+
+    def __len__(self):
+        return len(self.load)
+
+    def assign(self):
+        """Pick the next banker's pk and count the lead against them."""
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            pk = entry[1]
+            if entry != self._entry(pk):
+                continue  # superseded by a later push
+            self.load[pk] += 1
+            self.rounds[pk] += 1
+            heapq.heappush(self.heap, self._entry(pk))
+            self.last = pk
+            return pk
+        raise NoAssigneeAvailable('No banker is available to take new applications.')
+
+    def note(self, pk):
+        """Count a lead assigned to ``pk`` by other means (e.g. named in an import).
+
+        Only the workload goes up: under ``round_robin`` the banker keeps
+        their turn in the rotation.
+        """
+        if pk not in self.load:
+            return
+        self.load[pk] += 1
+        if self.strategy == LEAST_LOADED:
+            heapq.heappush(self.heap, self._entry(pk))
+
+    def remember(self):
+        """Persist the round-robin position for the next scheduler."""
+        if self.strategy == ROUND_ROBIN and self.last is not None:
+            cache.set(CURSOR_KEY, self.last, None)
+
+
+def assign_banker(strategy=None):
+    """Assign a single new application; returns the Employee pk."""
+    scheduler = AssignmentScheduler.load_from_db(strategy)
+    pk = scheduler.assign()
+    scheduler.remember()
+    return pk
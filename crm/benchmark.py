@@ -0,0 +1,176 @@
+"""Time every crm URL against whatever data is in the database.
+
+Requests go through the test client, so the whole middleware and template
+stack runs but nothing touches the network. Each URL is fetched ``warmup``
+times untimed (at least once), then ``repeat`` times timed; streamed bodies
+are consumed inside the timing, because that is where exports do their work.
+"""
+import math
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import instrumentation
+from . import urls as crm_urls
+from .models import ApplicationDocument, Disbursement, Employee, Job, LoanApplication, LoanProduct
+from .query_budget import QUERY_BUDGETS, count_queries
+
+# GETs with side effects are never run.
+SKIPPED = {
+    'employee_delete': 'deletes the employee on GET',
+    'setup_admin': 'creates the admin user on GET',
+}
+
+API_MODELS = {
+    'api_application_detail': LoanApplication,
+    'api_product_detail': LoanProduct,
+    'api_employee_detail': Employee,
+    'api_disbursement_detail': Disbursement,
+}
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def _detail_object(name):
+    if name in API_MODELS:
+        return API_MODELS[name].objects.order_by('pk').first()
+    if name.startswith('employee_'):
+        return Employee.objects.order_by('pk').first()
+    if name.startswith('application_'):
+        # One with documents, so the zip has something in it.
+        return (
+            LoanApplication.objects.filter(documents__isnull=False).order_by('-pk').first()
+            or LoanApplication.objects.order_by('-pk').first()
+        )
+    if name.startswith('job_'):
+        return Job.objects.exclude(result_file='').order_by('-pk').first() or Job.objects.order_by('-pk').first()
+    if name == 'document_download':
+        return ApplicationDocument.objects.order_by('-pk').first()
+    return None
+
+
+def _query_params():
+    """Query strings that make search, quote and bundle views do real work."""
+    params = {'document_bundle': {'created_from': (timezone.localdate() - timedelta(days=7)).isoformat()}}
+    application = LoanApplication.objects.order_by('-pk').first()
+    if application is not None:
+        surname = application.name.split()[-1]
+        params['application_search'] = params['application_autocomplete'] = {'q': surname}
+    product = LoanProduct.objects.order_by('pk').first()
+    if product is not None:
+        params['application_quote'] = {
+            'product': product.pk, 'amount': product.min_amount, 'employment_type': 'Salaried',
+        }
+    return params
+
+
+def targets(names=None):
+    """(url name, path, query params, skip reason) for every crm URL, in urls.py order."""
+    params = _query_params()
+    for pattern in crm_urls.urlpatterns:
+        name = pattern.name
+        if names and name not in names:
+            continue
+        if name in SKIPPED:
+            yield name, None, None, SKIPPED[name]
+            continue
+        kwargs = {}
+        if pattern.pattern.converters:
+            obj = _detail_object(name)
+            if obj is None:
+                yield name, None, None, 'no rows to request'
+                continue
+            kwargs = {'pk': obj.pk}
+        yield name, reverse(name, kwargs=kwargs), params.get(name, {}), None
+
+
+def _fetch(client, path, params):
+    started = time.perf_counter()
+    with count_queries() as counter:
+        response = client.get(path, params)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        response.close()
+    return response.status_code, counter.count, time.perf_counter() - started
+
+
+def run(names=None, repeat=20, warmup=2, cold=False, user=None):
+    """Benchmark the crm URLs; returns one result dict per URL.
+
+    ``cold`` clears the cache before every request, measuring the views as
+    they behave right after a write retires their cached data.
+    """
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    results = []
+    # Keep benchmark traffic out of the real /metrics totals.
+    with override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], METRICS_DIR=tempfile.mkdtemp(),
+    ):
+        for name, path, params, skip in targets(names):
+            if skip:
+                results.append({'name': name, 'skipped': skip})
+                continue
+            # The first request is both a warmup and a probe for POST-only views.
+            if _fetch(client, path, params)[0] == 405:
+                results.append({'name': name, 'skipped': 'GET not allowed'})
+                continue
+            for _ in range(warmup - 1):
+                _fetch(client, path, params)
+            samples, queries = [], 0
+            for _ in range(repeat):
+                if cold:
+                    cache.clear()
+                status, count, seconds = _fetch(client, path, params)
+                samples.append(seconds)
+                queries = max(queries, count)
+            results.append({
+                'name': name,
+                'url': path,
+                'status': status,
+                'queries': queries,
+                'budget': QUERY_BUDGETS.get(name),
+                'p50_ms': round(percentile(samples, 50) * 1000, 2),
+                'p95_ms': round(percentile(samples, 95) * 1000, 2),
+                'mean_ms': round(statistics.fmean(samples) * 1000, 2),
+                'max_ms': round(max(samples) * 1000, 2),
+            })
+        instrumentation.registry.reset()
+    return results
+
+
+def dataset_size():
+    return {
+        'applications': LoanApplication.objects.count(),
+        'disbursements': Disbursement.objects.count(),
+        'documents': ApplicationDocument.objects.count(),
+        'employees': Employee.objects.count(),
+        'products': LoanProduct.objects.count(),
+    }
+
+
+def compare(results, baseline):
+    """Attach p50/p95 changes (in percent) against a previous run's results."""
+    previous = {row['name']: row for row in baseline.get('results', []) if 'p50_ms' in row}
+    for row in results:
+        before = previous.get(row['name'])
+        if before is None or 'p50_ms' not in row:
+            continue
+        for field in ('p50_ms', 'p95_ms'):
+            if before[field]:
+                row[f'{field}_change'] = round((row[field] - before[field]) / before[field] * 100, 1)
+        row['queries_change'] = row['queries'] - before['queries']
+    return results
@@ -0,0 +1,132 @@
+import os
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ApplicationDocument, StoredBlob
+from .storage import BLOB_PREFIX, STAGING_DIR, document_storage
+
+# Orphans younger than this are kept, so an upload racing a collection that
+# re-uses a blob never finds it gone.
+DEFAULT_GRACE = timedelta(hours=24)
+
+
+def _size(storage, name):
+    try:
+        return storage.size(name)
+    except OSError:
+        return 0
+
+
+def retain(name, size=0):
+    """Add a reference to the blob stored under ``name``."""
+    if not name:
+        return
+    now = timezone.now()
+    if StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.create(name=name, size=size, ref_count=1)
+    except IntegrityError:
+        # Another upload of the same content created the row first.
+        StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1, updated_at=now)
+
+
+def release(name):
+    """Drop a reference; the blob is removed by ``collect_garbage`` once unreferenced."""
+    if name:
+        StoredBlob.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1, updated_at=timezone.now(),
+        )
+
+
+def recount_blobs():
+    """Recompute every ref_count from ApplicationDocument; returns the number of rows corrected."""
+    storage = document_storage()
+    actual = dict(
+        ApplicationDocument.objects.exclude(file='').values('file').annotate(n=Count('pk')).values_list('file', 'n')
+    )
+    fixed = 0
+    with transaction.atomic():
+        for blob in StoredBlob.objects.all():
+            expected = actual.pop(blob.name, 0)
+            if blob.ref_count != expected:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=expected, updated_at=timezone.now())
+                fixed += 1
+        StoredBlob.objects.bulk_create(
+            StoredBlob(name=name, size=_size(storage, name), ref_count=count) for name, count in actual.items()
+        )
+    return fixed + len(actual)
+
+
+def _older_than(path, cutoff):
+    try:
+        return os.path.getmtime(path) < cutoff.timestamp()
+    except OSError:
+        return False
+
+
+def collect_garbage(grace=DEFAULT_GRACE, dry_run=False):
+    """Delete blobs no document references any more.
+
+    Removes zero-reference blobs untouched for ``grace``, plus files under
+    ``blobs/`` with no StoredBlob row (left behind when a document row failed
+    to save after its upload was written) and stale staging files. Returns
+    ``{'removed': [...names], 'bytes': int}``.
+    """
+    storage = document_storage()
+    cutoff = timezone.now() - grace
+    removed, freed = [], 0
+
+    for blob in StoredBlob.objects.filter(ref_count=0, updated_at__lt=cutoff).iterator():
+        if not _older_than(storage.path(blob.name), cutoff) and storage.exists(blob.name):
+            continue  # re-uploaded since it was released
+        if not dry_run:
+            # Only delete the row if nothing retained it in the meantime.
+            if not StoredBlob.objects.filter(pk=blob.pk, ref_count=0).delete()[0]:
+                continue
+            storage.remove_blob(blob.name)
+        removed.append(blob.name)
+        freed += blob.size
+
+    root = storage.path(BLOB_PREFIX)
+    known = set(StoredBlob.objects.filter(name__startswith=f'{BLOB_PREFIX}/').values_list('name', flat=True))
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            staging = os.path.dirname(name) == f'{BLOB_PREFIX}/{STAGING_DIR}'
+            if (staging or name not in known) and _older_than(path, cutoff):
+                freed += os.path.getsize(path)
+                if not dry_run:
+                    storage.remove_blob(name)
+                removed.append(name)
+
+    return {'removed': removed, 'bytes': freed}
+
+
+# --- Signal receivers ---
+
+@receiver(post_save, sender=ApplicationDocument)
+def retain_document_blob(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        retain(instance.file.name, _size(instance.file.storage, instance.file.name))
+        return
+    if not instance.is_tracked:
+        return
+    old, new = instance.previous('file'), instance.file.name
+    if old != new:
+        retain(new, _size(instance.file.storage, new))
+        release(old)
+
+
+@receiver(post_delete, sender=ApplicationDocument)
+def release_document_blob(sender, instance, **kwargs):
+    release(instance.file.name)
@@ -0,0 +1,120 @@
+import os
+import zipfile
+from datetime import datetime, time
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.text import get_valid_filename
+
+from .listing import filter_applications
+from .models import ApplicationDocument, LoanApplication
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ZipStream:
+    """Write-only, unseekable sink for ZipFile.
+
+    Without seek()/tell() ZipFile writes each member's CRC and sizes in a
+    trailing data descriptor, so nothing already written needs patching and
+    the bytes can be handed to the client as soon as they are produced.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parse_date(value):
+    # Like the list filters, a date that does not exist (2024-02-30) is ignored.
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def bundle_applications(params):
+    """Applications matching the list filters plus an optional ``created_from``/``created_to`` date range."""
+    queryset = filter_applications(LoanApplication.objects.all(), params)
+    start, end = _parse_date(params.get('created_from')), _parse_date(params.get('created_to'))
+    if start:
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end:
+        queryset = queryset.filter(created_at__lte=timezone.make_aware(datetime.combine(end, time.max)))
+    return queryset
+
+
+def bundle_documents(applications):
+    return (
+        ApplicationDocument.objects.filter(application__in=applications)
+        .exclude(file='')
+        .select_related('application')
+        .order_by('application_id', 'pk')
+    )
+
+
+def _member_name(document, used):
+    application = document.application
+    folder = get_valid_filename(f'APP-{application.pk + 1000} {application.name}')
+    filename = get_valid_filename(f'{document.title} - {document.display_name}') or f'document-{document.pk}'
+    name = f'{folder}/{filename}'
+    stem, extension = os.path.splitext(name)
+    copy = 2
+    while name in used:
+        name = f'{stem} ({copy}){extension}'
+        copy += 1
+    used.add(name)
+    return name
+
+
+def zip_chunks(documents):
+    """Yield a ZIP archive of ``documents`` piece by piece.
+
+    Members are STORED: uploads are mostly PDFs and images that do not
+    compress further. Memory use is bounded by CHUNK_SIZE whatever the size
+    of the archive; documents whose file is missing on disk are skipped.
+    """
+    stream = ZipStream()
+    used = set()
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for document in documents.iterator(chunk_size=500):
+            storage, name = document.file.storage, document.file.name
+            try:
+                source = storage.open(name, 'rb')
+            except FileNotFoundError:
+                continue
+            with source:
+                info = zipfile.ZipInfo(
+                    _member_name(document, used),
+                    date_time=timezone.localtime(document.uploaded_at).timetuple()[:6],
+                )
+                info.compress_type = zipfile.ZIP_STORED
+                # Lets ZipFile decide on ZIP64 headers up front for huge files.
+                info.file_size = source.size
+                with archive.open(info, mode='w') as member:
+                    for chunk in source.chunks(CHUNK_SIZE):
+                        member.write(chunk)
+                        yield stream.drain()
+            # Data descriptor.
+            yield stream.drain()
+    # Central directory.
+    yield stream.drain()
+
+
+def streaming_zip_response(documents, filename):
+    response = StreamingHttpResponse(zip_chunks(documents), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'private, no-store'
+    return response
@@ -0,0 +1,131 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date
+
+from .storage import BLOB_PREFIX
+
+CHUNK_SIZE = 64 * 1024
+
+# Only single ranges are served; anything else gets the whole file (RFC 9110 allows that).
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def document_etag(name, stat):
+    """Content-addressed blobs are named after their SHA-256, which makes a strong ETag."""
+    digest = os.path.basename(name)
+    if name.startswith(f'{BLOB_PREFIX}/') and len(digest) == 64:
+        return f'"{digest}"'
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def parse_range(header, size):
+    """Return the inclusive ``(start, end)`` a Range header asks for.
+
+    None means the header is absent or unusable and the whole file should be
+    sent; ValueError means the range cannot be satisfied (416).
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if not length or not size:
+            raise ValueError('empty suffix range')
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError('range starts past the end of the file')
+    if end < start:
+        return None
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(name, path):
+    """Hand the transfer to the front-end server (X-Sendfile / X-Accel-Redirect)."""
+    header = settings.DOCUMENT_SENDFILE_HEADER
+    response = HttpResponse()
+    if header.lower() == 'x-accel-redirect':
+        # nginx maps an internal location onto MEDIA_ROOT.
+        response[header] = settings.DOCUMENT_SENDFILE_PREFIX.rstrip('/') + '/' + name
+    else:
+        response[header] = path
+    # Let the front-end server fill in the type from the file.
+    del response['Content-Type']
+    return response
+
+
+def serve_document(request, document, as_attachment=False):
+    """Serve ``document.file`` with range support and revalidation headers.
+
+    Whole-file responses use FileResponse, which WSGI servers with
+    ``wsgi.file_wrapper`` send with sendfile(); a ``DOCUMENT_SENDFILE_HEADER``
+    setting offloads the transfer to the web server instead.
+    """
+    name = document.file.name
+    if not name:
+        raise Http404('This document has no file.')
+    path = document.file.storage.path(name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('The stored file is missing.')
+
+    filename = document.display_name
+    etag = document_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, name, path, stat.st_size, etag, filename, as_attachment)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    # Documents are personal data: keep them out of shared caches and
+    # revalidate on every view (a 304 costs no file I/O).
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _file_response(request, name, path, size, etag, filename, as_attachment):
+    if settings.DOCUMENT_SENDFILE_HEADER:
+        return _sendfile_response(name, path)
+
+    if_range = request.headers.get('If-Range')
+    try:
+        byte_range = None if if_range and if_range != etag else parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if byte_range is None:
+        return FileResponse(
+            open(path, 'rb'), as_attachment=as_attachment, filename=filename, content_type=content_type,
+        )
+
+    start, end = byte_range
+    response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
@@ -0,0 +1,291 @@
+"""Eligibility rules for loan products.
+
+``LoanProduct.eligibility_criteria`` holds one rule per line; an application
+is eligible when every line holds. ``#`` starts a comment. For example::
+
+    # Salaried or self-employed borrowers only, up to seven years
+    employment_type in ("Salaried", "Self-employed")
+    tenure_months <= 84
+    amount >= 50000 or employment_type = "Salaried"
+
+Rules compare the application fields in FIELDS with numbers, quoted strings
+and the product's ``min_amount``, ``max_amount`` and ``default_tenure``, using
+``= != < <= > >=``, ``in (...)``, ``not in (...)``, ``between ... and ...``,
+``and``, ``or``, ``not`` and parentheses. ``amount between min_amount and
+max_amount`` is always checked first.
+
+Each line is translated into a Python expression over a fixed set of
+argument names and compiled into a function once; compiled rule sets are
+cached by their source text and product limits, so an unchanged product is
+never parsed twice.
+"""
+import ast
+import re
+from decimal import Decimal
+from functools import lru_cache
+
+from .models import LoanApplication
+
+# Application field -> value type.
+FIELDS = {
+    'amount': 'number',
+    'employment_type': 'text',
+    'tenure_months': 'number',
+}
+CONSTANTS = ('min_amount', 'max_amount', 'default_tenure')
+
+TEXT_CHOICES = {
+    'employment_type': {value for value, _ in LoanApplication.EMPLOYMENT_TYPE_CHOICES},
+}
+
+DEFAULT_RULE = 'amount between min_amount and max_amount'
+
+COMPARISONS = {'=': '==', '==': '==', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+KEYWORDS = {'and', 'or', 'not', 'in', 'between'}
+
+TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<number>\d+(?:\.\d+)?)
+      | (?P<string>"[^"]*"|'[^']*')
+      | (?P<op>[<>!=]=|[<>=])
+      | (?P<punct>[(),])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )''', re.VERBOSE)
+
+
+class RuleError(ValueError):
+    def __init__(self, message, line=None):
+        self.line = line
+        super().__init__(f'Line {line}: {message}' if line else message)
+
+
+def _tokenize(source):
+    tokens, position = [], 0
+    source = source.rstrip()
+    while position < len(source):
+        match = TOKEN_RE.match(source, position)
+        if not match:
+            raise RuleError(f'Unexpected "{source[position:].strip()[:20]}".')
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'name' and value.lower() in KEYWORDS:
+            kind, value = 'keyword', value.lower()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent translation of one rule line into a Python expression."""
+
+    def __init__(self, source, constants):
+        self.tokens = _tokenize(source)
+        self.position = 0
+        self.constants = constants
+
+    def peek(self, kind=None, value=None):
+        if self.position >= len(self.tokens):
+            return None
+        token = self.tokens[self.position]
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            return None
+        return token
+
+    def take(self, kind=None, value=None, expected=None):
+        token = self.peek(kind, value)
+        if token is None:
+            found = self.tokens[self.position][1] if self.position < len(self.tokens) else 'end of rule'
+            raise RuleError(f'Expected {expected or value or kind}, found "{found}".')
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise RuleError('Empty rule.')
+        expression = self.disjunction()
+        if self.position < len(self.tokens):
+            raise RuleError(f'Unexpected "{self.tokens[self.position][1]}".')
+        return expression
+
+    def disjunction(self):
+        parts = [self.conjunction()]
+        while self.peek('keyword', 'or'):
+            self.position += 1
+            parts.append(self.conjunction())
+        return parts[0] if len(parts) == 1 else '(' + ' or '.join(parts) + ')'
+
+    def conjunction(self):
+        parts = [self.negation()]
+        while self.peek('keyword', 'and'):
+            self.position += 1
+            parts.append(self.negation())
+        return parts[0] if len(parts) == 1 else '(' + ' and '.join(parts) + ')'
+
+    def negation(self):
+        if self.peek('keyword', 'not'):
+            self.position += 1
+            return f'(not {self.negation()})'
+        if self.peek('punct', '('):
+            self.position += 1
+            expression = self.disjunction()
+            self.take('punct', ')')
+            return expression
+        return self.comparison()
+
+    def operand(self):
+        """Return (python source, type, field name or None)."""
+        kind, value = self.take(expected='a field, number or string')
+        if kind == 'number':
+            return f"Decimal('{value}')", 'number', None
+        if kind == 'string':
+            return repr(value[1:-1]), 'text', None
+        if kind == 'name' and value in FIELDS:
+            return value, FIELDS[value], value
+        if kind == 'name' and value in self.constants:
+            return f"Decimal('{self.constants[value]}')", 'number', None
+        raise RuleError(f'Unknown name "{value}".')
+
+    def check(self, left, right):
+        (_, left_type, field), (text, right_type, _) = left, right
+        if left_type != right_type:
+            raise RuleError(f'Cannot compare {left_type} with {right_type}.')
+        choices = TEXT_CHOICES.get(field)
+        if choices and right_type == 'text' and ast.literal_eval(text) not in choices:
+            raise RuleError(f'{text} is not a valid {field.replace("_", " ")}.')
+
+    def values(self, left):
+        self.take('punct', '(')
+        items = [self.operand()]
+        while self.peek('punct', ','):
+            self.position += 1
+            items.append(self.operand())
+        self.take('punct', ')')
+        for item in items:
+            self.check(left, item)
+        return '(' + ', '.join(item[0] for item in items) + ',)'
+
+    def comparison(self):
+        left = self.operand()
+        if self.peek('op'):
+            op = self.take('op')[1]
+            right = self.operand()
+            self.check(left, right)
+            if left[1] == 'text' and op not in ('=', '==', '!='):
+                raise RuleError(f'Text can only be compared with = or !=, not {op}.')
+            return f'({left[0]} {COMPARISONS[op]} {right[0]})'
+        if self.peek('keyword', 'between'):
+            self.position += 1
+            low = self.operand()
+            self.take('keyword', 'and')
+            high = self.operand()
+            self.check(left, low)
+            self.check(left, high)
+            if left[1] != 'number':
+                raise RuleError('"between" needs numbers.')
+            return f'({low[0]} <= {left[0]} <= {high[0]})'
+        negated = False
+        if self.peek('keyword', 'not'):
+            self.position += 1
+            negated = True
+        if self.peek('keyword', 'in'):
+            self.position += 1
+            return f"({left[0]} {'not in' if negated else 'in'} {self.values(left)})"
+        raise RuleError(f'Expected a comparison after {left[0]}.')
+
+
+def parse_rules(text, constants=None):
+    """Translate ``text`` into [(line number, rule source, Python expression)].
+
+    Raises RuleError naming the first offending line.
+    """
+    constants = constants or dict.fromkeys(CONSTANTS, 0)
+    rules = []
+    for number, line in enumerate((text or '').splitlines(), start=1):
+        source = line.split('#', 1)[0].strip()
+        if not source:
+            continue
+        try:
+            rules.append((number, source, _Parser(source, constants).parse()))
+        except RuleError as e:
+            raise RuleError(str(e), line=number) from None
+    return rules
+
+
+class Rule:
+    def __init__(self, line, source, test):
+        self.line = line
+        self.source = source
+        self.test = test
+
+
+class RuleSet:
+    """The compiled rules of one product; ``error`` is set if its criteria did not parse."""
+
+    def __init__(self, rules, default_tenure, error=None):
+        self.rules = rules
+        self.default_tenure = default_tenure
+        self.error = error
+
+    def failures(self, amount, employment_type, tenure_months=None):
+        """Source of every rule the given values break; empty when eligible."""
+        tenure_months = tenure_months or self.default_tenure
+        return [rule.source for rule in self.rules if not rule.test(amount, employment_type, tenure_months)]
+
+    def is_eligible(self, amount, employment_type, tenure_months=None):
+        return not self.failures(amount, employment_type, tenure_months)
+
+
+def _compile(expression):
+    namespace = {'Decimal': Decimal, '__builtins__': {}}
+    return eval(f'lambda {", ".join(FIELDS)}: {expression}', namespace)
+
+
+@lru_cache(maxsize=512)
+def compile_rules(text, min_amount, max_amount, default_tenure):
+    """Compile a product's criteria; cached on everything that determines the result."""
+    constants = {'min_amount': min_amount, 'max_amount': max_amount, 'default_tenure': default_tenure}
+    rules = [Rule(0, DEFAULT_RULE, _compile(parse_rules(DEFAULT_RULE, constants)[0][2]))]
+    try:
+        parsed = parse_rules(text, constants)
+    except RuleError as e:
+        # Criteria saved before rules were validated; only the range applies.
+        return RuleSet(rules, default_tenure, error=str(e))
+    rules.extend(Rule(line, source, _compile(expression)) for line, source, expression in parsed)
+    return RuleSet(rules, default_tenure)
+
+
+def product_rules(product):
+    return compile_rules(
+        product.eligibility_criteria or '', Decimal(product.min_amount), Decimal(product.max_amount),
+        product.tenure_months,
+    )
+
+
+def check_application(application, product=None):
+    """Rules ``application`` breaks for ``product`` (default: its own loan type)."""
+    product = product or application.loan_type
+    if product is None or application.amount is None:
+        return []
+    return product_rules(product).failures(
+        Decimal(application.amount), application.employment_type, application.tenure_months,
+    )
+
+
+def evaluate_batch(applications, products):
+    """Check every application against every product in a single pass.
+
+    Yields ``(application, eligible product ids, failures)`` where ``failures``
+    lists the rules broken for the application's own loan type, if it has one.
+    ``products`` is evaluated once; order it by preference.
+    """
+    compiled = [(product.pk, product_rules(product)) for product in products]
+    for application in applications:
+        values = (Decimal(application.amount), application.employment_type, application.tenure_months)
+        eligible, failures = [], []
+        for product_id, rules in compiled:
+            broken = rules.failures(*values)
+            if not broken:
+                eligible.append(product_id)
+            if product_id == application.loan_type_id:
+                failures = broken
+        yield application, eligible, failures
@@ -0,0 +1,135 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ApplicationStatusEvent, FunnelStageStat, LoanApplication, WeeklyFunnelStat
+
+# (event kind, LoanApplication field, field holding when its value was entered)
+TRACKED_FIELDS = (
+    ('status', 'status', 'status_changed_at'),
+    ('document', 'document_status', 'document_status_changed_at'),
+)
+
+
+class Transition:
+    """A value change about to be logged; ``since`` is when ``from_value`` was entered."""
+
+    def __init__(self, application_id, kind, from_value, to_value, at, since=None):
+        self.application_id = application_id
+        self.kind = kind
+        self.from_value = from_value or ''
+        self.to_value = to_value
+        self.at = at
+        self.since = since
+
+
+def week_start(moment):
+    day = timezone.localdate(moment)
+    return day - timedelta(days=day.weekday())
+
+
+def _increment(model, lookup, deltas):
+    """Add ``deltas`` to the aggregate row matching ``lookup``, creating it on first use."""
+    changes = {field: F(field) + value for field, value in deltas.items() if value}
+    if not changes or model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another writer created the row first.
+        model.objects.filter(**lookup).update(**changes)
+
+
+def record_transitions(transitions):
+    """Append events for ``transitions`` and fold them into the aggregates.
+
+    Aggregates are updated per distinct stage/week touched, so a batch costs
+    O(stages) queries regardless of how many applications it covers.
+    """
+    transitions = list(transitions)
+    if not transitions:
+        return
+    with transaction.atomic():
+        ApplicationStatusEvent.objects.bulk_create(
+            ApplicationStatusEvent(
+                application_id=t.application_id, kind=t.kind,
+                from_value=t.from_value, to_value=t.to_value, at=t.at,
+            )
+            for t in transitions
+        )
+
+        stages = defaultdict(Counter)
+        weeks = Counter()
+        for t in transitions:
+            stages[(t.kind, t.to_value)]['entered'] += 1
+            weeks[(week_start(t.at), t.kind, t.to_value)] += 1
+            if t.from_value:
+                stages[(t.kind, t.from_value)]['exited'] += 1
+                if t.since is not None:
+                    stages[(t.kind, t.from_value)]['seconds_in_stage'] += max(0, int((t.at - t.since).total_seconds()))
+
+        for (kind, stage), deltas in stages.items():
+            _increment(FunnelStageStat, {'kind': kind, 'stage': stage}, dict(deltas))
+        for (week, kind, stage), entered in weeks.items():
+            _increment(WeeklyFunnelStat, {'week': week, 'kind': kind, 'stage': stage}, {'entered': entered})
+
+
+def creation_transitions(application):
+    """Transitions for a newly inserted application (e.g. after bulk_create)."""
+    return [
+        Transition(application.pk, kind, '', getattr(application, field), getattr(application, stamp))
+        for kind, field, stamp in TRACKED_FIELDS
+    ]
+
+
+def funnel_summary(kind='status'):
+    """Per-stage totals in pipeline order, read from FunnelStageStat."""
+    choices = LoanApplication.STATUS_CHOICES if kind == 'status' else LoanApplication.DOCUMENT_STATUS_CHOICES
+    stats = {row.stage: row for row in FunnelStageStat.objects.filter(kind=kind)}
+    return [stats.get(stage) or FunnelStageStat(kind=kind, stage=stage) for stage, _ in choices]
+
+
+def weekly_conversion(weeks=12, today=None):
+    """[(week, new entries, conversions, conversion %)] for the last ``weeks`` weeks."""
+    current = week_start(timezone.now()) if today is None else today - timedelta(days=today.weekday())
+    first = current - timedelta(weeks=weeks - 1)
+    counts = defaultdict(Counter)
+    for week, stage, entered in WeeklyFunnelStat.objects.filter(
+        kind='status', week__gte=first, stage__in=['New', 'Converted'],
+    ).values_list('week', 'stage', 'entered'):
+        counts[week][stage] = entered
+    rows = []
+    for i in range(weeks):
+        week = first + timedelta(weeks=i)
+        created, converted = counts[week]['New'], counts[week]['Converted']
+        rows.append((week, created, converted, round(converted * 100 / created, 1) if created else None))
+    return rows
+
+
+# --- Signal receivers ---
+
+@receiver(post_save, sender=LoanApplication)
+def log_status_transitions(sender, instance, created, raw=False, **kwargs):
+    # Runs inside LoanApplication.save()'s transaction, before the change
+    # tracker forgets the previous values.
+    if raw:
+        return
+    if created:
+        record_transitions(creation_transitions(instance))
+        return
+    if not instance.is_tracked:
+        return  # previous values unknown
+    transitions = []
+    for kind, field, stamp in TRACKED_FIELDS:
+        old, new = instance.previous(field), getattr(instance, field)
+        if old != new:
+            transitions.append(Transition(
+                instance.pk, kind, old, new, getattr(instance, stamp), since=instance.previous(stamp),
+            ))
+    record_transitions(transitions)
@@ -0,0 +1,105 @@
+import csv
+
+from django.db.models import F
+from django.http import StreamingHttpResponse
+
+from .listing import parse_int, filter_applications
+from .models import Disbursement, Employee, EmployeeStats, LoanApplication
+
+CHUNK_SIZE = 2000
+
+# (CSV header, ORM path)
+APPLICATION_COLUMNS = [
+    ('ID', 'pk'),
+    ('Applicant Name', 'name'),
+    ('Phone', 'phone'),
+    ('Email', 'email'),
+    ('Loan Type', 'loan_type__name'),
+    ('Employment Type', 'employment_type'),
+    ('Amount', 'amount'),
+    ('Status', 'status'),
+    ('Document Status', 'document_status'),
+    ('Assigned Banker', 'assigned_to__name'),
+    ('Created At', 'created_at'),
+]
+
+
+def application_queryset(params):
+    return filter_applications(LoanApplication.objects.all(), params).order_by('-created_at', '-pk')
+
+
+def application_rows(params):
+    """Yield the header and then one tuple per application matching ``params``."""
+    yield [header for header, _ in APPLICATION_COLUMNS]
+    paths = [path for _, path in APPLICATION_COLUMNS]
+    yield from application_queryset(params).values_list(*paths).iterator(chunk_size=CHUNK_SIZE)
+
+
+DISBURSEMENT_COLUMNS = [
+    ('ID', 'pk'),
+    ('Application ID', 'application_id'),
+    ('Applicant Name', 'application__name'),
+    ('Product', 'product__name'),
+    ('Banker', 'banker__name'),
+    ('Amount', 'amount'),
+    ('Disbursed At', 'date'),
+]
+
+
+def disbursement_queryset(params):
+    """Disbursements narrowed by the same product/banker parameters as the application list."""
+    queryset = Disbursement.objects.all()
+    product = parse_int(params.get('product'))
+    if product is not None:
+        queryset = queryset.filter(product_id=product)
+    banker = parse_int(params.get('banker'))
+    if banker is not None:
+        queryset = queryset.filter(banker_id=banker)
+    return queryset.order_by('-date', '-pk')
+
+
+def disbursement_rows(params):
+    yield [header for header, _ in DISBURSEMENT_COLUMNS]
+    paths = [path for _, path in DISBURSEMENT_COLUMNS]
+    yield from disbursement_queryset(params).values_list(*paths).iterator(chunk_size=CHUNK_SIZE)
+
+
+def employee_report_rows():
+    """The performance report, one row per banker, read from EmployeeStats."""
+    yield [
+        'Employee ID', 'Name', 'Email', 'Designation', 'Loans Disbursed', 'Total Disbursed',
+        'Open Applications', 'Total Applications', 'Conversion %',
+    ]
+    status_paths = [f'stats__{field}' for field in EmployeeStats.STATUS_FIELDS.values()]
+    open_positions = [
+        i for i, status in enumerate(EmployeeStats.STATUS_FIELDS) if status in EmployeeStats.OPEN_STATUSES
+    ]
+    converted_position = list(EmployeeStats.STATUS_FIELDS).index('Converted')
+    employees = Employee.objects.order_by(F('stats__disbursed_total').desc(nulls_last=True), 'name').values_list(
+        'pk', 'name', 'email', 'designation', 'stats__deals_closed', 'stats__disbursed_total', *status_paths,
+    )
+    for row in employees.iterator(chunk_size=CHUNK_SIZE):
+        counts = [count or 0 for count in row[6:]]
+        total = sum(counts)
+        yield [
+            *row[:4], row[4] or 0, row[5] or 0,
+            sum(counts[i] for i in open_positions), total,
+            round(counts[converted_position] * 100 / total, 1) if total else 0,
+        ]
+
+
+class Echo:
+    """File-like object whose write() hands the line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def streaming_csv_response(rows, filename):
+    """Stream ``rows`` as a CSV download, encoding one row at a time."""
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows), content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,6 +1,19 @@
 from django import forms
+from . import reference
+from .assignment import assign_banker
+from .eligibility import RuleError, check_application, parse_rules
 from .models import LoanProduct, LoanApplication, ApplicationDocument, Employee
 
+def use_cached_choices(field, choices):
+    """Render a ModelChoiceField from cached (pk, label) pairs.
+
+    Only rendering uses the cache; the submitted value is still validated
+    against the field's queryset.
+    """
+    if field.empty_label is not None:
+        choices = [('', field.empty_label)] + choices
+    field.choices = choices
+
 class EmployeeForm(forms.ModelForm):
     class Meta:
         model = Employee
@@ -9,20 +22,95 @@ class EmployeeForm(forms.ModelForm):
 class LoanProductForm(forms.ModelForm):
     class Meta:
         model = LoanProduct
-        fields = ['name', 'interest_rate', 'processing_fee', 'min_amount', 'max_amount', 'eligibility_criteria', 'description']
+        fields = ['name', 'interest_rate', 'processing_fee', 'tenure_months', 'min_amount', 'max_amount', 'eligibility_criteria', 'description']
+
+    def clean_eligibility_criteria(self):
+        criteria = self.cleaned_data['eligibility_criteria']
+        try:
+            parse_rules(criteria)
+        except RuleError as e:
+            raise forms.ValidationError(str(e))
+        return criteria
 
 class LoanApplicationForm(forms.ModelForm):
     class Meta:
         model = LoanApplication
-        fields = ['name', 'phone', 'email', 'loan_type', 'employment_type', 'amount', 'assigned_to', 'status', 'document_status', 'notes']
+        fields = ['name', 'phone', 'email', 'loan_type', 'employment_type', 'amount', 'tenure_months', 'assigned_to', 'status', 'document_status', 'notes']
         widgets = {
             'notes': forms.Textarea(attrs={'rows': 3}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.instance.pk:
+            self.fields['assigned_to'].empty_label = 'Assign automatically'
+        use_cached_choices(self.fields['loan_type'], reference.product_choices())
+        use_cached_choices(self.fields['assigned_to'], reference.employee_choices())
+        # Rules of its loan type the application breaks. Shown as a warning,
+        # never an error: ineligible applications can still be saved (e.g. to
+        # reject them). clean() re-checks the submitted values.
+        self.eligibility_product = None
+        self.eligibility_failures = []
+        if self.instance.pk and self.instance.amount is not None:
+            self._check_eligibility(reference.product(self.instance.loan_type_id), self.instance)
+
+    def _check_eligibility(self, product, application):
+        self.eligibility_product = product
+        self.eligibility_failures = check_application(application, product) if product else []
+
+    @property
+    def eligibility_warning(self):
+        if not self.eligibility_failures:
+            return ''
+        return f'Not eligible for {self.eligibility_product.name}: ' + '; '.join(self.eligibility_failures)
+
+    def clean_assigned_to(self):
+        banker = self.cleaned_data.get('assigned_to')
+        if banker is None and self.instance.pk:
+            raise forms.ValidationError('Choose a banker.')
+        if banker is None and not reference.employees():
+            raise forms.ValidationError('Add a banker before creating applications.')
+        return banker
+
+    def clean(self):
+        cleaned_data = super().clean()
+        product = cleaned_data.get('loan_type')
+        if product is None or cleaned_data.get('amount') is None:
+            self._check_eligibility(None, None)
+            return cleaned_data
+        # construct_instance() has not run yet; check the submitted values.
+        candidate = LoanApplication(
+            amount=cleaned_data['amount'],
+            employment_type=cleaned_data.get('employment_type'),
+            tenure_months=cleaned_data.get('tenure_months'),
+        )
+        self._check_eligibility(product, candidate)
+        return cleaned_data
+
+    def save(self, commit=True):
+        if self.instance.assigned_to_id is None:
+            # Only once the form is valid, so rejected submissions never
+            # advance the round-robin.
+            self.instance.assigned_to_id = assign_banker()
+        return super().save(commit)
+
 class ApplicationDocumentForm(forms.ModelForm):
     class Meta:
         model = ApplicationDocument
         fields = ['application', 'title', 'file', 'status']
+        # There can be far too many applications for a <select>; the page
+        # picks one through the application_autocomplete endpoint instead.
+        widgets = {
+            'application': forms.HiddenInput,
+        }
+
+    def application_label(self):
+        """Label for the currently chosen application, if any."""
+        pk = str(self['application'].value() or '')
+        if not pk.isdigit():
+            return ''
+        application = LoanApplication.objects.select_related('loan_type').filter(pk=pk).first()
+        return str(application) if application else ''
 
 class CSVUploadForm(forms.Form):
     csv_file = forms.FileField()
@@ -0,0 +1,223 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.utils import timezone
+
+from .assignment import AssignmentScheduler, NoAssigneeAvailable
+from .eligibility import evaluate_batch
+from .events import creation_transitions, record_transitions
+from .metrics import invalidate_dashboard
+from .models import Employee, LoanApplication, LoanProduct
+from .stats import record_applications
+from .writes import batch_write
+
+BATCH_SIZE = 1000
+
+# Only the first errors are kept in the report; the rest are just counted.
+MAX_REPORTED_ERRORS = 200
+
+MAX_AMOUNT = Decimal('9999999999.99')
+
+EMPLOYMENT_TYPES = {value.lower(): value for value, _ in LoanApplication.EMPLOYMENT_TYPE_CHOICES}
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+        self.suggested = 0
+        self.flagged = 0
+        self.warnings = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'message': message})
+
+    def add_warning(self, line, message):
+        """An imported row that needs a second look (e.g. not eligible for its loan type)."""
+        self.flagged += 1
+        if len(self.warnings) < MAX_REPORTED_ERRORS:
+            self.warnings.append({'line': line, 'message': message})
+
+    @property
+    def truncated_errors(self):
+        return self.error_count - len(self.errors)
+
+    @classmethod
+    def from_dict(cls, data):
+        report = cls()
+        report.rows = data.get('rows', 0)
+        report.imported = data.get('imported', 0)
+        report.error_count = data.get('error_count', 0)
+        report.errors = list(data.get('errors', []))
+        report.suggested = data.get('suggested', 0)
+        report.flagged = data.get('flagged', 0)
+        report.warnings = list(data.get('warnings', []))
+        return report
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'suggested': self.suggested,
+            'flagged': self.flagged,
+            'warnings': self.warnings,
+        }
+
+
+def _clean_row(row, employees, scheduler, products):
+    """Validate one CSV row and return an unsaved LoanApplication."""
+    name = (row.get('name') or '').strip() or 'Untitled Application'
+
+    raw_amount = (row.get('amount') or '').strip().replace(',', '')
+    try:
+        amount = Decimal(raw_amount or '0').quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValidationError(f'Invalid amount "{raw_amount}".')
+    if amount < 0 or amount > MAX_AMOUNT:
+        raise ValidationError(f'Amount {amount} is out of range.')
+
+    email = (row.get('email') or '').strip() or None
+    if email:
+        validate_email(email)
+
+    phone = (row.get('phone') or '').strip() or None
+    if phone and len(phone) > 20:
+        raise ValidationError('Phone number is longer than 20 characters.')
+
+    raw_employment = (row.get('employment_type') or '').strip()
+    employment_type = EMPLOYMENT_TYPES.get(raw_employment.lower(), 'Salaried' if not raw_employment else None)
+    if employment_type is None:
+        raise ValidationError(f'Unknown employment type "{raw_employment}".')
+
+    raw_tenure = (row.get('tenure_months') or '').strip()
+    if raw_tenure and not (raw_tenure.isdigit() and 0 < int(raw_tenure) <= 480):
+        raise ValidationError(f'Invalid tenure "{raw_tenure}".')
+
+    # Blank means "suggest one"; see _screen().
+    loan_type = (row.get('loan_type') or '').strip()
+    loan_type_id = products.get(loan_type.lower()) if loan_type else None
+    if loan_type and loan_type_id is None:
+        raise ValidationError(f'Unknown loan type "{loan_type}".')
+
+    # Last, so rejected rows never count towards anyone's workload.
+    banker_email = (row.get('assigned_to_email') or '').strip().lower()
+    assigned_to_id = employees.get(banker_email)
+    if assigned_to_id is not None:
+        scheduler.note(assigned_to_id)
+    else:
+        try:
+            assigned_to_id = scheduler.assign()
+        except NoAssigneeAvailable as e:
+            raise ValidationError(str(e))
+
+    return LoanApplication(
+        name=name[:200],
+        amount=amount,
+        assigned_to_id=assigned_to_id,
+        loan_type_id=loan_type_id,
+        employment_type=employment_type,
+        tenure_months=int(raw_tenure) if raw_tenure else None,
+        status='New',
+        email=email,
+        phone=phone,
+    )
+
+
+def _screen(batch, products, report):
+    """Suggest a loan type for rows without one and flag rows that break their own.
+
+    ``products`` is ordered by preference; the first one a row qualifies for
+    is suggested.
+    """
+    names = {product.pk: product.name for product in products}
+    for (line, app), (_, eligible, failures) in zip(batch, evaluate_batch((app for _, app in batch), products)):
+        if app.loan_type_id is None:
+            if eligible:
+                app.loan_type_id = eligible[0]
+                report.suggested += 1
+        elif failures:
+            report.add_warning(line, f'Not eligible for {names[app.loan_type_id]}: ' + '; '.join(failures))
+
+
+def _flush(batch, products, report, on_batch):
+    _screen(batch, products, report)
+    batch = [app for _, app in batch]
+    with batch_write():
+        now = timezone.now()
+        for app in batch:
+            app.status_changed_at = app.document_status_changed_at = now
+        LoanApplication.objects.bulk_create(batch)
+        # bulk_create sends no signals, so roll the batch into EmployeeStats
+        # and the status event log here.
+        record_applications((app.assigned_to_id, app.status) for app in batch)
+        record_transitions(t for app in batch for t in creation_transitions(app))
+        report.imported += len(batch)
+        if on_batch is not None:
+            # Runs inside the batch transaction so a checkpoint recorded
+            # here commits (or rolls back) together with the rows.
+            on_batch(report)
+
+
+def import_applications(binary_file, batch_size=BATCH_SIZE, on_batch=None, resume=None):
+    """Stream a CSV of applications from ``binary_file`` into the database.
+
+    The file is decoded incrementally, bankers are resolved from a single
+    preloaded email map (or assigned by AssignmentScheduler) and valid rows
+    are written with ``bulk_create`` in transactions of ``batch_size`` rows,
+    so neither memory nor the SQLite write lock grows with the size of the
+    upload. Each batch is screened against every product's eligibility
+    rules in one pass before it is written (see ``_screen``).
+
+    ``on_batch(report)`` is called inside each batch transaction. Passing the
+    dict of a previous report as ``resume`` skips the rows it already covered.
+    """
+    report = ImportReport.from_dict(resume) if resume else ImportReport()
+    skip_rows = report.rows
+    employees = {
+        email.lower(): pk for pk, email in Employee.objects.values_list('pk', 'email')
+    }
+    # Rows without a known banker go to whoever the scheduler picks; it
+    # also counts the rows that name their banker.
+    scheduler = AssignmentScheduler.load_from_db()
+    # Cheapest first, so a suggested loan type is the best rate the applicant qualifies for.
+    products = list(LoanProduct.objects.order_by('interest_rate', 'pk'))
+    product_ids = {}
+    for product in reversed(products):
+        product_ids[product.name.lower()] = product.pk
+
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    batch = []
+    try:
+        for index, row in enumerate(reader, start=1):
+            if index <= skip_rows:
+                continue
+            report.rows += 1
+            try:
+                batch.append((reader.line_num, _clean_row(row, employees, scheduler, product_ids)))
+            except ValidationError as e:
+                report.add_error(reader.line_num, ' '.join(e.messages))
+                continue
+            if len(batch) >= batch_size:
+                _flush(batch, products, report, on_batch)
+                batch = []
+        if batch:
+            _flush(batch, products, report, on_batch)
+    except (UnicodeDecodeError, csv.Error) as e:
+        report.add_error(reader.line_num, f'Could not read file: {e}')
+    finally:
+        text.detach()
+        scheduler.remember()
+
+    if report.imported:
+        invalidate_dashboard()
+    return report
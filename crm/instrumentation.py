@@ -0,0 +1,281 @@
+"""Per-request timings and process-safe latency histograms.
+
+ServerTimingMiddleware opens a RequestTimings for each request in a context
+variable. SQL is timed by an execute wrapper installed on every database
+connection as it is created, and templates by the TimedDjangoTemplates
+backend; both add to whatever RequestTimings is current, so queries run from
+sync_to_async threads (which copy the context) are counted too.
+
+Finished requests are folded into per-process histograms keyed by URL name.
+Each process writes its totals to ``settings.METRICS_DIR/<pid>.json`` at most
+every ``METRICS_FLUSH_INTERVAL`` seconds, and /metrics sums every file, so the
+numbers cover all gunicorn workers. When a worker exits, gunicorn's
+``child_exit`` hook (gunicorn.conf.py) calls fold_exited_worker(), which adds
+its totals to ``exited.json`` and removes its file, so the directory holds one
+file per live worker and a recycled pid starts from an empty file. Totals
+only ever grow, as Prometheus expects of counters. Clear the directory when
+deploying.
+"""
+import atexit
+import bisect
+import json
+import os
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+# Upper bounds of the latency buckets, in seconds; +Inf is implied.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED = '<unmatched>'
+
+# Totals of workers that have exited; see fold_exited_worker().
+EXITED = 'exited.json'
+
+
+class RequestTimings:
+    __slots__ = ('started', 'queries', 'sql_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'app;dur={total * 1000:.1f}',
+            f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_seconds * 1000:.1f}',
+        ])
+
+
+_current = ContextVar('crm_request_timings', default=None)
+
+
+def start_request():
+    """Begin timing a request; pass the result to finish_request()."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(request, response, timings, token):
+    """Stop timing: record the request and add its Server-Timing header."""
+    _current.reset(token)
+    total = time.perf_counter() - timings.started
+    match = request.resolver_match
+    registry.observe(match.view_name if match else UNMATCHED, request.method, total, timings)
+    response['Server-Timing'] = timings.server_timing(total)
+    return response
+
+
+def time_sql(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.sql_seconds += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_sql_timer(sender, connection, **kwargs):
+    # Persistent DatabaseWrapper objects reconnect; install the wrapper once.
+    if time_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_sql)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each top-level render.
+
+    Included and extended templates render inside their parent, so they are
+    counted once, as part of it.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class MetricsRegistry:
+    """This process's request totals, flushed periodically to METRICS_DIR."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.flushed_at = time.monotonic()
+
+    def observe(self, view, method, seconds, timings):
+        with self.lock:
+            row = self.series.get((view, method))
+            if row is None:
+                row = self.series[(view, method)] = {
+                    'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0,
+                    'queries': 0, 'sql_seconds': 0.0, 'template_seconds': 0.0,
+                }
+            row['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+            row['sum'] += seconds
+            row['count'] += 1
+            row['queries'] += timings.queries
+            row['sql_seconds'] += timings.sql_seconds
+            row['template_seconds'] += timings.template_seconds
+            due = time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.series:
+                return
+            rows = [
+                {'view': view, 'method': method, **row, 'buckets': list(row['buckets'])}
+                for (view, method), row in self.series.items()
+            ]
+            self.flushed_at = time.monotonic()
+        _write(f'{os.getpid()}.json', rows)
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+
+def _write(name, data):
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, name)
+    staging = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(staging, 'w') as handle:
+        json.dump(data, handle)
+    os.replace(staging, path)
+
+
+def _read(name):
+    try:
+        with open(os.path.join(settings.METRICS_DIR, name)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None  # missing, or replaced or removed mid-read
+
+
+def _merge(merged, rows):
+    for row in rows:
+        key = (row['view'], row['method'])
+        total = merged.get(key)
+        if total is None:
+            merged[key] = {field: value for field, value in row.items() if field not in ('view', 'method')}
+            continue
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], row['buckets'])]
+        for field in ('sum', 'count', 'queries', 'sql_seconds', 'template_seconds'):
+            total[field] += row[field]
+    return merged
+
+
+def collect():
+    """Totals per (view, method), summed across every process's file."""
+    registry.flush()
+    # Read the aggregate first: while a worker is being folded it names the
+    # worker's file, which must then not be counted a second time.
+    exited = _read(EXITED) or {'rows': [], 'folding': None}
+    merged = _merge({}, exited['rows'])
+    try:
+        names = os.listdir(settings.METRICS_DIR)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if not name.endswith('.json') or name in (EXITED, exited['folding']):
+            continue
+        _merge(merged, _read(name) or [])
+    return merged
+
+
+def fold_exited_worker(pid):
+    """Add an exited worker's totals to the aggregate and remove its file.
+
+    Called by the gunicorn master from ``child_exit``, after the worker has
+    made its last flush and before its pid can be handed to a new worker.
+    """
+    name = f'{pid}.json'
+    rows = _read(name)
+    if rows is None:
+        return
+    exited = _read(EXITED) or {'rows': [], 'folding': None}
+    merged = _merge(_merge({}, exited['rows']), rows)
+    totals = [{'view': view, 'method': method, **row} for (view, method), row in merged.items()]
+    _write(EXITED, {'rows': totals, 'folding': name})
+    os.remove(os.path.join(settings.METRICS_DIR, name))
+    _write(EXITED, {'rows': totals, 'folding': None})
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(view, method, **extra):
+    pairs = {'view': view, 'method': method, **extra}
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs.items()) + '}'
+
+
+def render_prometheus(merged):
+    """Prometheus text exposition format (version 0.0.4) for collect()'s totals."""
+    series = sorted(merged.items())
+    lines = [
+        '# HELP crm_request_duration_seconds Time to build the response, by URL name.',
+        '# TYPE crm_request_duration_seconds histogram',
+    ]
+    for (view, method), row in series:
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, '+Inf'), row['buckets']):
+            cumulative += count
+            lines.append(f'crm_request_duration_seconds_bucket{_labels(view, method, le=bound)} {cumulative}')
+        lines.append(f'crm_request_duration_seconds_sum{_labels(view, method)} {row["sum"]:.6f}')
+        lines.append(f'crm_request_duration_seconds_count{_labels(view, method)} {row["count"]}')
+    counters = (
+        ('crm_request_queries_total', 'queries', 'SQL queries run while building responses.', '{}'),
+        ('crm_request_sql_seconds_total', 'sql_seconds', 'Time spent in SQL while building responses.', '{:.6f}'),
+        ('crm_request_template_seconds_total', 'template_seconds', 'Time spent rendering templates.', '{:.6f}'),
+    )
+    for metric, field, help_text, number in counters:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} counter')
+        for (view, method), row in series:
+            lines.append(f'{metric}{_labels(view, method)} {number.format(row[field])}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_authorized(request):
+    """/metrics needs a matching bearer token when METRICS_TOKEN is set, a staff login otherwise."""
+    token = settings.METRICS_TOKEN
+    if not token:
+        return request.user.is_staff
+    header = request.headers.get('Authorization', '')
+    return secrets.compare_digest(header, f'Bearer {token}')
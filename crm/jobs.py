@@ -0,0 +1,202 @@
+import csv
+import io
+import logging
+import tempfile
+import traceback
+from datetime import timedelta
+
+from django.core.files import File
+from django.db.models import F
+from django.utils import timezone
+
+from .exports import application_queryset, application_rows
+from .importer import import_applications
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# kind -> callable(job, context) returning the job result dict
+HANDLERS = {}
+
+# Seconds before the first retry; doubled for every further attempt.
+RETRY_DELAY = 30
+
+EXPORT_PROGRESS_EVERY = 5000
+
+# run_jobs refreshes updated_at on the jobs it is running every
+# HEARTBEAT_INTERVAL seconds. A Running job not touched for LEASE belongs to
+# a worker that died and may be run again.
+HEARTBEAT_INTERVAL = 15
+LEASE = timedelta(minutes=2)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+class JobContext:
+    """Handed to job handlers to report progress and observe cancellation."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def progress(self, done, total=None, result=None):
+        fields = {'progress_done': done, 'updated_at': timezone.now()}
+        if total is not None:
+            fields['progress_total'] = total
+        if result is not None:
+            fields['result'] = result
+        Job.objects.filter(pk=self.job.pk).update(**fields)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if Job.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+
+def enqueue(kind, payload=None, input_file=None, max_attempts=3):
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind "{kind}".')
+    job = Job(kind=kind, payload=payload or {}, max_attempts=max_attempts)
+    if input_file is not None:
+        job.input_file.save(input_file.name, input_file, save=False)
+    job.save()
+    return job
+
+
+def cancel_job(job):
+    """Cancel a queued job outright, or ask a running one to stop."""
+    now = timezone.now()
+    if Job.objects.filter(pk=job.pk, status='Queued').update(
+        status='Cancelled', cancel_requested=True, finished_at=now, updated_at=now
+    ):
+        return True
+    return bool(Job.objects.filter(pk=job.pk, status='Running').update(cancel_requested=True, updated_at=now))
+
+
+def claim_next_job():
+    """Atomically move the next due job from Queued to Running.
+
+    Returns the claimed job id, or None when nothing is due. The conditional
+    UPDATE makes the claim safe without row locks, which SQLite lacks.
+    """
+    now = timezone.now()
+    due = (
+        Job.objects.filter(status='Queued', run_after__lte=now)
+        .order_by('run_after', 'pk')
+        .values_list('pk', flat=True)[:5]
+    )
+    for pk in due:
+        claimed = Job.objects.filter(pk=pk, status='Queued').update(
+            status='Running', started_at=now, updated_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return pk
+    return None
+
+
+def heartbeat(job_ids):
+    """Extend the lease of jobs this worker is still running."""
+    if job_ids:
+        Job.objects.filter(pk__in=job_ids, status='Running').update(updated_at=timezone.now())
+
+
+def requeue_interrupted_jobs():
+    """Put jobs whose worker stopped heartbeating back on the queue.
+
+    Jobs with a live lease are left alone: they belong to another worker,
+    or to the one this worker is replacing and which is still finishing.
+    Jobs that have used up their attempts fail instead, as in
+    _retry_or_fail(), so a job that kills its worker is not retried forever.
+    Returns the number requeued.
+    """
+    now = timezone.now()
+    expired = Job.objects.filter(status='Running', updated_at__lt=now - LEASE)
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status='Failed', error='The worker running this job stopped responding.', finished_at=now, updated_at=now,
+    )
+    if failed:
+        logger.warning('Failed %s interrupted job(s) that had used up their attempts', failed)
+    return expired.update(status='Queued', updated_at=now)
+
+
+def _finish(job, status, **fields):
+    now = timezone.now()
+    Job.objects.filter(pk=job.pk).update(status=status, finished_at=now, updated_at=now, **fields)
+
+
+def _retry_or_fail(job, error):
+    if job.attempts < job.max_attempts:
+        delay = timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+        Job.objects.filter(pk=job.pk).update(
+            status='Queued', error=error, run_after=timezone.now() + delay, updated_at=timezone.now(),
+        )
+        return 'Queued'
+    _finish(job, 'Failed', error=error)
+    return 'Failed'
+
+
+def release_crashed_job(job_id, error):
+    """Record a job whose worker process died without reporting back."""
+    job = Job.objects.filter(pk=job_id, status='Running').first()
+    if job is not None:
+        _retry_or_fail(job, error)
+
+
+def run_job(job_id):
+    """Execute a claimed job in the current process and record the outcome."""
+    job = Job.objects.get(pk=job_id)
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f'No handler registered for "{job.kind}".')
+        JobContext(job).check_cancelled()
+        result = handler(job, JobContext(job))
+    except JobCancelled:
+        _finish(job, 'Cancelled')
+        return 'Cancelled'
+    except Exception:
+        logger.exception('Job %s failed (attempt %s of %s)', job.pk, job.attempts, job.max_attempts)
+        return _retry_or_fail(job, traceback.format_exc())
+    _finish(job, 'Succeeded', result=result, result_file=job.result_file.name or '', error='')
+    return 'Succeeded'
+
+
+@job_handler('import_applications')
+def run_import(job, context):
+    total = job.input_file.size
+    with job.input_file.open('rb') as upload:
+        def checkpoint(report):
+            context.progress(upload.tell(), total, result=report.as_dict())
+
+        # A retry resumes after the rows the last committed batch covered.
+        report = import_applications(upload, on_batch=checkpoint, resume=job.result or None)
+    return report.as_dict()
+
+
+@job_handler('export_applications')
+def run_export(job, context):
+    filters = job.payload.get('filters', {})
+    # +1 for the header row
+    context.progress(0, application_queryset(filters).count() + 1)
+    rows = 0
+    with tempfile.TemporaryFile() as output:
+        text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        for row in application_rows(filters):
+            writer.writerow(row)
+            rows += 1
+            if rows % EXPORT_PROGRESS_EVERY == 0:
+                context.progress(rows)
+        text.flush()
+        text.detach()
+        output.seek(0)
+        job.result_file.save(f'applications-{job.pk}.csv', File(output), save=False)
+    return {'rows': rows - 1, 'filters': filters}
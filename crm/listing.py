@@ -0,0 +1,190 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import LoanApplication
+
+# Public sort name -> column. Only these columns may be sorted on, and each
+# has an index whose order is (column, id), so every page is a range scan.
+# Loan type and banker are not sortable: their order is the joined name, which
+# no index on this table can provide. Filter by them instead.
+SORT_FIELDS = {
+    'created': 'created_at',
+    'name': 'name',
+    'amount': 'amount',
+    'status': 'status',
+}
+DEFAULT_SORT = '-created'
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+STATUS_VALUES = {value for value, _ in LoanApplication.STATUS_CHOICES}
+
+
+class Page:
+    def __init__(self, items, sort, next_cursor=None, prev_cursor=None, next_page=None, prev_page=None):
+        self.items = items
+        self.sort = sort
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        # Search results are ranked, so they page by number instead of cursor.
+        self.next_page = next_page
+        self.prev_page = prev_page
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(value, pk):
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([value, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        return value, int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def _cursor_datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _cursor_text(value):
+    if not isinstance(value, str):
+        raise TypeError(value)
+    return value
+
+
+def _cursor_decimal(value):
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise TypeError(value)
+    value = Decimal(value)
+    if not value.is_finite():
+        raise ValueError(value)
+    return value
+
+
+# Sort column -> converter for the value stored in a cursor.
+CURSOR_TYPES = {
+    'created_at': _cursor_datetime,
+    'uploaded_at': _cursor_datetime,
+    'name': _cursor_text,
+    'amount': _cursor_decimal,
+    'status': _cursor_text,
+}
+
+
+def decode_sort_cursor(cursor, path):
+    """decode_cursor() for a sort column; None unless the value fits the column."""
+    decoded = decode_cursor(cursor)
+    if decoded is None:
+        return None
+    value, pk = decoded
+    try:
+        return CURSOR_TYPES[path](value), pk
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_sort(value):
+    name = (value or '').lstrip('-')
+    if name not in SORT_FIELDS:
+        return DEFAULT_SORT
+    return value
+
+
+def filter_applications(queryset, params):
+    """Apply the status/product/banker query parameters to ``queryset``."""
+    status = params.get('status')
+    if status in STATUS_VALUES:
+        queryset = queryset.filter(status=status)
+    product = parse_int(params.get('product'))
+    if product is not None:
+        queryset = queryset.filter(loan_type_id=product)
+    banker = parse_int(params.get('banker'))
+    if banker is not None:
+        queryset = queryset.filter(assigned_to_id=banker)
+    return queryset
+
+
+def _after(path, descending, value, pk):
+    if descending:
+        return Q(**{f'{path}__lt': value}) | Q(**{path: value, 'pk__lt': pk})
+    return Q(**{f'{path}__gt': value}) | Q(**{path: value, 'pk__gt': pk})
+
+
+def keyset_page(queryset, params, path, descending, sort=None):
+    """One page of ``queryset`` ordered by ``(path, id)``, addressed by the after/before cursors.
+
+    Pages are addressed by an opaque cursor holding the sort value and id of
+    the boundary row, so every page is an index range scan of ``page_size``
+    rows no matter how deep into the table it is.
+    """
+    page_size = max(1, min(parse_int(params.get('per_page')) or PAGE_SIZE, MAX_PAGE_SIZE))
+
+    # A cursor that does not fit the sort (edited, or from another sort) means the first page.
+    after = decode_sort_cursor(params.get('after') or '', path)
+    before = decode_sort_cursor(params.get('before') or '', path) if after is None else None
+
+    if before is not None:
+        # Walk backwards from the cursor, then restore display order.
+        queryset = queryset.filter(_after(path, not descending, *before))
+        order = [path, 'pk'] if descending else [f'-{path}', '-pk']
+    else:
+        if after is not None:
+            queryset = queryset.filter(_after(path, descending, *after))
+        order = [f'-{path}', '-pk'] if descending else [path, 'pk']
+
+    rows = list(queryset.order_by(*order)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before is not None:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first, last = rows[0], rows[-1]
+        if before is not None or has_more:
+            next_cursor = encode_cursor(getattr(last, path), last.pk)
+        if after is not None or (before is not None and has_more):
+            prev_cursor = encode_cursor(getattr(first, path), first.pk)
+    return Page(rows, sort, next_cursor, prev_cursor)
+
+
+def paginate_applications(queryset, params):
+    """Return one keyset page of ``queryset`` ordered by the requested sort."""
+    sort = parse_sort(params.get('sort'))
+    return keyset_page(queryset, params, SORT_FIELDS[sort.lstrip('-')], sort.startswith('-'), sort)
+
+
+def paginate_documents(queryset, params):
+    """Return one keyset page of documents, newest upload first."""
+    return keyset_page(queryset, params, 'uploaded_at', descending=True)
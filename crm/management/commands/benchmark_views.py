@@ -0,0 +1,76 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from crm import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Times every crm URL against the current database and reports query counts and p50/p95 latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Only these URL names (default: all)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per URL (default: %(default)s)')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests first (default: %(default)s)')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every timed request')
+        parser.add_argument('--username', help='Log in as this user (default: the first superuser)')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+        parser.add_argument('--compare', help='A --json file from an earlier run to report changes against')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['warmup'] < 0:
+            raise CommandError('--repeat must be >= 1 and --warmup >= 0.')
+        User = get_user_model()
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['username']!r}.")
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('pk').first()
+            if user is None:
+                self.stderr.write('No superuser found; login-only URLs will time their redirect.')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["compare"]}: {e}')
+
+        results = benchmark.run(
+            options['names'] or None, repeat=options['repeat'], warmup=options['warmup'],
+            cold=options['cold'], user=user,
+        )
+        if baseline is not None:
+            benchmark.compare(results, baseline)
+        self.report(results)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as handle:
+                json.dump({
+                    'generated_at': timezone.now().isoformat(),
+                    'repeat': options['repeat'],
+                    'cold': options['cold'],
+                    'dataset': benchmark.dataset_size(),
+                    'results': results,
+                }, handle, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+    def report(self, results):
+        width = max(len(row['name']) for row in results) if results else 0
+        self.stdout.write(f"{'URL name':<{width}}  status  queries  p50 ms  p95 ms")
+        over_budget = []
+        for row in results:
+            if 'skipped' in row:
+                self.stdout.write(f"{row['name']:<{width}}  skipped: {row['skipped']}")
+                continue
+            line = f"{row['name']:<{width}}  {row['status']:>6}  {row['queries']:>7}  {row['p50_ms']:>6.1f}  {row['p95_ms']:>6.1f}"
+            if 'p50_ms_change' in row:
+                line += f"  ({row['p50_ms_change']:+.1f}% / {row.get('p95_ms_change', 0):+.1f}%)"
+            self.stdout.write(line)
+            if row['budget'] is not None and row['queries'] > row['budget']:
+                over_budget.append(f"{row['name']} ({row['queries']} > {row['budget']})")
+        if over_budget:
+            self.stderr.write('Over query budget: ' + ', '.join(over_budget))
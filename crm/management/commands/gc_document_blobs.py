@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from crm.blobs import DEFAULT_GRACE, collect_garbage, recount_blobs
+
+
+class Command(BaseCommand):
+    help = 'Deletes stored document blobs that no ApplicationDocument references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=DEFAULT_GRACE.total_seconds() / 3600,
+            help='Keep orphaned blobs touched more recently than this (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Recompute reference counts from the documents table before collecting',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only list what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            fixed = recount_blobs()
+            self.stdout.write(f'Corrected {fixed} reference count(s)')
+
+        result = collect_garbage(grace=timedelta(hours=options['grace_hours']), dry_run=options['dry_run'])
+        for name in result['removed']:
+            self.stdout.write(f'  {name}')
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(result['removed'])} blob(s), {result['bytes']} bytes"
+        ))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.sampledata import BATCH_SIZE, generate
+
+
+class Command(BaseCommand):
+    help = 'Adds a seeded synthetic dataset: bankers, every loan product, applications, disbursements and documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--applications', type=int, default=10000, help='Applications to add (default: %(default)s)')
+        parser.add_argument('--employees', type=int, default=25, help='Bankers to create (default: %(default)s)')
+        parser.add_argument(
+            '--days', type=int, default=365, help='Spread applications over this many past days (default: %(default)s)',
+        )
+        parser.add_argument('--seed', type=int, default=1, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per transaction (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        if options['applications'] < 0 or options['employees'] < 1 or options['days'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--applications must be >= 0; --employees, --days and --batch-size must be >= 1.')
+        started = time.perf_counter()
+
+        def progress(created):
+            rate = created / max(time.perf_counter() - started, 1e-9)
+            self.stdout.write(f'  {created}/{options["applications"]} applications ({rate:,.0f}/s)')
+
+        counts = generate(
+            options['applications'], employees=options['employees'], days=options['days'],
+            seed=options['seed'], batch_size=options['batch_size'], on_batch=progress,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {counts['applications']} application(s), {counts['disbursements']} disbursement(s) and "
+            f"{counts['documents']} document(s) for {counts['employees']} banker(s) and {counts['products']} "
+            f'product(s) in {elapsed:.1f}s'
+        ))
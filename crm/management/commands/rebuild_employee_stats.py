@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.stats import rebuild_employee_stats, verify_employee_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the EmployeeStats rollup from applications and disbursements'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare the stored rollup with a full recomputation and report drift',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = verify_employee_stats()
+            for employee_id, diff in sorted(mismatches.items()):
+                details = ', '.join(f'{field}: {stored} != {expected}' for field, (stored, expected) in diff.items())
+                self.stderr.write(f'Employee {employee_id}: {details}')
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} employee(s) have drifted stats; run without --verify to repair.')
+            self.stdout.write(self.style.SUCCESS('Employee stats match the source tables'))
+            return
+
+        count = rebuild_employee_stats()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} employee(s)'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from crm.trends import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Updates the daily pipeline rollups behind the trends report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every day instead of only touched days')
+
+    def handle(self, *args, **options):
+        days = refresh_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {days} day(s) of rollups'))
@@ -0,0 +1,84 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# crm.jobs is imported lazily: spawned workers unpickle functions from this
+# module before Django is set up.
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _run(job_id):
+    from crm.jobs import run_job
+    try:
+        return run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (imports, exports) in a local process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when idle')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        from crm.jobs import requeue_interrupted_jobs
+
+        processes = max(1, options['processes'])
+        requeued = requeue_interrupted_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} interrupted job(s)'))
+        # Workers open their own connections.
+        connections.close_all()
+
+        self.stdout.write(self.style.SUCCESS(f'Job worker started with {processes} process(es)'))
+        while not self._serve(processes, options):
+            self.stderr.write('Worker pool broke; starting a new one')
+
+    def _serve(self, processes, options):
+        """Run jobs until the queue drains (--once). Returns False if the pool broke."""
+        from crm.jobs import HEARTBEAT_INTERVAL, claim_next_job, heartbeat, release_crashed_job, requeue_interrupted_jobs
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_worker) as pool:
+            running = {}
+            broken = False
+            beat_at = time.monotonic()
+            while True:
+                if time.monotonic() - beat_at >= HEARTBEAT_INTERVAL:
+                    heartbeat(list(running.values()))
+                    # Pick up jobs of workers that died since we started.
+                    requeue_interrupted_jobs()
+                    beat_at = time.monotonic()
+
+                for future in [f for f in running if f.done()]:
+                    job_id = running.pop(future)
+                    try:
+                        self.stdout.write(f'Job {job_id}: {future.result()}')
+                    except Exception as e:
+                        self.stderr.write(f'Job {job_id} crashed its worker: {e!r}')
+                        release_crashed_job(job_id, repr(e))
+                        broken = broken or isinstance(e, BrokenProcessPool)
+
+                if broken:
+                    if not running:
+                        return False
+                elif len(running) < processes:
+                    job_id = claim_next_job()
+                    if job_id is not None:
+                        running[pool.submit(_run, job_id)] = job_id
+                        continue
+
+                if options['once'] and not running:
+                    return True
+                time.sleep(options['poll_interval'])
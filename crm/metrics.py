@@ -0,0 +1,126 @@
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import versions
+from .models import Disbursement, LoanApplication
+
+DASHBOARD_VERSION = 'dashboard'
+
+# Safety net: a snapshot is never served for longer than this even if an
+# invalidation was missed (e.g. a raw SQL update).
+SNAPSHOT_TIMEOUT = 300
+
+# Template key -> LoanApplication.status
+PIPELINE_STAGES = {
+    'New': 'New',
+    'Contacted': 'Contacted',
+    'Follow_up': 'Follow-up',
+    'Verified': 'Verified',
+    'Converted': 'Converted',
+    'Rejected': 'Rejected',
+}
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _summary_aggregates(today):
+    day_start, day_end = _day_bounds(today)
+    aggregates = {
+        'total': Count('id'),
+        'new_today': Count('id', filter=Q(created_at__gte=day_start, created_at__lt=day_end)),
+        'pending_docs': Count('id', filter=Q(document_status='Pending')),
+    }
+    for key, status in PIPELINE_STAGES.items():
+        aggregates[key] = Count('id', filter=Q(status=status))
+    return aggregates
+
+
+def _follow_ups():
+    return LoanApplication.objects.filter(status='Follow-up').order_by('-updated_at').values('pk', 'name', 'phone')[:5]
+
+
+def _snapshot(counts, follow_ups):
+    pipeline_counts = {key: counts[key] for key in PIPELINE_STAGES}
+    return {
+        'total_applications_count': counts['total'],
+        'new_today_count': counts['new_today'],
+        'converted_count': pipeline_counts['Converted'],
+        'pending_docs_count': counts['pending_docs'],
+        'follow_ups_count': pipeline_counts['Follow_up'],
+        'pipeline_counts': pipeline_counts,
+        'follow_ups': follow_ups,
+        'generated_at': timezone.now(),
+    }
+
+
+def compute_dashboard_metrics(today=None):
+    """Build a dashboard snapshot straight from the database.
+
+    All summary and pipeline counts come from a single conditional
+    aggregation over LoanApplication instead of one COUNT(*) per card.
+    """
+    today = today or timezone.localdate()
+    return _snapshot(
+        LoanApplication.objects.aggregate(**_summary_aggregates(today)),
+        list(_follow_ups()),
+    )
+
+
+async def acompute_dashboard_metrics(today=None):
+    """compute_dashboard_metrics() for async views.
+
+    The async ORM runs each query through a thread-sensitive sync_to_async,
+    so queries awaited together still run one after another on the same
+    thread. The whole snapshot is computed in a single hop to that thread.
+    """
+    return await sync_to_async(compute_dashboard_metrics)(today)
+
+
+def _snapshot_key(today):
+    return f'crm:dashboard:{versions.get_version(DASHBOARD_VERSION)}:{today.isoformat()}'
+
+
+def get_dashboard_metrics():
+    """Return the current dashboard snapshot, computing it only on a miss."""
+    today = timezone.localdate()
+    key = _snapshot_key(today)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = compute_dashboard_metrics(today)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+async def aget_dashboard_metrics():
+    today = timezone.localdate()
+    key = await sync_to_async(_snapshot_key)(today)
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        snapshot = await acompute_dashboard_metrics(today)
+        await cache.aset(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def invalidate_dashboard():
+    # Bump after commit so other workers never rebuild from uncommitted rows.
+    transaction.on_commit(lambda: versions.bump_version(DASHBOARD_VERSION))
+
+
+# The dashboard no longer shows disbursements, but the API's ETags (crm.api)
+# rely on this version following them.
+@receiver(post_save, sender=LoanApplication)
+@receiver(post_delete, sender=LoanApplication)
+@receiver(post_save, sender=Disbursement)
+@receiver(post_delete, sender=Disbursement)
+def invalidate_dashboard_on_change(sender, **kwargs):
+    invalidate_dashboard()
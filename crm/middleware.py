@@ -0,0 +1,169 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .instrumentation import finish_request, start_request
+from .query_budget import QUERY_BUDGETS, count_queries
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCapableMiddleware:
+    """Base for middleware that runs natively in both WSGI and ASGI chains.
+
+    Subclasses implement ``handle(request)`` and ``ahandle(request)``. Any
+    sync-only middleware would make Django run the rest of the chain in a
+    thread per request, so everything in MIDDLEWARE should be async-capable.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+class ServerTimingMiddleware(AsyncCapableMiddleware):
+    """Time every request and record it in the /metrics histograms.
+
+    Adds a ``Server-Timing`` header (total, SQL and template time, plus the
+    query count) that browsers show in the network panel. For streaming
+    responses only the time to start the response is measured.
+    """
+
+    def handle(self, request):
+        timings, token = start_request()
+        response = self.get_response(request)
+        return finish_request(request, response, timings, token)
+
+    async def ahandle(self, request):
+        timings, token = start_request()
+        response = await self.get_response(request)
+        return finish_request(request, response, timings, token)
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    """Warn in DEBUG when a crm view exceeds its entry in QUERY_BUDGETS.
+
+    Adds an ``X-Query-Count`` header to every response so the count is
+    visible in the browser's network panel. Does nothing when DEBUG is off.
+    """
+
+    def handle(self, request):
+        if not settings.DEBUG:
+            return self.get_response(request)
+
+        with count_queries() as counter:
+            response = self.get_response(request)
+        return self.report(request, response, counter)
+
+    async def ahandle(self, request):
+        if not settings.DEBUG:
+            return await self.get_response(request)
+
+        # Database connections are per thread, and under ASGI the ORM runs on
+        # the request's sync_to_async thread, not this one; install the
+        # counter there.
+        counting = count_queries()
+        counter = await sync_to_async(counting.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(counting.__exit__)(None, None, None)
+        return self.report(request, response, counter)
+
+    def report(self, request, response, counter):
+        response['X-Query-Count'] = str(counter.count)
+        match = request.resolver_match
+        budget = QUERY_BUDGETS.get(match.url_name) if match else None
+        if budget is not None and request.method == 'GET' and counter.count > budget:
+            logger.warning(
+                'Query budget exceeded for %s: %s queries (budget %s)\n%s',
+                match.url_name, counter.count, budget, '\n'.join(counter.statements),
+            )
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, usable in an async middleware chain.
+
+    WhiteNoise's own middleware is sync-only; the file lookup is an in-memory
+    dict (or a stat with autorefresh), so only serving needs the sync thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.ahandle(request)
+        return super().__call__(request)
+
+    async def ahandle(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+# Bytes pulled from a synchronous body per trip to the sync thread.
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+async def aiterate(iterator, chunk_bytes=STREAM_CHUNK_BYTES):
+    """Async iterator over a synchronous byte iterator, read in the request's sync thread.
+
+    Parts are fetched about ``chunk_bytes`` at a time so that a CSV export
+    yielding one short row per part does not pay a thread hop per row.
+    """
+    iterator = iter(iterator)
+
+    def pull():
+        parts, size = [], 0
+        for part in iterator:
+            parts.append(part)
+            size += len(part)
+            if size >= chunk_bytes:
+                break
+        return parts
+
+    while parts := await sync_to_async(pull)():
+        for part in parts:
+            yield part
+
+
+class AsyncStreamingMiddleware(AsyncCapableMiddleware):
+    """Stream synchronous response bodies under ASGI instead of buffering them.
+
+    Django's ASGI handler reads a streaming response with ``async for``; given
+    a plain iterator (CSV exports, ZIP bundles, FileResponse downloads and
+    static files) it first collects the whole body into a list. Under ASGI
+    this swaps such bodies for ``aiterate()``. Under WSGI it does nothing.
+    Keep it first in MIDDLEWARE so it sees every response.
+    """
+
+    def handle(self, request):
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        response = await self.get_response(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = aiterate(response.streaming_content)
+        return response
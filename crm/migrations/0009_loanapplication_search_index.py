@@ -0,0 +1,87 @@
+from django.db import migrations
+
+# Full-text index over LoanApplication, kept in sync by triggers so that
+# ORM saves, bulk_create, queryset updates and deletes are all covered.
+# SQLite only; other backends fall back to ORM lookups in crm.search.
+
+DIGITS_ONLY = (
+    "replace(replace(replace(replace(replace(replace(coalesce({phone}, ''),"
+    " ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', '')"
+)
+
+# Index the full number and its last ten digits, so partial numbers typed
+# without the country code still match as a prefix.
+PHONE_DIGITS = "{digits} || ' ' || substr({digits}, -10)"
+
+
+def phone_digits(column):
+    return PHONE_DIGITS.format(digits=DIGITS_ONLY.format(phone=column))
+
+
+INSERT_ROW = (
+    "INSERT INTO crm_loanapplication_fts(rowid, name, phone, phone_digits, email, notes, banker) "
+    "VALUES (new.id, new.name, new.phone, " + phone_digits('new.phone') + ", new.email, new.notes, "
+    "(SELECT name FROM crm_employee WHERE id = new.assigned_to_id));"
+)
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE crm_loanapplication_fts USING fts5(
+        name, phone, phone_digits, email, notes, banker,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )
+    """,
+    """
+    INSERT INTO crm_loanapplication_fts(rowid, name, phone, phone_digits, email, notes, banker)
+    SELECT a.id, a.name, a.phone, """ + phone_digits('a.phone') + """, a.email, a.notes, e.name
+    FROM crm_loanapplication a LEFT JOIN crm_employee e ON e.id = a.assigned_to_id
+    """,
+    "CREATE TRIGGER crm_loanapplication_fts_ai AFTER INSERT ON crm_loanapplication BEGIN " + INSERT_ROW + " END",
+    """
+    CREATE TRIGGER crm_loanapplication_fts_au
+    AFTER UPDATE OF name, phone, email, notes, assigned_to_id ON crm_loanapplication BEGIN
+        DELETE FROM crm_loanapplication_fts WHERE rowid = old.id;
+        """ + INSERT_ROW + """
+    END
+    """,
+    """
+    CREATE TRIGGER crm_loanapplication_fts_ad AFTER DELETE ON crm_loanapplication BEGIN
+        DELETE FROM crm_loanapplication_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER crm_employee_fts_au AFTER UPDATE OF name ON crm_employee BEGIN
+        UPDATE crm_loanapplication_fts SET banker = new.name
+        WHERE rowid IN (SELECT id FROM crm_loanapplication WHERE assigned_to_id = new.id);
+    END
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS crm_employee_fts_au',
+    'DROP TRIGGER IF EXISTS crm_loanapplication_fts_ad',
+    'DROP TRIGGER IF EXISTS crm_loanapplication_fts_au',
+    'DROP TRIGGER IF EXISTS crm_loanapplication_fts_ai',
+    'DROP TABLE IF EXISTS crm_loanapplication_fts',
+]
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0008_alter_loanproduct_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
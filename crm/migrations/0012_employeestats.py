@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    Employee = apps.get_model('crm', 'Employee')
+    EmployeeStats = apps.get_model('crm', 'EmployeeStats')
+    LoanApplication = apps.get_model('crm', 'LoanApplication')
+    Disbursement = apps.get_model('crm', 'Disbursement')
+    fields = {
+        'New': 'new_count', 'Contacted': 'contacted_count', 'Follow-up': 'follow_up_count',
+        'Verified': 'verified_count', 'Converted': 'converted_count', 'Rejected': 'rejected_count',
+    }
+    stats = {pk: EmployeeStats(employee_id=pk) for pk in Employee.objects.values_list('pk', flat=True)}
+    for row in LoanApplication.objects.values('assigned_to', 'status').annotate(n=Count('id')).order_by():
+        if row['assigned_to'] in stats and row['status'] in fields:
+            setattr(stats[row['assigned_to']], fields[row['status']], row['n'])
+    for row in Disbursement.objects.values('banker').annotate(total=Sum('amount'), n=Count('id')).order_by():
+        if row['banker'] in stats:
+            stats[row['banker']].disbursed_total = row['total'] or 0
+            stats[row['banker']].deals_closed = row['n']
+    EmployeeStats.objects.bulk_create(stats.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0011_loanapplication_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeStats',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='crm.employee')),
+                ('disbursed_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('deals_closed', models.IntegerField(default=0)),
+                ('new_count', models.IntegerField(default=0)),
+                ('contacted_count', models.IntegerField(default=0)),
+                ('follow_up_count', models.IntegerField(default=0)),
+                ('verified_count', models.IntegerField(default=0)),
+                ('converted_count', models.IntegerField(default=0)),
+                ('rejected_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-disbursed_total'], name='crm_stats_disbursed_total')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0012_employeestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyApplicationStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('New', 'New'), ('Contacted', 'Contacted'), ('Follow-up', 'Follow-up'), ('Verified', 'Verified'), ('Converted', 'Converted'), ('Rejected', 'Rejected')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyDisbursementStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupDirtyDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('watermark', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='disbursement',
+            index=models.Index(fields=['date'], name='crm_disbursement_date'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['updated_at'], name='crm_app_updated'),
+        ),
+        migrations.AddField(
+            model_name='dailyapplicationstat',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='crm.loanproduct'),
+        ),
+        migrations.AddField(
+            model_name='dailydisbursementstat',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='crm.loanproduct'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyapplicationstat',
+            index=models.Index(fields=['day'], name='crm_daily_app_day'),
+        ),
+        migrations.AddIndex(
+            model_name='dailydisbursementstat',
+            index=models.Index(fields=['day'], name='crm_daily_disbursement_day'),
+        ),
+    ]
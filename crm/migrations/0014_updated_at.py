@@ -0,0 +1,44 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+from crm import search_schema
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0013_daily_rollups'),
+    ]
+
+    operations = [
+        # Adding a NOT NULL column rebuilds crm_employee, which the search
+        # triggers reference.
+        migrations.RunPython(
+            search_schema.run_sql(search_schema.DROP_TRIGGER_SQL), search_schema.run_sql(search_schema.TRIGGER_SQL),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='loanproduct',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='disbursement',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='disbursement',
+            index=models.Index(fields=['updated_at'], name='crm_disbursement_updated'),
+        ),
+        migrations.RunPython(
+            search_schema.run_sql(search_schema.TRIGGER_SQL), search_schema.run_sql(search_schema.DROP_TRIGGER_SQL),
+        ),
+    ]
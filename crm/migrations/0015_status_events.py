@@ -0,0 +1,104 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:56
+
+import django.db.models.deletion
+from collections import Counter
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def backfill_events(apps, schema_editor):
+    """Give existing applications one synthetic creation event per field.
+
+    Their real history is unknown, so the current values are treated as
+    entered at created_at.
+    """
+    LoanApplication = apps.get_model('crm', 'LoanApplication')
+    ApplicationStatusEvent = apps.get_model('crm', 'ApplicationStatusEvent')
+    FunnelStageStat = apps.get_model('crm', 'FunnelStageStat')
+    WeeklyFunnelStat = apps.get_model('crm', 'WeeklyFunnelStat')
+
+    LoanApplication.objects.update(status_changed_at=F('created_at'), document_status_changed_at=F('created_at'))
+    stages, weeks, batch = Counter(), Counter(), []
+    rows = LoanApplication.objects.values_list('pk', 'status', 'document_status', 'created_at').iterator(chunk_size=2000)
+    for pk, status, document_status, created_at in rows:
+        day = timezone.localdate(created_at)
+        week = day - timedelta(days=day.weekday())
+        for kind, value in (('status', status), ('document', document_status)):
+            batch.append(ApplicationStatusEvent(application_id=pk, kind=kind, to_value=value, at=created_at))
+            stages[(kind, value)] += 1
+            weeks[(week, kind, value)] += 1
+        if len(batch) >= 2000:
+            ApplicationStatusEvent.objects.bulk_create(batch)
+            batch = []
+    ApplicationStatusEvent.objects.bulk_create(batch)
+    FunnelStageStat.objects.bulk_create(
+        FunnelStageStat(kind=kind, stage=stage, entered=n) for (kind, stage), n in stages.items()
+    )
+    WeeklyFunnelStat.objects.bulk_create(
+        WeeklyFunnelStat(week=week, kind=kind, stage=stage, entered=n) for (week, kind, stage), n in weeks.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0014_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='document_status_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='FunnelStageStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('status', 'Status'), ('document', 'Document Status')], max_length=10)),
+                ('stage', models.CharField(max_length=20)),
+                ('entered', models.PositiveIntegerField(default=0)),
+                ('exited', models.PositiveIntegerField(default=0)),
+                ('seconds_in_stage', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'stage'), name='crm_funnel_kind_stage')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WeeklyFunnelStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('kind', models.CharField(choices=[('status', 'Status'), ('document', 'Document Status')], max_length=10)),
+                ('stage', models.CharField(max_length=20)),
+                ('entered', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('week', 'kind', 'stage'), name='crm_weekly_funnel_week_kind_stage')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ApplicationStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('status', 'Status'), ('document', 'Document Status')], max_length=10)),
+                ('from_value', models.CharField(blank=True, max_length=20)),
+                ('to_value', models.CharField(max_length=20)),
+                ('at', models.DateTimeField()),
+                ('application', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='status_events', to='crm.loanapplication')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['application', 'at'], name='crm_event_application_at')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:00
+
+import os
+from collections import Counter
+
+import crm.storage
+from django.db import migrations, models
+
+
+def backfill_blobs(apps, schema_editor):
+    """Reference-count the files existing documents already point at.
+
+    Those keep their application_documents/ names; only new uploads are
+    content-addressed.
+    """
+    ApplicationDocument = apps.get_model('crm', 'ApplicationDocument')
+    StoredBlob = apps.get_model('crm', 'StoredBlob')
+    storage = crm.storage.document_storage()
+    counts = Counter()
+    for pk, name in ApplicationDocument.objects.exclude(file='').values_list('pk', 'file'):
+        counts[name] += 1
+        ApplicationDocument.objects.filter(pk=pk).update(original_name=os.path.basename(name)[:255])
+    blobs = []
+    for name, count in counts.items():
+        try:
+            size = storage.size(name)
+        except OSError:
+            size = 0
+        blobs.append(StoredBlob(name=name, size=size, ref_count=count))
+    StoredBlob.objects.bulk_create(blobs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0015_status_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='applicationdocument',
+            name='original_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='applicationdocument',
+            name='file',
+            field=models.FileField(storage=crm.storage.document_storage, upload_to='application_documents/'),
+        ),
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='crm_blob_orphans')],
+            },
+        ),
+        migrations.RunPython(backfill_blobs, migrations.RunPython.noop),
+    ]
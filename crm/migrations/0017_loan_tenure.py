@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0016_document_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='tenure_months',
+            field=models.PositiveSmallIntegerField(blank=True, help_text="Repayment tenure; leave blank to use the loan type's default", null=True, verbose_name='Tenure (months)'),
+        ),
+        migrations.AddField(
+            model_name='loanproduct',
+            name='tenure_months',
+            field=models.PositiveSmallIntegerField(default=60, help_text='Default repayment tenure in months'),
+        ),
+    ]
@@ -0,0 +1,173 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:07
+
+import re
+
+from django.db import migrations, models
+
+# A frozen copy of the rule grammar crm.eligibility accepted when this
+# migration was written, so later changes to the parser or the models never
+# change what the migration does. It only checks that a line parses.
+FIELDS = {'amount': 'number', 'employment_type': 'text', 'tenure_months': 'number'}
+CONSTANTS = ('min_amount', 'max_amount', 'default_tenure')
+TEXT_CHOICES = {'employment_type': {'Salaried', 'Self-employed'}}
+KEYWORDS = {'and', 'or', 'not', 'in', 'between'}
+
+TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<number>\d+(?:\.\d+)?)
+      | (?P<string>"[^"]*"|'[^']*')
+      | (?P<op>[<>!=]=|[<>=])
+      | (?P<punct>[(),])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )''', re.VERBOSE)
+
+
+class InvalidRule(Exception):
+    pass
+
+
+class RuleChecker:
+    def __init__(self, source):
+        self.tokens = []
+        source, position = source.rstrip(), 0
+        while position < len(source):
+            match = TOKEN_RE.match(source, position)
+            if not match:
+                raise InvalidRule
+            kind, value = match.lastgroup, match.group(match.lastgroup)
+            if kind == 'name' and value.lower() in KEYWORDS:
+                kind, value = 'keyword', value.lower()
+            self.tokens.append((kind, value))
+            position = match.end()
+        self.position = 0
+
+    def peek(self, kind, value=None):
+        if self.position < len(self.tokens):
+            token = self.tokens[self.position]
+            if token[0] == kind and (value is None or token[1] == value):
+                return token
+        return None
+
+    def take(self, kind=None, value=None):
+        if self.position >= len(self.tokens):
+            raise InvalidRule
+        token = self.tokens[self.position]
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            raise InvalidRule
+        self.position += 1
+        return token
+
+    def check(self):
+        if not self.tokens:
+            raise InvalidRule
+        self.disjunction()
+        if self.position < len(self.tokens):
+            raise InvalidRule
+
+    def disjunction(self):
+        self.conjunction()
+        while self.peek('keyword', 'or'):
+            self.position += 1
+            self.conjunction()
+
+    def conjunction(self):
+        self.negation()
+        while self.peek('keyword', 'and'):
+            self.position += 1
+            self.negation()
+
+    def negation(self):
+        if self.peek('keyword', 'not'):
+            self.position += 1
+            self.negation()
+        elif self.peek('punct', '('):
+            self.position += 1
+            self.disjunction()
+            self.take('punct', ')')
+        else:
+            self.comparison()
+
+    def operand(self):
+        """Return (type, field name or None, string value or None)."""
+        kind, value = self.take()
+        if kind == 'number':
+            return 'number', None, None
+        if kind == 'string':
+            return 'text', None, value[1:-1]
+        if kind == 'name' and value in FIELDS:
+            return FIELDS[value], value, None
+        if kind == 'name' and value in CONSTANTS:
+            return 'number', None, None
+        raise InvalidRule
+
+    def compatible(self, left, right):
+        if left[0] != right[0]:
+            raise InvalidRule
+        choices = TEXT_CHOICES.get(left[1])
+        if choices and right[0] == 'text' and right[2] is not None and right[2] not in choices:
+            raise InvalidRule
+
+    def comparison(self):
+        left = self.operand()
+        if self.peek('op'):
+            op = self.take('op')[1]
+            self.compatible(left, self.operand())
+            if left[0] == 'text' and op not in ('=', '==', '!='):
+                raise InvalidRule
+            return
+        if self.peek('keyword', 'between'):
+            self.position += 1
+            low = self.operand()
+            self.take('keyword', 'and')
+            high = self.operand()
+            self.compatible(left, low)
+            self.compatible(left, high)
+            if left[0] != 'number':
+                raise InvalidRule
+            return
+        if self.peek('keyword', 'not'):
+            self.position += 1
+        self.take('keyword', 'in')
+        self.take('punct', '(')
+        self.compatible(left, self.operand())
+        while self.peek('punct', ','):
+            self.position += 1
+            self.compatible(left, self.operand())
+        self.take('punct', ')')
+
+
+def is_rule(line):
+    source = line.split('#', 1)[0].strip()
+    if not source:
+        return True
+    try:
+        RuleChecker(source).check()
+    except InvalidRule:
+        return False
+    return True
+
+
+def comment_out_free_text(apps, schema_editor):
+    """Criteria used to be free text; keep lines that are not valid rules as comments."""
+    LoanProduct = apps.get_model('crm', 'LoanProduct')
+    for product in LoanProduct.objects.exclude(eligibility_criteria=''):
+        lines = [line if is_rule(line) else f'# {line}' for line in product.eligibility_criteria.splitlines()]
+        criteria = '\n'.join(lines)
+        if criteria != product.eligibility_criteria:
+            LoanProduct.objects.filter(pk=product.pk).update(eligibility_criteria=criteria)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0017_loan_tenure'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loanproduct',
+            name='eligibility_criteria',
+            field=models.TextField(blank=True, help_text='One rule per line, e.g. employment_type = "Salaried" or amount <= 500000'),
+        ),
+        migrations.RunPython(comment_out_free_text, migrations.RunPython.noop),
+    ]
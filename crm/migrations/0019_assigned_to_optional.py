@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0018_eligibility_rules'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loanapplication',
+            name='assigned_to',
+            field=models.ForeignKey(blank=True, on_delete=django.db.models.deletion.CASCADE, related_name='applications', to='crm.employee'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0019_assigned_to_optional'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='crm_app_status_created_id'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['status', 'id'], name='crm_app_status_id'),
+        ),
+    ]
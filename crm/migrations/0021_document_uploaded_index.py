@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0020_application_list_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='applicationdocument',
+            index=models.Index(fields=['uploaded_at'], name='crm_document_uploaded'),
+        ),
+    ]
@@ -1,4 +1,10 @@
-from django.db import models
+import os
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from .storage import document_storage
+from .tracking import ChangeTrackingMixin
 
 class Employee(models.Model):
     DESIGNATION_CHOICES = [
@@ -10,6 +16,7 @@ class Employee(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     designation = models.CharField(max_length=50, choices=DESIGNATION_CHOICES, default='Loan Officer')
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} ({self.designation})"
@@ -25,18 +32,23 @@ class LoanProduct(models.Model):
         ('Mortgage Loan', 'Mortgage Loan'),
         ('Credit Card', 'Credit Card'),
     ]
+    DEFAULT_TENURE_MONTHS = 60
     name = models.CharField(max_length=200, choices=LOAN_TYPE_CHOICES)
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2, help_text="Interest Rate %", default=10.0)
     processing_fee = models.DecimalField(max_digits=5, decimal_places=2, help_text="Processing Fee %", default=1.0)
     min_amount = models.DecimalField(max_digits=12, decimal_places=2, default=10000)
     max_amount = models.DecimalField(max_digits=12, decimal_places=2, default=1000000)
-    eligibility_criteria = models.TextField(blank=True, help_text="Eligibility rules")
+    tenure_months = models.PositiveSmallIntegerField(default=DEFAULT_TENURE_MONTHS, help_text="Default repayment tenure in months")
+    eligibility_criteria = models.TextField(
+        blank=True, help_text='One rule per line, e.g. employment_type = "Salaried" or amount <= 500000',
+    )
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
-class LoanApplication(models.Model):
+class LoanApplication(ChangeTrackingMixin, models.Model):
     STATUS_CHOICES = [
         ('New', 'New'),
         ('Contacted', 'Contacted'),
@@ -65,29 +77,109 @@ class LoanApplication(models.Model):
     loan_type = models.ForeignKey(LoanProduct, on_delete=models.SET_NULL, null=True, verbose_name="Loan Type")
     employment_type = models.CharField(max_length=50, choices=EMPLOYMENT_TYPE_CHOICES, default='Salaried')
     
-    assigned_to = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='applications')
+    # Blank in forms means "assign automatically" (crm.assignment).
+    assigned_to = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='applications', blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='New')
     document_status = models.CharField(max_length=20, choices=DOCUMENT_STATUS_CHOICES, default='Pending')
     
     amount = models.DecimalField(max_digits=12, decimal_places=2, help_text="Loan Amount Required")
+    tenure_months = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="Tenure (months)",
+        help_text="Repayment tenure; leave blank to use the loan type's default",
+    )
     notes = models.TextField(blank=True, null=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # When the current status / document status was entered (see crm.events).
+    status_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    document_status_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        # Every hot query should be an index search; see QueryPlanTests.
+        indexes = [
+            # Covers the dashboard counts.
+            models.Index(fields=['status', 'created_at', 'document_status'], name='crm_app_status_created'),
+            # Status filter + newest-first keyset pages on (created_at, id).
+            models.Index(fields=['status', 'created_at', 'id'], name='crm_app_status_created_id'),
+            # Keyset pages sorted by status.
+            models.Index(fields=['status', 'id'], name='crm_app_status_id'),
+            # Follow-ups ordered by last activity.
+            models.Index(fields=['status', 'updated_at'], name='crm_app_status_updated'),
+            # Unfiltered newest-first list and keyset pages on (created_at, id).
+            models.Index(fields=['created_at'], name='crm_app_created'),
+            models.Index(fields=['document_status'], name='crm_app_document_status'),
+            # Per-banker pipeline counts and the banker filter.
+            models.Index(fields=['assigned_to', 'status'], name='crm_app_assigned_status'),
+            # Keyset pages sorted by name / amount.
+            models.Index(fields=['name'], name='crm_app_name'),
+            models.Index(fields=['amount'], name='crm_app_amount'),
+            # Incremental daily rollups: rows touched since the last run.
+            models.Index(fields=['updated_at'], name='crm_app_updated'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.is_tracked and not self._state.adding and not args and not kwargs and not self.changed_fields:
+            return  # nothing to write, so no savepoint either
+        now = timezone.now()
+        stamped = []
+        for field, stamp in (('status', 'status_changed_at'), ('document_status', 'document_status_changed_at')):
+            if self._state.adding or self.has_changed(field):
+                setattr(self, stamp, now)
+                stamped.append(stamp)
+        if kwargs.get('update_fields') is not None and stamped:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | set(stamped)
+        # Signal handlers (disbursements, rollups) run inside this transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} - {self.loan_type}"
 
-class ApplicationDocument(models.Model):
+class ApplicationDocument(ChangeTrackingMixin, models.Model):
     application = models.ForeignKey(LoanApplication, on_delete=models.CASCADE, related_name='documents')
     title = models.CharField(max_length=100, help_text="e.g., ID Proof, Income Proof")
-    file = models.FileField(upload_to='application_documents/')
+    # Stored once per distinct content under blobs/; see crm.storage and crm.blobs.
+    file = models.FileField(upload_to='application_documents/', storage=document_storage)
+    original_name = models.CharField(max_length=255, blank=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=LoanApplication.DOCUMENT_STATUS_CHOICES, default='Submitted')
 
+    class Meta:
+        indexes = [
+            # Keyset pages of the documents list, newest first.
+            models.Index(fields=['uploaded_at'], name='crm_document_uploaded'),
+        ]
+
     def __str__(self):
         return f"{self.title} for {self.application.name}"
 
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            # The stored name becomes the content digest; keep the upload's name.
+            self.original_name = os.path.basename(self.file.name)[:255]
+        super().save(*args, **kwargs)
+
+    @property
+    def display_name(self):
+        return self.original_name or os.path.basename(self.file.name)
+
+
+class StoredBlob(models.Model):
+    """Reference count for a file in document storage, keyed by its storage name."""
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at'], name='crm_blob_orphans'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
 from decimal import Decimal
 
 class Disbursement(models.Model):
@@ -96,21 +188,230 @@ class Disbursement(models.Model):
     product = models.ForeignKey(LoanProduct, on_delete=models.SET_NULL, null=True, blank=True)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='crm_disbursement_date'),
+            models.Index(fields=['updated_at'], name='crm_disbursement_updated'),
+        ]
 
     def __str__(self):
         return f"Loan Disbursed for {self.application.name}"
 
+class EmployeeStats(models.Model):
+    """Per-banker totals maintained incrementally by crm.stats."""
+    # LoanApplication.status -> counter field
+    STATUS_FIELDS = {
+        'New': 'new_count',
+        'Contacted': 'contacted_count',
+        'Follow-up': 'follow_up_count',
+        'Verified': 'verified_count',
+        'Converted': 'converted_count',
+        'Rejected': 'rejected_count',
+    }
+    OPEN_STATUSES = ('New', 'Contacted', 'Follow-up', 'Verified')
+
+    employee = models.OneToOneField(Employee, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    disbursed_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    deals_closed = models.IntegerField(default=0)
+    new_count = models.IntegerField(default=0)
+    contacted_count = models.IntegerField(default=0)
+    follow_up_count = models.IntegerField(default=0)
+    verified_count = models.IntegerField(default=0)
+    converted_count = models.IntegerField(default=0)
+    rejected_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-disbursed_total'], name='crm_stats_disbursed_total'),
+        ]
+
+    @property
+    def open_count(self):
+        return sum(getattr(self, self.STATUS_FIELDS[status]) for status in self.OPEN_STATUSES)
+
+    @property
+    def total_applications(self):
+        return sum(getattr(self, field) for field in self.STATUS_FIELDS.values())
+
+    @property
+    def conversion_rate(self):
+        """Converted applications as a percentage of all assigned ones."""
+        total = self.total_applications
+        return round(self.converted_count * 100 / total, 1) if total else 0
+
+    def __str__(self):
+        return f"Stats for {self.employee.name}"
+
+class DailyApplicationStat(models.Model):
+    """Applications created on ``day``, by their current status and product."""
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=LoanApplication.STATUS_CHOICES)
+    product = models.ForeignKey(LoanProduct, on_delete=models.CASCADE, null=True, blank=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day'], name='crm_daily_app_day'),
+        ]
+
+class DailyDisbursementStat(models.Model):
+    """Loans disbursed on ``day``, by product."""
+    day = models.DateField()
+    product = models.ForeignKey(LoanProduct, on_delete=models.CASCADE, null=True, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day'], name='crm_daily_disbursement_day'),
+        ]
+
+class RollupDirtyDay(models.Model):
+    """A day whose rollup rows must be recomputed even though no surviving
+    row was updated since the last run (i.e. something was deleted)."""
+    day = models.DateField(primary_key=True)
+
+class RollupState(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    watermark = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
+
+class ApplicationStatusEvent(models.Model):
+    """One status or document-status transition. Append-only; written in the
+    same transaction as the change and kept after the application is deleted."""
+    KIND_CHOICES = [
+        ('status', 'Status'),
+        ('document', 'Document Status'),
+    ]
+    application = models.ForeignKey(
+        LoanApplication, on_delete=models.DO_NOTHING, db_constraint=False, related_name='status_events',
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    from_value = models.CharField(max_length=20, blank=True)  # '' when the application was created
+    to_value = models.CharField(max_length=20)
+    at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['application', 'at'], name='crm_event_application_at'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Status events are append-only.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.kind}: {self.from_value or '-'} -> {self.to_value} ({self.application_id})"
+
+class FunnelStageStat(models.Model):
+    """Running totals per stage, updated per event by crm.events."""
+    kind = models.CharField(max_length=10, choices=ApplicationStatusEvent.KIND_CHOICES)
+    stage = models.CharField(max_length=20)
+    entered = models.PositiveIntegerField(default=0)
+    exited = models.PositiveIntegerField(default=0)
+    # Summed time (seconds) that exited applications spent in the stage.
+    seconds_in_stage = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'stage'], name='crm_funnel_kind_stage'),
+        ]
+
+    @property
+    def current(self):
+        return self.entered - self.exited
+
+    @property
+    def average_days(self):
+        return round(self.seconds_in_stage / self.exited / 86400, 1) if self.exited else None
+
+class WeeklyFunnelStat(models.Model):
+    """Entries into each stage per ISO week (``week`` is its Monday)."""
+    week = models.DateField()
+    kind = models.CharField(max_length=10, choices=ApplicationStatusEvent.KIND_CHOICES)
+    stage = models.CharField(max_length=20)
+    entered = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['week', 'kind', 'stage'], name='crm_weekly_funnel_week_kind_stage'),
+        ]
+
+class Job(models.Model):
+    """A unit of background work picked up by ``manage.py run_jobs``."""
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Running', 'Running'),
+        ('Succeeded', 'Succeeded'),
+        ('Failed', 'Failed'),
+        ('Cancelled', 'Cancelled'),
+    ]
+    KIND_CHOICES = [
+        ('import_applications', 'Import Applications'),
+        ('export_applications', 'Export Applications'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Queued')
+    payload = models.JSONField(default=dict, blank=True)
+    input_file = models.FileField(upload_to='jobs/input/', blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    result_file = models.FileField(upload_to='jobs/output/', blank=True)
+    error = models.TextField(blank=True)
+
+    progress_done = models.PositiveBigIntegerField(default=0)
+    progress_total = models.PositiveBigIntegerField(null=True, blank=True)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    cancel_requested = models.BooleanField(default=False)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='crm_job_status_run_after'),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in ('Succeeded', 'Failed', 'Cancelled')
+
+    @property
+    def percent(self):
+        if self.status == 'Succeeded':
+            return 100
+        if not self.progress_total:
+            return None
+        return min(100, int(self.progress_done * 100 / self.progress_total))
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 @receiver(post_save, sender=LoanApplication)
 def create_disbursement_on_conversion(sender, instance, created, **kwargs):
-    if instance.status == 'Converted':
-        # Check if disbursement already exists
-        if not hasattr(instance, 'disbursement'):
-            Disbursement.objects.create(
-                application=instance,
-                banker=instance.assigned_to,
-                amount=instance.amount,
-                product=instance.loan_type # Auto-assign product from application
-            )
+    # Only on a real transition; re-saving a Converted application is a no-op.
+    if instance.status == 'Converted' and (created or instance.previous('status') != 'Converted'):
+        # A brand-new row cannot have one; otherwise check if disbursement already exists
+        if created or not Disbursement.objects.filter(application_id=instance.pk).exists():
+            # Same transaction as the EmployeeStats update its post_save triggers
+            with transaction.atomic():
+                Disbursement.objects.create(
+                    application=instance,
+                    banker=instance.assigned_to,
+                    amount=instance.amount,
+                    product=instance.loan_type # Auto-assign product from application
+                )
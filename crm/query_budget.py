@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+
+from django.db import connection
+
+# Maximum number of SQL queries each crm URL may issue for a GET, regardless
+# of how many rows it shows. A view that loads related objects per row will
+# blow its budget as soon as the test data has more than a couple of rows.
+QUERY_BUDGETS = {
+    'dashboard': 2,
+    'employee_list': 1,
+    'employee_create': 0,
+    'employee_update': 1,
+    'employee_delete': 10,
+    'application_list': 4,
+    'application_search': 2,
+    'application_create': 2,
+    'application_quote': 1,
+    'application_autocomplete': 2,
+    'import_applications': 0,
+    'application_export': 1,
+    'application_export_job': 0,
+    'disbursement_export': 1,
+    'application_bulk_status': 0,
+    'application_update': 3,
+    'loan_product_list': 1,
+    'loan_product_create': 0,
+    'documents': 2,
+    # Session and user lookups for login_required, then the document.
+    'document_download': 3,
+    'document_bundle': 3,
+    'application_documents_zip': 4,
+    'job_detail': 1,
+    'job_status': 1,
+    'job_cancel': 0,
+    'job_download': 1,
+    'settings': 2,
+    'employee_report': 1,
+    'employee_report_export': 1,
+    'pipeline_trends': 4,
+    'funnel_report': 3,
+    'portfolio_projection': 1,
+    # Session and user lookups for the staff check.
+    'metrics': 2,
+    'setup_admin': 1,
+    # Lists are validated from version counters, so only the page is read.
+    'api_application_list': 1,
+    'api_application_detail': 1,
+    'api_product_list': 1,
+    'api_product_detail': 1,
+    'api_employee_list': 1,
+    'api_employee_detail': 1,
+    'api_disbursement_list': 1,
+    'api_disbursement_detail': 1,
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting a request stays within its query budget."""
+
+    query_budgets = QUERY_BUDGETS
+
+    def assertWithinQueryBudget(self, url_name, url, method='get', data=None, **extra):
+        budget = self.query_budgets[url_name]
+        with count_queries() as counter:
+            response = getattr(self.client, method)(url, data, **extra)
+            if response.streaming:
+                # Streamed bodies run their queries while being consumed.
+                for _ in response.streaming_content:
+                    pass
+        if counter.count > budget:
+            self.fail(
+                f'{url_name} ({url}) ran {counter.count} queries, budget is {budget}:\n'
+                + '\n'.join(f'  {sql}' for sql in counter.statements)
+            )
+        return response
@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import versions
+from .models import Employee, LoanProduct
+
+# Reference data is small, read on almost every page and rarely edited, so
+# each list is cached whole under its model's version counter. Saving or
+# deleting a row bumps the counter, which retires the cached list in every
+# worker at once.
+PRODUCTS_VERSION = 'products'
+EMPLOYEES_VERSION = 'employees'
+
+# Safety net for changes that bypass the signals (queryset.update(), raw SQL).
+REFERENCE_TIMEOUT = 3600
+
+
+def _cached(name, build):
+    key = f'crm:ref:{name}:{versions.get_version(name)}'
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, REFERENCE_TIMEOUT)
+    return value
+
+
+def products():
+    """Every LoanProduct, in primary key order."""
+    return _cached(PRODUCTS_VERSION, lambda: list(LoanProduct.objects.order_by('pk')))
+
+
+def employees():
+    """Every Employee, in primary key order."""
+    return _cached(EMPLOYEES_VERSION, lambda: list(Employee.objects.order_by('pk')))
+
+
+def product(pk):
+    """The LoanProduct with ``pk``, or None."""
+    return next((item for item in products() if item.pk == pk), None)
+
+
+def product_choices():
+    return [(item.pk, str(item)) for item in products()]
+
+
+def employee_choices():
+    return [(item.pk, str(item)) for item in employees()]
+
+
+def _bump_on_commit(name):
+    transaction.on_commit(lambda: versions.bump_version(name))
+
+
+@receiver(post_save, sender=LoanProduct)
+@receiver(post_delete, sender=LoanProduct)
+def invalidate_products(sender, **kwargs):
+    _bump_on_commit(PRODUCTS_VERSION)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def invalidate_employees(sender, **kwargs):
+    _bump_on_commit(EMPLOYEES_VERSION)
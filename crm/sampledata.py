@@ -0,0 +1,237 @@
+"""Seeded synthetic datasets for demos, load testing and benchmark_views.
+
+Rows are written with ``bulk_create`` in batches, each in its own
+batch_write() transaction, so a million applications load in minutes. The
+derived tables that bulk_create bypasses are filled the way the importer
+fills them (status events and funnel aggregates per batch) or rebuilt once
+at the end (EmployeeStats, daily rollups, blob reference counts). The same
+seed always produces the same data.
+"""
+import math
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from . import versions
+from .blobs import recount_blobs
+from .eligibility import check_application
+from .events import creation_transitions, record_transitions
+from .metrics import DASHBOARD_VERSION
+from .models import ApplicationDocument, Disbursement, Employee, LoanApplication, LoanProduct
+from .reference import EMPLOYEES_VERSION, PRODUCTS_VERSION
+from .stats import rebuild_employee_stats
+from .trends import refresh_rollups
+from .writes import batch_write
+
+BATCH_SIZE = 5000
+
+FIRST_NAMES = (
+    'Aarav', 'Aditi', 'Akash', 'Ananya', 'Arjun', 'Deepa', 'Divya', 'Gaurav', 'Isha', 'Karan', 'Kavya', 'Manish',
+    'Meera', 'Neha', 'Nikhil', 'Pooja', 'Priya', 'Rahul', 'Ravi', 'Riya', 'Rohan', 'Sanjay', 'Sneha', 'Suresh',
+    'Tanvi', 'Varun', 'Vikram', 'Zara',
+)
+LAST_NAMES = (
+    'Agarwal', 'Bhat', 'Chopra', 'Das', 'Fernandes', 'Gupta', 'Iyer', 'Joshi', 'Kapoor', 'Khan', 'Kumar', 'Menon',
+    'Mehta', 'Nair', 'Patel', 'Pillai', 'Rao', 'Reddy', 'Shah', 'Sharma', 'Singh', 'Verma',
+)
+
+# Share of bankers per designation.
+DESIGNATION_WEIGHTS = {'Manager': 1, 'Loan Officer': 4, 'Sales Executive': 4, 'Bank Teller': 1}
+
+# Loan type -> (interest %, fee %, min amount, max amount, default tenure, eligibility rules)
+PRODUCT_PROFILES = {
+    'Personal Loan': (11.5, 1.5, 25000, 1500000, 48, 'tenure_months <= 72'),
+    'Home Loan': (8.5, 0.5, 500000, 10000000, 240, 'tenure_months <= 360'),
+    'Car Loan': (9.25, 1.0, 100000, 2500000, 60, 'tenure_months <= 84'),
+    'Gold Loan': (9.75, 0.75, 10000, 2000000, 12, 'tenure_months <= 36'),
+    'Education Loan': (10.0, 1.0, 50000, 4000000, 84, ''),
+    'Business Loan': (14.0, 2.0, 200000, 5000000, 60, 'employment_type = "Self-employed" or amount <= 2000000'),
+    'Mortgage Loan': (9.5, 1.0, 300000, 8000000, 180, ''),
+    'Credit Card': (36.0, 0.0, 10000, 500000, 12, 'employment_type = "Salaried"'),
+}
+
+# Status mix for applications older than a month; newer ones are still moving.
+STATUS_WEIGHTS = {'New': 8, 'Contacted': 10, 'Follow-up': 10, 'Verified': 10, 'Converted': 35, 'Rejected': 27}
+RECENT_STATUS_WEIGHTS = {'New': 35, 'Contacted': 20, 'Follow-up': 15, 'Verified': 10, 'Converted': 12, 'Rejected': 8}
+
+DOCUMENT_STATUS_BY_STATUS = {
+    'New': ('Pending',),
+    'Contacted': ('Pending', 'Submitted'),
+    'Follow-up': ('Pending', 'Submitted'),
+    'Verified': ('Submitted', 'Verified'),
+    'Converted': ('Verified',),
+    'Rejected': ('Pending', 'Submitted', 'Rejected'),
+}
+
+DOCUMENT_TITLES = ('ID Proof', 'Income Proof', 'Address Proof', 'Bank Statement')
+
+NOTES = ('', '', '', 'Prefers a call after 6 pm', 'Existing customer', 'Referred by a branch', 'Asked about prepayment')
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create write the given auto_now/auto_now_add fields as assigned."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field, _, _ in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _timestamp_fields(model, *names):
+    return [model._meta.get_field(name) for name in names]
+
+
+def _choose(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def ensure_products():
+    """One LoanProduct per LOAN_TYPE_CHOICES entry; existing products are kept as they are."""
+    existing = {product.name: product for product in LoanProduct.objects.all()}
+    for name, _ in LoanProduct.LOAN_TYPE_CHOICES:
+        if name in existing:
+            continue
+        rate, fee, low, high, tenure, rules = PRODUCT_PROFILES[name]
+        existing[name] = LoanProduct.objects.create(
+            name=name, interest_rate=rate, processing_fee=fee, min_amount=low, max_amount=high,
+            tenure_months=tenure, eligibility_criteria=rules, description=f'Sample {name.lower()}',
+        )
+    return list(existing.values())
+
+
+def ensure_employees(count, rng):
+    """``count`` bankers spread over every designation, reusing ones from an earlier run."""
+    designations = [name for name, _ in Employee.DESIGNATION_CHOICES]
+    # Every designation at least once, the rest by weight.
+    plan = designations[:count] + [_choose(rng, DESIGNATION_WEIGHTS) for _ in range(count - len(designations))]
+    employees = []
+    for i, designation in enumerate(plan):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        employees.append(Employee(
+            name=f'{first} {last}', email=f'{first}.{last}.{i}@fincorp.example'.lower(), designation=designation,
+        ))
+    Employee.objects.bulk_create(employees, ignore_conflicts=True)
+    return list(Employee.objects.filter(email__in=[employee.email for employee in employees]))
+
+
+def sample_documents():
+    """Store one small PDF per document title; returns {title: stored name}.
+
+    Storage is content-addressed, so every generated document of a title
+    shares a single blob on disk.
+    """
+    storage = ApplicationDocument._meta.get_field('file').storage
+    stored = {}
+    for title in DOCUMENT_TITLES:
+        body = f'%PDF-1.4\n% FinCorp sample {title}\n%%EOF\n'.encode()
+        slug = title.lower().replace(' ', '-')
+        stored[title] = storage.save(f'application_documents/{slug}.pdf', ContentFile(body))
+    return stored
+
+
+def _amount(rng, product):
+    # Log-uniform between the product limits, rounded to the nearest 1,000.
+    low, high = math.log(float(product.min_amount)), math.log(float(product.max_amount))
+    return Decimal(max(round(math.exp(rng.uniform(low, high)), -3), float(product.min_amount)))
+
+
+def _application(rng, now, days, products, employees):
+    created_at = now - timedelta(seconds=rng.uniform(0, days * 86400))
+    age = now - created_at
+    status = _choose(rng, STATUS_WEIGHTS if age > timedelta(days=30) else RECENT_STATUS_WEIGHTS)
+    changed_at = min(created_at + timedelta(hours=rng.uniform(0, 24 * min(age.days + 1, 21))), now)
+    product = rng.choice(products)
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    application = LoanApplication(
+        name=f'{first} {last}',
+        phone=f'+91 9{rng.randrange(10 ** 8, 10 ** 9)}',
+        email=f'{first}.{last}{rng.randrange(1000)}@example.com'.lower() if rng.random() < 0.8 else None,
+        loan_type=product,
+        employment_type='Salaried' if rng.random() < 0.7 else 'Self-employed',
+        assigned_to=rng.choice(employees),
+        status=status,
+        document_status=rng.choice(DOCUMENT_STATUS_BY_STATUS[status]),
+        amount=_amount(rng, product),
+        tenure_months=rng.choice((None, None, product.tenure_months // 2 or 6, product.tenure_months)),
+        notes=rng.choice(NOTES),
+        created_at=created_at,
+        updated_at=changed_at,
+        status_changed_at=changed_at,
+        document_status_changed_at=changed_at,
+    )
+    if status in ('Verified', 'Converted') and check_application(application, product):
+        # Applications that break their product's rules do not get through verification.
+        application.status = 'Rejected'
+        application.document_status = rng.choice(DOCUMENT_STATUS_BY_STATUS['Rejected'])
+    return application
+
+
+def _documents(rng, application, stored):
+    count = {'New': 0, 'Contacted': 1, 'Follow-up': 1, 'Rejected': 1}.get(application.status, 3)
+    for title in rng.sample(DOCUMENT_TITLES, rng.randint(0, count)):
+        yield ApplicationDocument(
+            application=application, title=title, file=stored[title],
+            original_name=f'{title.lower().replace(" ", "_")}.pdf',
+            uploaded_at=application.created_at + timedelta(hours=rng.uniform(1, 72)),
+            status='Verified' if application.document_status == 'Verified' else 'Submitted',
+        )
+
+
+def generate(applications, employees=25, days=365, seed=1, batch_size=BATCH_SIZE, on_batch=None):
+    """Add ``applications`` synthetic applications (plus bankers, products, disbursements, documents).
+
+    ``on_batch(created)`` is called after each committed batch with the
+    number of applications written so far. Returns a dict of row counts.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    products = ensure_products()
+    bankers = ensure_employees(employees, rng)
+    stored = sample_documents()
+    counts = {'applications': 0, 'disbursements': 0, 'documents': 0}
+
+    fields = (
+        _timestamp_fields(LoanApplication, 'created_at', 'updated_at')
+        + _timestamp_fields(Disbursement, 'date', 'updated_at')
+        + _timestamp_fields(ApplicationDocument, 'uploaded_at')
+    )
+    with explicit_timestamps(*fields):
+        while counts['applications'] < applications:
+            size = min(batch_size, applications - counts['applications'])
+            batch = [_application(rng, now, days, products, bankers) for _ in range(size)]
+            with batch_write():
+                LoanApplication.objects.bulk_create(batch)
+                disbursements = [
+                    Disbursement(
+                        application=app, banker=app.assigned_to, product=app.loan_type, amount=app.amount,
+                        date=app.status_changed_at, updated_at=app.status_changed_at,
+                    )
+                    for app in batch if app.status == 'Converted'
+                ]
+                Disbursement.objects.bulk_create(disbursements)
+                documents = [document for app in batch for document in _documents(rng, app, stored)]
+                ApplicationDocument.objects.bulk_create(documents)
+                record_transitions(t for app in batch for t in creation_transitions(app))
+            counts['applications'] += size
+            counts['disbursements'] += len(disbursements)
+            counts['documents'] += len(documents)
+            if on_batch is not None:
+                on_batch(counts['applications'])
+
+    rebuild_employee_stats()
+    refresh_rollups(full=True)
+    recount_blobs()
+    # bulk_create sends no signals; retire every cached view of the data.
+    for name in (DASHBOARD_VERSION, PRODUCTS_VERSION, EMPLOYEES_VERSION):
+        versions.bump_version(name)
+    counts['employees'] = len(bankers)
+    counts['products'] = len(products)
+    return counts
@@ -0,0 +1,108 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import LoanApplication
+
+SEARCH_TABLE = 'crm_loanapplication_fts'
+
+# bm25 column weights: name, phone, phone_digits, email, notes, banker
+COLUMN_WEIGHTS = (10.0, 5.0, 5.0, 5.0, 1.0, 2.0)
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+# Ranked results page by OFFSET; nobody reads this deep, and it keeps the
+# offset well inside SQLite's integer range.
+MAX_PAGE = 1000
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# Filters accepted alongside a search: query parameter -> column
+FILTER_COLUMNS = {
+    'status': 'status',
+    'product': 'loan_type_id',
+    'banker': 'assigned_to_id',
+}
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 MATCH expression.
+
+    Every word is a prefix term and all of them must match. When the text
+    contains digits the digits-only phone column is also tried, so a partial
+    number typed with or without separators finds the application.
+    """
+    terms = TERM_RE.findall(text or '')
+    if not terms:
+        return None
+    match = ' '.join(f'"{term}"*' for term in terms)
+    digits = ''.join(ch for ch in text if ch.isdigit())
+    if len(digits) >= 3:
+        match = f'({match}) OR phone_digits : "{digits}"*'
+    return match
+
+
+def _parse_filters(params):
+    filters = {}
+    for param, column in FILTER_COLUMNS.items():
+        value = (params or {}).get(param)
+        if not value:
+            continue
+        if column != 'status':
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                continue
+        filters[column] = value
+    return filters
+
+
+def _fts_available():
+    # Migration 0009 creates the index on every SQLite database.
+    return connection.vendor == 'sqlite'
+
+
+def search_application_ids(text, params=None, limit=PAGE_SIZE, offset=0):
+    """Return application ids matching ``text``, best match first."""
+    filters = _parse_filters(params)
+
+    if not _fts_available():
+        fallback = Q()
+        for term in TERM_RE.findall(text or ''):
+            fallback &= (
+                Q(name__icontains=term) | Q(phone__icontains=term) | Q(email__icontains=term)
+                | Q(notes__icontains=term) | Q(assigned_to__name__icontains=term)
+            )
+        queryset = LoanApplication.objects.filter(fallback, **filters).order_by('-created_at')
+        return list(queryset.values_list('pk', flat=True)[offset:offset + limit])
+
+    match = build_match_query(text)
+    if match is None:
+        return []
+    where = [f'{SEARCH_TABLE} MATCH %s']
+    args = [match]
+    for column, value in filters.items():
+        where.append(f'a.{column} = %s')
+        args.append(value)
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    sql = (
+        f'SELECT {SEARCH_TABLE}.rowid FROM {SEARCH_TABLE} '
+        f'JOIN crm_loanapplication a ON a.id = {SEARCH_TABLE}.rowid '
+        f'WHERE {" AND ".join(where)} '
+        f'ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s OFFSET %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, args + [limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_applications(text, params=None, page=1, page_size=PAGE_SIZE):
+    """Return ``(applications, has_more)`` for one page of ranked results."""
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    offset = (max(1, min(page, MAX_PAGE)) - 1) * page_size
+    ids = search_application_ids(text, params, limit=page_size + 1, offset=offset)
+    has_more = len(ids) > page_size
+    ids = ids[:page_size]
+    found = LoanApplication.objects.select_related('loan_type', 'assigned_to').in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found], has_more
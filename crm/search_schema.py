@@ -0,0 +1,67 @@
+"""SQL for the search index's triggers, for migrations that have to rebuild them.
+
+Migration 0009 created the FTS5 table and its triggers. SQLite ALTERs that
+copy crm_employee or crm_loanapplication lose the triggers, so such
+migrations drop them first and recreate them afterwards with the statements
+below, which must stay identical to 0009's. Imports nothing from the app, so
+migrations can use it.
+"""
+
+DIGITS_ONLY = (
+    "replace(replace(replace(replace(replace(replace(coalesce({phone}, ''),"
+    " ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', '')"
+)
+
+# Index the full number and its last ten digits, so partial numbers typed
+# without the country code still match as a prefix.
+PHONE_DIGITS = "{digits} || ' ' || substr({digits}, -10)"
+
+
+def phone_digits(column):
+    return PHONE_DIGITS.format(digits=DIGITS_ONLY.format(phone=column))
+
+
+INSERT_ROW = (
+    "INSERT INTO crm_loanapplication_fts(rowid, name, phone, phone_digits, email, notes, banker) "
+    "VALUES (new.id, new.name, new.phone, " + phone_digits('new.phone') + ", new.email, new.notes, "
+    "(SELECT name FROM crm_employee WHERE id = new.assigned_to_id));"
+)
+
+TRIGGER_SQL = [
+    "CREATE TRIGGER crm_loanapplication_fts_ai AFTER INSERT ON crm_loanapplication BEGIN " + INSERT_ROW + " END",
+    """
+    CREATE TRIGGER crm_loanapplication_fts_au
+    AFTER UPDATE OF name, phone, email, notes, assigned_to_id ON crm_loanapplication BEGIN
+        DELETE FROM crm_loanapplication_fts WHERE rowid = old.id;
+        """ + INSERT_ROW + """
+    END
+    """,
+    """
+    CREATE TRIGGER crm_loanapplication_fts_ad AFTER DELETE ON crm_loanapplication BEGIN
+        DELETE FROM crm_loanapplication_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER crm_employee_fts_au AFTER UPDATE OF name ON crm_employee BEGIN
+        UPDATE crm_loanapplication_fts SET banker = new.name
+        WHERE rowid IN (SELECT id FROM crm_loanapplication WHERE assigned_to_id = new.id);
+    END
+    """,
+]
+
+DROP_TRIGGER_SQL = [
+    'DROP TRIGGER IF EXISTS crm_employee_fts_au',
+    'DROP TRIGGER IF EXISTS crm_loanapplication_fts_ad',
+    'DROP TRIGGER IF EXISTS crm_loanapplication_fts_au',
+    'DROP TRIGGER IF EXISTS crm_loanapplication_fts_ai',
+]
+
+
+def run_sql(statements):
+    """A RunPython callable executing ``statements`` on SQLite only."""
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
@@ -0,0 +1,153 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Disbursement, Employee, EmployeeStats, LoanApplication
+from .writes import batch_write
+
+
+def _apply(employee_id, **deltas):
+    """Add ``deltas`` to one banker's counters with a single UPDATE.
+
+    A missing row (the employee is being deleted, or was inserted behind the
+    ORM's back) is left alone; ``rebuild_employee_stats`` repairs the latter.
+    """
+    if employee_id is None or not any(deltas.values()):
+        return
+    EmployeeStats.objects.filter(pk=employee_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def record_applications(pairs, sign=1):
+    """Count applications given as (assigned_to_id, status) pairs in or out."""
+    per_employee = defaultdict(Counter)
+    for employee_id, status in pairs:
+        per_employee[employee_id][EmployeeStats.STATUS_FIELDS[status]] += sign
+    for employee_id, deltas in per_employee.items():
+        _apply(employee_id, **deltas)
+
+
+def record_disbursement(employee_id, amount, sign=1):
+    _apply(employee_id, disbursed_total=sign * Decimal(amount), deals_closed=sign)
+
+
+def record_disbursements(pairs):
+    """Count new disbursements given as (banker_id, amount) pairs, one UPDATE per banker."""
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    for employee_id, amount in pairs:
+        totals[employee_id][0] += Decimal(amount)
+        totals[employee_id][1] += 1
+    for employee_id, (amount, count) in totals.items():
+        _apply(employee_id, disbursed_total=amount, deals_closed=count)
+
+
+def compute_employee_stats(employee_ids=None):
+    """Recompute counters from LoanApplication and Disbursement.
+
+    Returns {employee_id: {field: value}} covering every employee (or only
+    ``employee_ids``), using one grouped query per source table.
+    """
+    employees = Employee.objects.all()
+    applications = LoanApplication.objects.all()
+    disbursements = Disbursement.objects.all()
+    if employee_ids is not None:
+        employees = employees.filter(pk__in=employee_ids)
+        applications = applications.filter(assigned_to__in=employee_ids)
+        disbursements = disbursements.filter(banker__in=employee_ids)
+
+    empty = {field: 0 for field in EmployeeStats.STATUS_FIELDS.values()}
+    empty.update(disbursed_total=Decimal('0'), deals_closed=0)
+    stats = {pk: dict(empty) for pk in employees.values_list('pk', flat=True)}
+
+    for row in applications.values('assigned_to', 'status').annotate(n=Count('id')).order_by():
+        if row['assigned_to'] in stats and row['status'] in EmployeeStats.STATUS_FIELDS:
+            stats[row['assigned_to']][EmployeeStats.STATUS_FIELDS[row['status']]] = row['n']
+    for row in disbursements.values('banker').annotate(total=Sum('amount'), n=Count('id')).order_by():
+        if row['banker'] in stats:
+            stats[row['banker']].update(disbursed_total=row['total'] or Decimal('0'), deals_closed=row['n'])
+    return stats
+
+
+def rebuild_employee_stats(employee_ids=None):
+    """Overwrite EmployeeStats rows with freshly computed values."""
+    stats = compute_employee_stats(employee_ids)
+    with batch_write():
+        for employee_id, values in stats.items():
+            EmployeeStats.objects.update_or_create(employee_id=employee_id, defaults=values)
+    return len(stats)
+
+
+def verify_employee_stats():
+    """Return {employee_id: {field: (stored, expected)}} for every drifted counter."""
+    expected = compute_employee_stats()
+    stored = {row['employee_id']: row for row in EmployeeStats.objects.values()}
+    mismatches = {}
+    for employee_id, values in expected.items():
+        row = stored.get(employee_id, {})
+        diff = {
+            field: (row.get(field), value)
+            for field, value in values.items()
+            if row.get(field) != value
+        }
+        if diff:
+            mismatches[employee_id] = diff
+    return mismatches
+
+
+# --- Signal receivers ---
+
+@receiver(post_save, sender=Employee)
+def create_stats_for_employee(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        EmployeeStats.objects.get_or_create(employee=instance)
+
+
+@receiver(pre_save, sender=LoanApplication)
+def remember_previous_assignment(sender, instance, raw=False, **kwargs):
+    # Loaded instances know their previous values (ChangeTrackingMixin); only
+    # an instance built by hand with an existing pk needs a lookup.
+    instance._stats_previous = None
+    if instance.pk and not raw and not instance._state.adding:
+        if instance.is_tracked:
+            instance._stats_previous = (instance.previous('assigned_to'), instance.previous('status'))
+        else:
+            instance._stats_previous = (
+                LoanApplication.objects.filter(pk=instance.pk).values_list('assigned_to_id', 'status').first()
+            )
+
+
+@receiver(post_save, sender=LoanApplication)
+def update_stats_on_application_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.assigned_to_id, instance.status)
+    previous = None if created else getattr(instance, '_stats_previous', None)
+    if previous == current:
+        return
+    if previous is not None:
+        record_applications([previous], sign=-1)
+    record_applications([current])
+
+
+@receiver(post_delete, sender=LoanApplication)
+def update_stats_on_application_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Employee):
+        return  # the stats row goes with the employee
+    record_applications([(instance.assigned_to_id, instance.status)], sign=-1)
+
+
+@receiver(post_save, sender=Disbursement)
+def update_stats_on_disbursement_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_disbursement(instance.banker_id, instance.amount)
+
+
+@receiver(post_delete, sender=Disbursement)
+def update_stats_on_disbursement_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Employee):
+        return
+    record_disbursement(instance.banker_id, instance.amount, sign=-1)
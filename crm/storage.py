@@ -0,0 +1,67 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'blobs'
+STAGING_DIR = 'tmp'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage that names every file after the SHA-256 of its content.
+
+    Uploads are streamed chunk by chunk into a temporary file next to the
+    final location while being hashed, then atomically moved to
+    ``blobs/ab/cd/<digest>``. Identical content therefore lands on the same
+    path and is stored once; reference counts live in ``crm.blobs``.
+    """
+
+    def blob_name(self, digest):
+        return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save().
+        return name
+
+    def _save(self, name, content):
+        staging = os.path.join(self.location, BLOB_PREFIX, STAGING_DIR)
+        os.makedirs(staging, exist_ok=True)
+        digest = hashlib.sha256()
+        handle, temp_path = tempfile.mkstemp(dir=staging)
+        try:
+            with os.fdopen(handle, 'wb') as temp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            name = self.blob_name(digest.hexdigest())
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+                # Refresh the mtime so garbage collection leaves it alone.
+                os.utime(full_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def delete(self, name):
+        # Blobs are shared; only crm.blobs garbage collection removes them.
+        return None
+
+    def remove_blob(self, name):
+        super().delete(name)
+
+
+def document_storage():
+    return ContentAddressedStorage()
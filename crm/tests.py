@@ -1,3 +1,1311 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Count, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .amortization import emi, project_loans, project_portfolio, schedule, shift_month
+from .assignment import AssignmentScheduler, assign_banker
+from .blobs import collect_garbage
+from .eligibility import product_rules
+from .forms import LoanApplicationForm, LoanProductForm
+from .importer import import_applications
+from .instrumentation import BUCKETS, collect, fold_exited_worker, registry
+from .jobs import LEASE, cancel_job, claim_next_job, enqueue, requeue_interrupted_jobs, run_job
+from .listing import SORT_FIELDS, encode_cursor, filter_applications, paginate_applications
+from .metrics import acompute_dashboard_metrics, compute_dashboard_metrics, get_dashboard_metrics
+from .events import funnel_summary, weekly_conversion
+from .search import search_application_ids
+from .stats import rebuild_employee_stats, verify_employee_stats
+from .transitions import bulk_transition
+from .trends import refresh_rollups, trend_series
+from .writes import batch_write
+from . import reference, urls as crm_urls
+from .models import (
+    ApplicationDocument, ApplicationStatusEvent, StoredBlob, DailyApplicationStat, DailyDisbursementStat, Disbursement,
+    Employee, EmployeeStats, FunnelStageStat, Job, LoanApplication, LoanProduct, RollupState,
+)
+from .query_budget import QUERY_BUDGETS, QueryBudgetMixin
+
+
+# Keep test runs out of the real file cache and metrics directory.
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    METRICS_DIR=tempfile.mkdtemp(),
+)
+class CRMTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Nothing left over for the registry's atexit flush.
+        self.addCleanup(registry.reset)
+        self.employee = Employee.objects.create(name='Asha Rao', email='asha@fincorp.com')
+        self.product = LoanProduct.objects.create(name='Personal Loan')
+
+    def create_application(self, **kwargs):
+        defaults = {
+            'name': 'Applicant',
+            'amount': Decimal('50000'),
+            'assigned_to': self.employee,
+            'loan_type': self.product,
+        }
+        defaults.update(kwargs)
+        return LoanApplication.objects.create(**defaults)
+
+
+class DashboardMetricsTests(CRMTestCase):
+    def test_counts_come_from_a_single_aggregate(self):
+        self.create_application(status='New')
+        self.create_application(status='Follow-up', document_status='Submitted')
+        self.create_application(status='Converted')
+
+        with self.assertNumQueries(2):
+            metrics = compute_dashboard_metrics()
+
+        self.assertEqual(metrics['total_applications_count'], 3)
+        self.assertEqual(metrics['new_today_count'], 3)
+        self.assertEqual(metrics['pending_docs_count'], 2)
+        self.assertEqual(metrics['follow_ups_count'], 1)
+        self.assertEqual(metrics['pipeline_counts']['Converted'], 1)
+        # The dashboard renders neither, so they are not computed or cached.
+        self.assertNotIn('recent_applications', metrics)
+        self.assertNotIn('top_employees', metrics)
+
+    def test_snapshot_is_served_from_cache_until_invalidated(self):
+        self.create_application()
+        self.assertEqual(get_dashboard_metrics()['total_applications_count'], 1)
+
+        with self.assertNumQueries(0):
+            get_dashboard_metrics()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_application()
+        self.assertEqual(get_dashboard_metrics()['total_applications_count'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Disbursement.objects.all().delete()
+            LoanApplication.objects.first().delete()
+        self.assertEqual(get_dashboard_metrics()['total_applications_count'], 1)
+
+    async def test_async_snapshot_matches_sync(self):
+        await sync_to_async(self.create_application)(status='Follow-up', name='Ravi')
+        metrics = await acompute_dashboard_metrics()
+        expected = await sync_to_async(compute_dashboard_metrics)()
+        metrics.pop('generated_at'), expected.pop('generated_at')
+        self.assertEqual(metrics, expected)
+        self.assertEqual(metrics['follow_ups'][0]['name'], 'Ravi')
+
+    def test_dashboard_renders(self):
+        self.create_application(status='Follow-up', name='Ravi')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Ravi')
+
+
+class ApplicationListTests(CRMTestCase):
+    def walk(self, params):
+        seen = []
+        params = dict(params, per_page=2)
+        while True:
+            page = paginate_applications(LoanApplication.objects.select_related('loan_type', 'assigned_to'), params)
+            seen.extend(app.name for app in page)
+            if not page.next_cursor:
+                return seen, page
+            params['after'] = page.next_cursor
+
+    def test_keyset_pages_cover_every_row_once(self):
+        for i, amount in enumerate([300, 100, 200, 100, 500]):
+            self.create_application(name=f'App {i}', amount=Decimal(amount))
+
+        names, _ = self.walk({'sort': 'amount'})
+        self.assertEqual(names, ['App 1', 'App 3', 'App 2', 'App 0', 'App 4'])
+
+        names, _ = self.walk({})
+        self.assertEqual(names, ['App 4', 'App 3', 'App 2', 'App 1', 'App 0'])
+
+    def test_previous_cursor_returns_prior_page(self):
+        for i in range(5):
+            self.create_application(name=f'App {i}')
+        first = paginate_applications(LoanApplication.objects.all(), {'per_page': 2})
+        second = paginate_applications(LoanApplication.objects.all(), {'per_page': 2, 'after': first.next_cursor})
+        back = paginate_applications(LoanApplication.objects.all(), {'per_page': 2, 'before': second.prev_cursor})
+        self.assertEqual([a.pk for a in back], [a.pk for a in first])
+        self.assertIsNone(back.prev_cursor)
+
+    def test_related_columns_are_not_sortable(self):
+        for i in range(3):
+            self.create_application(name=f'App {i}')
+        for sort in ('loan_type', '-banker'):
+            names, page = self.walk({'sort': sort})
+            self.assertEqual(page.sort, '-created')
+            self.assertEqual(names, ['App 2', 'App 1', 'App 0'])
+
+    def test_bad_page_size_and_cursors_fall_back(self):
+        for i in range(3):
+            self.create_application(name=f'App {i}')
+        url = reverse('application_list')
+        self.assertEqual(len(self.client.get(url, {'per_page': -5}).context['page']), 1)
+        for sort, value in (('amount', 'abc'), ('created', 'notadate'), ('status', 3), ('name', 7)):
+            with self.subTest(sort=sort):
+                response = self.client.get(url, {'sort': sort, 'after': encode_cursor(value, 1)})
+                self.assertEqual(len(response.context['page']), 3)
+
+    def test_unknown_sort_and_filters_are_ignored(self):
+        self.create_application(name='Kept', status='Verified')
+        self.create_application(name='Dropped', status='New')
+        response = self.client.get(reverse('application_list'), {
+            'sort': 'password', 'status': 'Verified', 'banker': self.employee.pk, 'product': 'x',
+        })
+        self.assertContains(response, 'Kept')
+        self.assertNotContains(response, 'Dropped')
+
+
+class SearchTests(CRMTestCase):
+    def test_index_follows_saves_updates_and_deletes(self):
+        app = self.create_application(name='Meera Iyer', phone='+91 98450-12345', email='meera@example.com')
+        self.create_application(name='Karan Shah', notes='Prefers evening calls')
+
+        self.assertEqual(search_application_ids('meer'), [app.pk])
+        self.assertEqual(search_application_ids('9845012'), [app.pk])
+        self.assertEqual(len(search_application_ids('asha')), 2)  # banker name
+
+        app.name = 'Meera Nair'
+        app.save()
+        self.assertEqual(search_application_ids('nair'), [app.pk])
+        self.assertEqual(search_application_ids('iyer'), [])
+
+        self.employee.name = 'Vikram Das'
+        self.employee.save()
+        self.assertEqual(len(search_application_ids('vikram')), 2)
+
+        app.delete()
+        self.assertEqual(search_application_ids('meera'), [])
+
+    def test_search_endpoint_ranks_and_filters(self):
+        best = self.create_application(name='Lakshmi', notes='Lakshmi referred by branch')
+        other = self.create_application(name='Ganesh', notes='Referred by Lakshmi', status='Verified')
+
+        response = self.client.get(reverse('application_search'), {'q': 'lakshmi'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [best.pk, other.pk])
+
+        response = self.client.get(reverse('application_search'), {'q': 'lakshmi', 'status': 'Verified'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [other.pk])
+
+        response = self.client.get(reverse('application_list'), {'q': 'ganesh'})
+        self.assertContains(response, 'Ganesh')
+        self.assertNotContains(response, '>Lakshmi<')
+
+    def test_search_page_size_and_page_are_bounded(self):
+        for i in range(4):
+            self.create_application(name=f'Lakshmi {i}')
+        url = reverse('application_search')
+        response = self.client.get(url, {'q': 'lakshmi', 'per_page': -5})
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertTrue(response.json()['has_next'])
+        response = self.client.get(url, {'q': 'lakshmi', 'page': '99999999999999999999'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+
+class ImportTests(CRMTestCase):
+    def upload(self, content):
+        return self.client.post(reverse('import_applications'), {
+            'csv_file': SimpleUploadedFile('applications.csv', content.encode('utf-8')),
+        })
+
+    def test_rows_are_imported_in_batches_with_error_report(self):
+        other = Employee.objects.create(name='Dev', email='dev@fincorp.com')
+        csv_rows = ['name,amount,assigned_to_email,email,phone']
+        csv_rows += [f'Applicant {i},{1000 + i},DEV@fincorp.com,,' for i in range(5)]
+        csv_rows += ['Broken,lots,,,', 'Bad Email,100,,not-an-email,', 'Fallback,200,unknown@x.com,,']
+        report = import_applications(io.BytesIO('\n'.join(csv_rows).encode()), batch_size=2)
+
+        self.assertEqual(report.rows, 8)
+        self.assertEqual(report.imported, 6)
+        self.assertEqual([error['line'] for error in report.errors], [7, 8])
+        self.assertEqual(LoanApplication.objects.filter(assigned_to=other).count(), 5)
+        self.assertEqual(LoanApplication.objects.get(name='Fallback').assigned_to, self.employee)
+
+
+    def test_rows_are_screened_against_eligibility_rules(self):
+        self.product.eligibility_criteria = 'employment_type = "Salaried"'
+        self.product.save()
+        cheap = LoanProduct.objects.create(
+            name='Gold Loan', interest_rate=Decimal('8'), min_amount=Decimal('1000'), max_amount=Decimal('20000'),
+        )
+        csv_rows = [
+            'name,amount,employment_type,loan_type',
+            'Small,15000,Salaried,',
+            'Large,50000,Salaried,',
+            'Nowhere,5000000,Salaried,',
+            'Flagged,50000,self-employed,personal loan',
+            'Unknown,50000,Salaried,Boat Loan',
+        ]
+        report = import_applications(io.BytesIO('\n'.join(csv_rows).encode()))
+
+        self.assertEqual(report.imported, 4)
+        self.assertEqual(report.suggested, 2)
+        self.assertEqual([warning['line'] for warning in report.warnings], [5])
+        self.assertIn('employment_type = "Salaried"', report.warnings[0]['message'])
+        self.assertEqual(report.errors[0]['line'], 6)
+        loan_types = dict(LoanApplication.objects.values_list('name', 'loan_type'))
+        self.assertEqual(loan_types, {'Small': cheap.pk, 'Large': self.product.pk, 'Nowhere': None, 'Flagged': self.product.pk})
+
+
+class AssignmentTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dev = Employee.objects.create(name='Dev', email='dev@fincorp.com', designation='Sales Executive')
+        self.manager = Employee.objects.create(name='Mira', email='mira@fincorp.com', designation='Manager')
+        for status in ['New', 'Verified', 'Converted', 'Rejected']:
+            self.create_application(status=status)
+
+    def test_least_loaded_seeds_from_open_workload(self):
+        with self.assertNumQueries(1):
+            scheduler = AssignmentScheduler.load_from_db('least_loaded')
+        self.assertEqual(scheduler.load, {self.employee.pk: 2, self.dev.pk: 0})
+        picks = [scheduler.assign() for _ in range(4)]
+        self.assertEqual(picks, [self.dev.pk, self.dev.pk, self.employee.pk, self.dev.pk])
+
+    def test_round_robin_resumes_across_schedulers(self):
+        picks = [assign_banker('round_robin') for _ in range(3)]
+        self.assertEqual(picks, [self.employee.pk, self.dev.pk, self.employee.pk])
+
+    def test_noted_lead_does_not_cost_a_round_robin_turn(self):
+        scheduler = AssignmentScheduler({self.employee.pk: 0, self.dev.pk: 0}, 'round_robin')
+        scheduler.note(self.employee.pk)
+        self.assertEqual(scheduler.load[self.employee.pk], 1)
+        self.assertEqual([scheduler.assign() for _ in range(2)], [self.employee.pk, self.dev.pk])
+
+    def test_import_and_form_use_the_scheduler(self):
+        csv_rows = ['name,amount,assigned_to_email'] + [f'Lead {i},1000,' for i in range(4)] + ['Named,1000,mira@fincorp.com']
+        import_applications(io.BytesIO('\n'.join(csv_rows).encode()))
+        owners = Counter(LoanApplication.objects.filter(name__startswith='Lead').values_list('assigned_to', flat=True))
+        self.assertEqual(owners, {self.dev.pk: 3, self.employee.pk: 1})
+        self.assertEqual(LoanApplication.objects.get(name='Named').assigned_to, self.manager)
+
+        form = LoanApplicationForm(data={
+            'name': 'Walk-in', 'loan_type': self.product.pk, 'employment_type': 'Salaried', 'amount': '50000',
+            'status': 'New', 'document_status': 'Pending',
+        })
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.save().assigned_to, self.employee)  # 3 open each; ties go to the lower pk
+
+
+class EligibilityTests(CRMTestCase):
+    def test_rules_compile_once_per_product_version(self):
+        self.product.eligibility_criteria = (
+            '# Salaried applicants, or large self-employed loans\n'
+            'employment_type = "Salaried" or amount >= 200000\n'
+            'tenure_months between 12 and 84\n'
+        )
+        self.product.save()
+        rules = product_rules(self.product)
+        self.assertIs(product_rules(LoanProduct.objects.get(pk=self.product.pk)), rules)
+        self.assertEqual(rules.failures(Decimal('50000'), 'Salaried'), [])
+        self.assertEqual(
+            rules.failures(Decimal('50000'), 'Self-employed', 120),
+            ['employment_type = "Salaried" or amount >= 200000', 'tenure_months between 12 and 84'],
+        )
+        self.assertEqual(rules.failures(Decimal('5'), 'Salaried'), ['amount between min_amount and max_amount'])
+
+        self.product.max_amount = Decimal('40000')
+        self.product.save()
+        self.assertIsNot(product_rules(self.product), rules)
+
+    def test_invalid_rules_are_rejected_by_the_forms(self):
+        form = LoanProductForm(data={
+            'name': 'Car Loan', 'interest_rate': '9', 'processing_fee': '1', 'tenure_months': '60',
+            'min_amount': '1000', 'max_amount': '100000', 'eligibility_criteria': 'amount >= 1\nsalary > 5',
+        })
+        self.assertEqual(form.errors['eligibility_criteria'], ['Line 2: Unknown name "salary".'])
+
+        self.product.eligibility_criteria = 'employment_type = "Salaried"'
+        self.product.save()
+        data = {
+            'name': 'A', 'loan_type': self.product.pk, 'employment_type': 'Self-employed', 'amount': '50000',
+            'assigned_to': self.employee.pk, 'status': 'New', 'document_status': 'Pending',
+        }
+        form = LoanApplicationForm(data=data)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.eligibility_warning, 'Not eligible for Personal Loan: employment_type = "Salaried"')
+
+        # Ineligible applications are flagged, not blocked, so they can still be rejected.
+        application = form.save()
+        response = self.client.get(reverse('application_update', args=[application.pk]))
+        self.assertContains(response, 'Not eligible for Personal Loan')
+        response = self.client.post(
+            reverse('application_update', args=[application.pk]), {**data, 'status': 'Rejected'}, follow=True,
+        )
+        self.assertEqual(LoanApplication.objects.get(pk=application.pk).status, 'Rejected')
+        self.assertContains(response, 'Not eligible for Personal Loan')
+
+
+
+class EmployeeStatsTests(CRMTestCase):
+    def stats(self, employee=None):
+        return EmployeeStats.objects.get(employee=employee or self.employee)
+
+    def test_rollup_follows_status_changes_reassignment_and_deletes(self):
+        other = Employee.objects.create(name='Dev', email='dev@fincorp.com')
+        app = self.create_application(status='New', amount=Decimal('75000'))
+        self.create_application(status='Rejected')
+
+        app.status = 'Converted'
+        app.save()
+        stats = self.stats()
+        self.assertEqual((stats.new_count, stats.converted_count, stats.rejected_count), (0, 1, 1))
+        self.assertEqual((stats.deals_closed, stats.disbursed_total), (1, Decimal('75000')))
+        self.assertEqual(stats.conversion_rate, 50.0)
+
+        app.disbursement.delete()
+        app.assigned_to = other
+        app.save()
+        self.assertEqual(self.stats().converted_count, 0)
+        self.assertEqual(self.stats().disbursed_total, 0)
+        self.assertEqual(self.stats(other).converted_count, 1)
+
+        app.delete()
+        self.assertEqual(self.stats(other).total_applications, 0)
+        self.assertEqual(verify_employee_stats(), {})
+
+    def test_import_and_rebuild_agree(self):
+        csv_rows = ['name,amount'] + [f'Applicant {i},{1000 + i}' for i in range(3)]
+        import_applications(io.BytesIO('\n'.join(csv_rows).encode()), batch_size=2)
+        self.assertEqual(self.stats().new_count, 3)
+
+        EmployeeStats.objects.update(new_count=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_employee_stats', verify=True, stderr=io.StringIO())
+        rebuild_employee_stats()
+        self.assertEqual(self.stats().new_count, 3)
+
+    def test_report_reads_from_rollup(self):
+        self.create_application(status='Converted', amount=Decimal('20000'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('employee_report'))
+        self.assertContains(response, '20000')
+
+
+class ChangeTrackingTests(CRMTestCase):
+    def test_changed_fields_and_partial_saves(self):
+        app = LoanApplication.objects.get(pk=self.create_application(status='New').pk)
+        self.assertEqual(app.changed_fields, set())
+        with self.assertNumQueries(0):
+            app.save()
+
+        app.status = 'Contacted'
+        app.notes = 'Call back Monday'
+        self.assertEqual(app.changed_fields, {'status', 'notes'})
+        self.assertEqual(app.previous('status'), 'New')
+        with CaptureQueriesContext(connection) as queries:
+            app.save()
+        update = next(q['sql'] for q in queries if q['sql'].startswith('UPDATE "crm_loanapplication"'))
+        self.assertNotIn('"name"', update)
+        self.assertEqual(app.changed_fields, set())
+        self.assertEqual(app.previous('status'), 'Contacted')
+
+    def test_resaving_converted_application_skips_disbursement_lookup(self):
+        app = self.create_application(status='Converted')
+        app = LoanApplication.objects.get(pk=app.pk)
+        app.notes = 'Disbursed on time'
+        with CaptureQueriesContext(connection) as queries:
+            app.save()
+        self.assertFalse(any('crm_disbursement' in q['sql'] for q in queries))
+        self.assertEqual(Disbursement.objects.filter(application=app).count(), 1)
+
+
+class StatusEventTests(CRMTestCase):
+    def test_transitions_are_logged_and_aggregated_per_event(self):
+        app = self.create_application(status='New')
+        LoanApplication.objects.filter(pk=app.pk).update(status_changed_at=timezone.now() - timedelta(days=2))
+        app = LoanApplication.objects.get(pk=app.pk)
+        app.status = 'Follow-up'
+        app.document_status = 'Submitted'
+        app.save()
+        app.notes = 'No transition here'
+        app.save()
+
+        events = list(ApplicationStatusEvent.objects.filter(application=app).values_list('kind', 'from_value', 'to_value'))
+        self.assertEqual(events, [
+            ('status', '', 'New'), ('document', '', 'Pending'),
+            ('status', 'New', 'Follow-up'), ('document', 'Pending', 'Submitted'),
+        ])
+        new = FunnelStageStat.objects.get(kind='status', stage='New')
+        self.assertEqual((new.entered, new.exited, new.current, new.average_days), (1, 1, 0, 2.0))
+
+        bulk_transition([app.pk], 'Converted')
+        summary = {row.stage: row for row in funnel_summary('status')}
+        self.assertEqual(summary['Converted'].entered, 1)
+        self.assertEqual(summary['Follow-up'].current, 0)
+        week = weekly_conversion(weeks=1)[0]
+        self.assertEqual(week[1:], (1, 1, 100.0))
+
+    def test_funnel_report_reads_aggregates_only(self):
+        for _ in range(3):
+            self.create_application()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('funnel_report'))
+        self.assertContains(response, 'Weekly Conversion')
+
+
+class BulkTransitionTests(CRMTestCase):
+    def test_converts_in_bulk_with_disbursements_and_per_row_outcomes(self):
+        apps = [self.create_application(name=f'Applicant {i}', amount=Decimal('1000')) for i in range(3)]
+        already = self.create_application(status='Converted')
+        ids = [app.pk for app in apps] + [already.pk, 999999]
+
+        # Constant in the number of rows: select, update, disbursement insert,
+        # EmployeeStats updates, then the event insert and funnel updates.
+        with self.assertNumQueries(14):
+            response = self.client.post(
+                reverse('application_bulk_status'),
+                data=json.dumps({'ids': ids, 'status': 'Converted'}), content_type='application/json',
+            )
+        data = response.json()
+        self.assertEqual(data['summary'], {'updated': 3, 'unchanged': 1, 'not_found': 1, 'disbursements_created': 3})
+        self.assertEqual([row['outcome'] for row in data['results']][-2:], ['unchanged', 'not_found'])
+        self.assertEqual(Disbursement.objects.count(), 4)
+        self.assertEqual(Disbursement.objects.get(application=apps[0]).banker, self.employee)
+        self.assertEqual(verify_employee_stats(), {})
+
+    def test_converted_application_without_disbursement_is_left_alone(self):
+        # Both paths only create a disbursement on a real move to Converted.
+        app = self.create_application(status='Converted')
+        Disbursement.objects.filter(application=app).delete()
+        app.notes = 'Re-saved'
+        app.save()
+        self.assertFalse(Disbursement.objects.filter(application=app).exists())
+
+        [result] = bulk_transition([app.pk], 'Converted')
+        self.assertEqual((result.outcome, result.disbursed), ('unchanged', False))
+        self.assertFalse(Disbursement.objects.filter(application=app).exists())
+
+    def test_list_form_renders_results(self):
+        app = self.create_application()
+        response = self.client.post(reverse('application_bulk_status'), {'ids': [app.pk], 'status': 'Rejected'})
+        self.assertContains(response, 'Moved to Rejected')
+        app.refresh_from_db()
+        self.assertEqual(app.status, 'Rejected')
+
+
+class TrendRollupTests(CRMTestCase):
+    def backdate(self, app, days):
+        moment = timezone.now() - timedelta(days=days)
+        LoanApplication.objects.filter(pk=app.pk).update(created_at=moment, updated_at=moment)
+
+    def series(self, days=10):
+        today = timezone.localdate()
+        return trend_series(today - timedelta(days=days - 1), today)
+
+    def test_incremental_refresh_only_rebuilds_touched_days(self):
+        old = self.create_application(status='New')
+        self.backdate(old, 3)
+        self.create_application(status='Converted', amount=Decimal('30000'))
+        self.assertEqual(refresh_rollups(), 2)
+
+        series = self.series()
+        self.assertEqual(series['created']['New'][-4], 1)
+        self.assertEqual(series['created']['Converted'][-1], 1)
+        self.assertEqual(series['disbursed_amount'][-1], 30000.0)
+
+        # Pretend the last run was long after today's writes: only the day
+        # of the deleted row, which no watermark scan can see, is rebuilt.
+        RollupState.objects.update(watermark=timezone.now() + timedelta(hours=1))
+        LoanApplication.objects.get(pk=old.pk).delete()
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertEqual(self.series()['created']['New'][-4], 0)
+        self.assertFalse(DailyApplicationStat.objects.filter(status='New').exists())
+
+    def test_product_delete_and_disbursement_edit_rebuild_their_days(self):
+        app = self.create_application(status='Converted', amount=Decimal('30000'))
+        self.backdate(app, 2)
+        refresh_rollups()
+        RollupState.objects.update(watermark=timezone.now() - timedelta(hours=1))
+        disbursement = Disbursement.objects.get()
+        disbursement.amount = Decimal('45000')
+        disbursement.save()
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertEqual(self.series()['disbursed_amount'][-1], 45000.0)
+
+        RollupState.objects.update(watermark=timezone.now() + timedelta(hours=1))
+        self.product.delete()
+        self.assertEqual(refresh_rollups(), 2)
+        self.assertEqual(DailyApplicationStat.objects.get().product_id, None)
+        self.assertEqual(DailyDisbursementStat.objects.get().product_id, None)
+
+    def test_trends_view_reads_rollups(self):
+        self.create_application(loan_type=None)
+        refresh_rollups()
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('pipeline_trends'), {'days': 30, 'product': self.product.pk})
+        self.assertEqual(len(response.context['series']['labels']), 30)
+        self.assertEqual(sum(response.context['series']['created']['New']), 0)
+
+
+class ExportTests(CRMTestCase):
+    def download(self, name, params=None):
+        response = self.client.get(reverse(name), params or {})
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_application_export_applies_list_filters(self):
+        self.create_application(name='Kept', status='Verified')
+        self.create_application(name='Dropped', status='New')
+        rows = self.download('application_export', {'status': 'Verified'})
+        self.assertEqual(rows[0][:2], ['ID', 'Applicant Name'])
+        self.assertEqual([row[1] for row in rows[1:]], ['Kept'])
+
+    def test_disbursement_and_report_exports(self):
+        other = Employee.objects.create(name='Dev', email='dev@fincorp.com')
+        self.create_application(name='Mine', status='Converted', amount=Decimal('1000'))
+        self.create_application(name='Theirs', status='Converted', assigned_to=other)
+
+        rows = self.download('disbursement_export', {'banker': other.pk})
+        self.assertEqual([row[2] for row in rows[1:]], ['Theirs'])
+
+        rows = self.download('employee_report_export')
+        self.assertEqual(rows[1][1:2] + rows[1][4:6], ['Dev', '1', '50000.00'])
+        self.assertEqual(rows[2][-1], '100.0')
+
+    async def test_exports_stream_asynchronously_under_asgi(self):
+        for i in range(3):
+            await sync_to_async(self.create_application)(name=f'Applicant {i}')
+        response = await self.async_client.get(reverse('application_export'))
+        self.assertTrue(response.is_async)
+        body = b''.join([part async for part in response.streaming_content]).decode()
+        self.assertEqual(len(list(csv.reader(io.StringIO(body)))), 4)
+
+
+class ApiTests(CRMTestCase):
+    def test_cursor_pagination_and_sparse_fields(self):
+        apps = [self.create_application(name=f'Applicant {i}') for i in range(3)]
+        response = self.client.get(reverse('api_application_list'), {'limit': 2, 'fields': 'id,name,amount'})
+        data = response.json()
+        self.assertEqual(data['results'][0], {'id': apps[2].pk, 'name': 'Applicant 2', 'amount': '50000.00'})
+        data = self.client.get(data['next']).json()
+        self.assertEqual([row['id'] for row in data['results']], [apps[0].pk])
+        self.assertIsNone(data['next'])
+
+        response = self.client.get(reverse('api_application_list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_conditional_get_returns_304_until_data_changes(self):
+        app = self.create_application()
+        url = reverse('api_application_list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        # Renaming the product changes the serialized loan_type, so the ETag too.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Home Loan'
+            self.product.save()
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['results'][0]['loan_type'], 'Home Loan')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            app.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=second['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(url, {'limit': -5}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'updated_since': '2024-13-45T00:00:00'}).status_code, 400)
+
+        detail = self.client.get(reverse('api_product_detail', args=[self.product.pk]))
+        self.assertIn('Last-Modified', detail)
+        cached = self.client.get(
+            reverse('api_product_detail', args=[self.product.pk]), HTTP_IF_MODIFIED_SINCE=detail['Last-Modified'],
+        )
+        self.assertEqual(cached.status_code, 304)
+
+
+class AmortizationTests(CRMTestCase):
+    def test_schedule_amortizes_to_zero(self):
+        rows = schedule(Decimal('100000'), Decimal('12'), 12, start=timezone.localdate().replace(month=1, day=15))
+        self.assertEqual(rows[0]['payment'], Decimal('8884.88'))
+        self.assertEqual(rows[0]['interest'], Decimal('1000.00'))
+        self.assertEqual(rows[0]['due'].month, 2)
+        self.assertEqual(rows[-1]['balance'], Decimal('0.00'))
+        self.assertAlmostEqual(sum(row['principal'] for row in rows), Decimal('100000'), delta=Decimal('0.05'))
+        self.assertEqual(float(emi(1200, 0, 12)), 100.0)
+
+    def test_portfolio_projection_matches_per_loan_schedules(self):
+        loans = [(250000, 10.5, 36, 0), (80000, 14, 12, 5), (50000, 0, 10, 9), (10000, 9, 6, 20)]
+        principal, interest, active = project_loans(*zip(*loans), horizon=6)
+        expected_principal, expected_interest = [0.0] * 6, [0.0] * 6
+        for amount, rate, months, elapsed in loans:
+            for row in schedule(amount, rate, months):
+                month = row['number'] - elapsed
+                if 0 <= month < 6:
+                    expected_principal[month] += float(row['principal'])
+                    expected_interest[month] += float(row['interest'])
+        for month in range(6):
+            self.assertAlmostEqual(principal[month], expected_principal[month], delta=0.05)
+            self.assertAlmostEqual(interest[month], expected_interest[month], delta=0.05)
+        self.assertEqual(list(active), [2, 3, 2, 2, 2, 2])
+
+    def test_projection_reads_the_disbursement_book(self):
+        self.product.interest_rate = Decimal('12')
+        self.product.save()
+        self.create_application(status='Converted', amount=Decimal('100000'), tenure_months=12)
+        projection = project_portfolio(months=14, start=shift_month(timezone.localdate(), 1))
+        self.assertEqual(projection[0]['total'], Decimal('8884.88'))
+        self.assertEqual(projection[0]['active'], 1)
+        self.assertEqual(projection[12]['active'], 0)
+
+        response = self.client.get(reverse('portfolio_projection'), {'months': 24})
+        self.assertEqual(len(response.context['projection']), 24)
+
+    def test_quote_endpoint(self):
+        url = reverse('application_quote')
+        response = self.client.get(url, {'product': self.product.pk, 'amount': '50000', 'tenure': '24'})
+        data = response.json()
+        self.assertEqual(data['tenure_months'], 24)
+        self.assertEqual(len(data['schedule']), 24)
+        self.assertEqual(data['processing_fee'], '500.00')
+        self.assertTrue(data['within_limits'])
+        self.assertEqual(self.client.get(url, {'product': self.product.pk, 'amount': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'product': self.product.pk, 'amount': '1', 'tenure': '999'}).status_code, 400)
+        for amount in ('1e400', '10000000000'):
+            self.assertEqual(self.client.get(url, {'product': self.product.pk, 'amount': amount}).status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DocumentStorageTests(CRMTestCase):
+    def upload(self, name, content):
+        return ApplicationDocument.objects.create(
+            application=self.create_application(), title='ID Proof', file=SimpleUploadedFile(name, content),
+        )
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_documents_list_pages_through_every_upload(self):
+        uploaded = [self.upload(f'doc{i}.pdf', b'%PDF-1.4') for i in range(5)]
+        seen, params = [], {'per_page': 2}
+        while True:
+            page = self.client.get(reverse('documents'), params).context['page']
+            seen.extend(doc.pk for doc in page)
+            if not page.next_cursor:
+                break
+            params['after'] = page.next_cursor
+        self.assertEqual(seen, [doc.pk for doc in reversed(uploaded)])
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.upload('passport.pdf', b'%PDF-1.4 same bytes')
+        second = self.upload('passport-again.pdf', b'%PDF-1.4 same bytes')
+        other = self.upload('payslip.pdf', b'%PDF-1.4 different bytes')
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/'))
+        self.assertNotEqual(first.file.name, other.file.name)
+        self.assertEqual(second.original_name, 'passport-again.pdf')
+        self.assertEqual(StoredBlob.objects.get(pk=first.file.name).ref_count, 2)
+        with first.file.storage.open(first.file.name) as stored:
+            self.assertEqual(stored.read(), b'%PDF-1.4 same bytes')
+
+    def test_garbage_collection_removes_only_unreferenced_blobs(self):
+        first = self.upload('a.pdf', b'shared')
+        second = self.upload('b.pdf', b'shared')
+        storage, name = first.file.storage, first.file.name
+
+        first.delete()
+        self.assertEqual(collect_garbage(grace=timedelta(0))['removed'], [])
+        self.assertTrue(storage.exists(name))
+
+        second.delete()
+        self.assertEqual(StoredBlob.objects.get(pk=name).ref_count, 0)
+        self.assertEqual(collect_garbage(grace=timedelta(hours=1))['removed'], [])
+        self.assertEqual(collect_garbage(grace=timedelta(0))['removed'], [name])
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(StoredBlob.objects.filter(pk=name).exists())
+
+    def test_replacing_a_file_moves_the_reference(self):
+        document = self.upload('a.pdf', b'old')
+        old_name = document.file.name
+        document = ApplicationDocument.objects.get(pk=document.pk)
+        document.file = SimpleUploadedFile('b.pdf', b'new')
+        document.save()
+
+        self.assertEqual(StoredBlob.objects.get(pk=old_name).ref_count, 0)
+        self.assertEqual(StoredBlob.objects.get(pk=document.file.name).ref_count, 1)
+        self.assertEqual(document.original_name, 'b.pdf')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), DOCUMENT_SENDFILE_HEADER='')
+class DocumentDownloadTests(CRMTestCase):
+    content = b'%PDF-1.4 ' + bytes(range(256)) * 40
+
+    def setUp(self):
+        super().setUp()
+        self.document = ApplicationDocument.objects.create(
+            application=self.create_application(), title='Income Proof',
+            file=SimpleUploadedFile('salary slip.pdf', self.content),
+        )
+        self.url = reverse('document_download', args=[self.document.pk])
+        self.client.force_login(get_user_model().objects.create_user('officer', password='pw'))
+
+    def test_requires_login(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
+
+    def test_full_download_and_revalidation(self):
+        response = self.client.get(self.url, {'download': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertIn('salary slip.pdf', response['Content-Disposition'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(response['ETag'], '"%s"' % self.document.file.name.rsplit('/', 1)[-1])
+
+        cached = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=100-199'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        suffix = self.client.get(self.url, headers={'Range': 'bytes=-10'})
+        self.assertEqual(b''.join(suffix.streaming_content), self.content[-10:])
+
+        stale = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"other"'})
+        self.assertEqual(stale.status_code, 200)
+
+        beyond = self.client.get(self.url, headers={'Range': f'bytes={len(self.content)}-'})
+        self.assertEqual(beyond.status_code, 416)
+        self.assertEqual(beyond['Content-Range'], f'bytes */{len(self.content)}')
+
+    @override_settings(DOCUMENT_SENDFILE_HEADER='X-Accel-Redirect', DOCUMENT_SENDFILE_PREFIX='/protected/')
+    def test_sendfile_offload(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.document.file.name)
+        self.assertEqual(response.content, b'')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DocumentBundleTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_user('officer', password='pw'))
+
+    def upload(self, application, name, content):
+        ApplicationDocument.objects.create(
+            application=application, title='ID Proof', file=SimpleUploadedFile(name, content),
+        )
+
+    def download(self, url, data=None):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_application_bundle(self):
+        app = self.create_application(name='Asha Rao')
+        self.upload(app, 'id.pdf', b'first')
+        self.upload(app, 'id.pdf', b'second')
+        self.upload(self.create_application(name='Other'), 'x.pdf', b'other')
+
+        archive = self.download(reverse('application_documents_zip', args=[app.pk]))
+        self.assertIsNone(archive.testzip())
+        names = archive.namelist()
+        self.assertEqual(len(names), 2)
+        self.assertEqual(len(set(names)), 2)
+        self.assertTrue(all(name.startswith(f'APP-{app.pk + 1000}_Asha_Rao/') for name in names))
+        self.assertEqual(sorted(archive.read(name) for name in names), [b'first', b'second'])
+
+    def test_filtered_bundle(self):
+        verified = self.create_application(name='Recent', status='Verified')
+        old = self.create_application(name='Old', status='Verified')
+        LoanApplication.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+        self.upload(verified, 'a.pdf', b'recent')
+        self.upload(old, 'b.pdf', b'old')
+        self.upload(self.create_application(name='New'), 'c.pdf', b'new')
+
+        since = (timezone.localdate() - timedelta(days=7)).isoformat()
+        archive = self.download(reverse('document_bundle'), {'status': 'Verified', 'created_from': since})
+        self.assertEqual([archive.read(name) for name in archive.namelist()], [b'recent'])
+
+        archive = self.download(reverse('document_bundle'), {'status': 'Verified', 'created_to': '2024-02-30'})
+        self.assertEqual(len(archive.namelist()), 2)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ReferenceCacheTests(CRMTestCase):
+    def test_form_choices_come_from_the_cache_until_a_product_changes(self):
+        with self.assertNumQueries(2):
+            LoanApplicationForm().as_p()
+        with self.assertNumQueries(0):
+            html = LoanApplicationForm().as_p()
+        self.assertIn('Asha Rao (Loan Officer)', html)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            LoanProduct.objects.create(name='Car Loan')
+        with self.assertNumQueries(1):
+            self.assertIn('Car Loan', LoanApplicationForm().as_p())
+        self.assertEqual(reference.product(self.product.pk).name, 'Personal Loan')
+
+    def test_cached_choices_are_still_validated(self):
+        form = LoanApplicationForm(data={
+            'name': 'Walk-in', 'loan_type': 999, 'employment_type': 'Salaried', 'amount': '50000',
+            'status': 'New', 'document_status': 'Pending',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('loan_type', form.errors)
+
+    def test_autocomplete_pages_and_searches_applications(self):
+        for i in range(25):
+            self.create_application(name=f'Applicant {i}')
+        self.create_application(name='Zara Khan')
+        response = self.client.get(reverse('application_autocomplete'))
+        data = response.json()
+        self.assertEqual(len(data['results']), 20)
+        self.assertTrue(data['more'])
+        self.assertEqual(data['results'][0]['text'], 'Zara Khan - Personal Loan')
+
+        data = self.client.get(reverse('application_autocomplete'), {'page': 2}).json()
+        self.assertEqual(len(data['results']), 6)
+        self.assertFalse(data['more'])
+
+        data = self.client.get(reverse('application_autocomplete'), {'q': 'zar'}).json()
+        self.assertEqual([item['text'] for item in data['results']], ['Zara Khan - Personal Loan'])
+
+    def test_document_form_does_not_list_every_application(self):
+        application = self.create_application(name='Zara Khan')
+        response = self.client.get(reverse('documents'))
+        self.assertNotContains(response, 'Zara Khan')
+        response = self.client.post(reverse('documents'), {
+            'application': application.pk, 'title': 'PAN', 'status': 'Pending',
+            'file': SimpleUploadedFile('pan.pdf', b'%PDF-1.4'),
+        })
+        self.assertRedirects(response, reverse('documents'))
+        self.assertEqual(application.documents.get().title, 'PAN')
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=3600)
+class InstrumentationTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        overrides = override_settings(METRICS_DIR=directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_server_timing_reports_queries_and_template_time(self):
+        self.create_application()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('application_list'))
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'app', 'db', 'tpl'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+        self.assertGreater(float(timing['tpl'].split('=')[1]), 0)
+
+    def test_metrics_sum_histograms_across_processes(self):
+        for _ in range(2):
+            self.client.get(reverse('employee_list'))
+        # Another worker's flushed totals.
+        other = {
+            'view': 'employee_list', 'method': 'GET', 'buckets': [0] * len(BUCKETS) + [1],
+            'sum': 12.0, 'count': 1, 'queries': 1, 'sql_seconds': 0.5, 'template_seconds': 0.25,
+        }
+        with open(os.path.join(settings.METRICS_DIR, '1.json'), 'w') as handle:
+            json.dump([other], handle)
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.client.force_login(get_user_model().objects.create_user('ops', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        lines = response.content.decode().splitlines()
+        labels = '{view="employee_list",method="GET"}'
+        self.assertIn(f'crm_request_duration_seconds_count{labels} 3', lines)
+        self.assertIn('crm_request_duration_seconds_bucket{view="employee_list",method="GET",le="+Inf"} 3', lines)
+        # The second local request is served from the reference cache.
+        self.assertIn(f'crm_request_queries_total{labels} 2', lines)
+
+    def test_exited_workers_are_folded_into_one_file(self):
+        row = {
+            'view': 'employee_list', 'method': 'GET', 'buckets': [1] + [0] * len(BUCKETS),
+            'sum': 0.001, 'count': 1, 'queries': 1, 'sql_seconds': 0.0, 'template_seconds': 0.0,
+        }
+        for pid in (1, 2):
+            with open(os.path.join(settings.METRICS_DIR, f'{pid}.json'), 'w') as handle:
+                json.dump([row], handle)
+        fold_exited_worker(1)
+        fold_exited_worker(2)
+        self.assertEqual(os.listdir(settings.METRICS_DIR), ['exited.json'])
+        self.assertEqual(collect()[('employee_list', 'GET')]['count'], 2)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class JobTests(CRMTestCase):
+    def run_next_job(self):
+        job_id = claim_next_job()
+        self.assertIsNotNone(job_id)
+        run_job(job_id)
+        return Job.objects.get(pk=job_id)
+
+    def test_import_is_queued_and_run_by_worker(self):
+        response = self.client.post(reverse('import_applications'), {
+            'csv_file': SimpleUploadedFile('applications.csv', b'name,amount\nGood,100\nBad,abc\n'),
+        })
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.pk]))
+        self.assertFalse(LoanApplication.objects.exists())
+
+        job = self.run_next_job()
+        self.assertEqual(job.status, 'Succeeded')
+        self.assertEqual(job.result['imported'], 1)
+        self.assertEqual(job.result['errors'][0]['line'], 3)
+
+        data = self.client.get(reverse('job_status', args=[job.pk])).json()
+        self.assertEqual(data['progress']['percent'], 100)
+
+    def test_failed_import_retries_from_last_checkpoint(self):
+        job = enqueue('import_applications', input_file=SimpleUploadedFile('a.csv', b'name,amount\nA,1\nB,2\n'))
+        job.result = {'rows': 1, 'imported': 1, 'error_count': 0, 'errors': []}
+        job.save()
+
+        with mock.patch('crm.jobs.import_applications', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('crm.jobs', 'ERROR'):
+            job = self.run_next_job()
+        self.assertEqual(job.status, 'Queued')
+        self.assertIn('disk full', job.error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        job = self.run_next_job()
+        self.assertEqual(job.status, 'Succeeded')
+        self.assertEqual(list(LoanApplication.objects.values_list('name', flat=True)), ['B'])
+        self.assertEqual(job.result['imported'], 2)
+
+    def test_cancel_queued_and_running_jobs(self):
+        queued = enqueue('export_applications')
+        self.client.post(reverse('job_cancel', args=[queued.pk]))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'Cancelled')
+        self.assertIsNone(claim_next_job())
+
+        running = enqueue('export_applications')
+        claim_next_job()
+        cancel_job(running)
+        run_job(running.pk)
+        running.refresh_from_db()
+        self.assertEqual(running.status, 'Cancelled')
+
+    def test_only_jobs_with_expired_lease_are_requeued(self):
+        live, dead = enqueue('export_applications'), enqueue('export_applications')
+        claim_next_job(), claim_next_job()
+        Job.objects.filter(pk=dead.pk).update(updated_at=timezone.now() - LEASE - timedelta(seconds=1))
+        self.assertEqual(requeue_interrupted_jobs(), 1)
+        self.assertEqual(Job.objects.get(pk=live.pk).status, 'Running')
+        self.assertEqual(Job.objects.get(pk=dead.pk).status, 'Queued')
+
+        # Interrupted on its last attempt: failed, not requeued again.
+        claim_next_job()
+        Job.objects.filter(pk=dead.pk).update(max_attempts=2, updated_at=timezone.now() - LEASE - timedelta(seconds=1))
+        self.assertEqual(requeue_interrupted_jobs(), 0)
+        self.assertEqual(Job.objects.get(pk=dead.pk).status, 'Failed')
+
+    def test_export_job_writes_downloadable_csv(self):
+        self.create_application(name='Exported', status='Verified')
+        self.create_application(name='Filtered Out', status='New')
+        self.client.post(reverse('application_export_job'), {'status': 'Verified'})
+        job = self.run_next_job()
+        self.assertEqual(job.result['rows'], 1)
+
+        response = self.client.get(reverse('job_download', args=[job.pk]))
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Exported', content)
+        self.assertNotIn('Filtered Out', content)
+
+
+class SQLiteConcurrencyTests(unittest.TestCase):
+    """Concurrent writers against a file database using the production profile.
+
+    A plain unittest case: Django's TestCase forbids the threaded
+    connections this needs, and the test database is not touched.
+    """
+
+    WORKERS = 8
+    INCREMENTS = 25
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        connections.settings['stress'] = dict(
+            connections.settings['default'], NAME=os.path.join(directory, 'stress.sqlite3'),
+        )
+        self.addCleanup(connections.settings.pop, 'stress')
+        self.addCleanup(self.close_stress_connection)
+        overrides = override_settings(BATCH_WRITE_LOCK=os.path.join(directory, 'batch.lock'), BATCH_WRITE_PAUSE=0.01)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        with connections['stress'].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, n INTEGER NOT NULL)')
+            cursor.execute('INSERT INTO counter VALUES (1, 0)')
+            cursor.execute('CREATE TABLE batch_row (id INTEGER PRIMARY KEY, batch INTEGER NOT NULL)')
+
+    def close_stress_connection(self):
+        connections['stress'].close()
+        del connections['stress']
+
+    def run_threads(self, *targets):
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except OperationalError as e:
+                errors.append(e)
+            finally:
+                connections['stress'].close()
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def increment(self):
+        # Read then write in one transaction: with a deferred BEGIN two of
+        # these deadlock and one fails at once with "database is locked".
+        for _ in range(self.INCREMENTS):
+            with transaction.atomic(using='stress'), connections['stress'].cursor() as cursor:
+                cursor.execute('SELECT n FROM counter WHERE id = 1')
+                cursor.execute('UPDATE counter SET n = %s WHERE id = 1', [cursor.fetchone()[0] + 1])
+
+    def write_batches(self):
+        for batch in range(5):
+            with batch_write(using='stress'), connections['stress'].cursor() as cursor:
+                cursor.executemany('INSERT INTO batch_row (batch) VALUES (%s)', [(batch,)] * 500)
+
+    def test_connections_use_wal_and_busy_timeout(self):
+        with connections['stress'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_BUSY_TIMEOUT_MS)
+
+    def test_concurrent_writers_never_hit_lock_errors(self):
+        errors = self.run_threads(*[self.increment] * self.WORKERS, self.write_batches, self.write_batches)
+        self.assertEqual(errors, [])
+        with connections['stress'].cursor() as cursor:
+            cursor.execute('SELECT n FROM counter')
+            self.assertEqual(cursor.fetchone()[0], self.WORKERS * self.INCREMENTS)
+            cursor.execute('SELECT COUNT(*) FROM batch_row')
+            self.assertEqual(cursor.fetchone()[0], 2 * 5 * 500)
+
+
+class QueryPlanTests(CRMTestCase):
+    """Fail if a hot LoanApplication query falls back to a full table scan."""
+
+    FULL_SCAN = re.compile(r'SCAN crm_loanapplication(?! USING (COVERING )?INDEX)')
+
+    def setUp(self):
+        super().setUp()
+        for status in ('New', 'Follow-up', 'Converted'):
+            self.create_application(status=status)
+
+    def assertIndexed(self, func):
+        with CaptureQueriesContext(connection) as captured:
+            func()
+        self.assertTrue(captured.captured_queries)
+        for query in captured.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = ' | '.join(row[3] for row in cursor.fetchall())
+            self.assertNotRegex(plan, self.FULL_SCAN, query['sql'])
+            paged = 'ORDER BY' in query['sql'] and 'LIMIT' in query['sql']
+            if paged and 'FROM "crm_loanapplication"' in query['sql']:
+                self.assertNotIn('TEMP B-TREE', plan, query['sql'])
+
+    def page(self, **params):
+        return lambda: paginate_applications(LoanApplication.objects.all(), params)
+
+    def test_dashboard_counts(self):
+        self.assertIndexed(lambda: compute_dashboard_metrics())
+
+    def test_follow_ups(self):
+        self.assertIndexed(lambda: list(LoanApplication.objects.filter(status='Follow-up').order_by('-updated_at')[:5]))
+
+    def test_application_list_pages(self):
+        for name in SORT_FIELDS:
+            for sort in (name, f'-{name}'):
+                with self.subTest(sort=sort):
+                    first = paginate_applications(LoanApplication.objects.all(), {'sort': sort, 'per_page': 1})
+                    self.assertIndexed(self.page(sort=sort))
+                    self.assertIndexed(self.page(sort=sort, after=first.next_cursor))
+                    self.assertIndexed(self.page(sort=sort, before=first.next_cursor))
+        self.assertIndexed(lambda: paginate_applications(
+            filter_applications(LoanApplication.objects.all(), {'status': 'New'}), {}
+        ))
+
+    def test_pending_documents_and_banker_pipeline(self):
+        self.assertIndexed(lambda: list(LoanApplication.objects.filter(document_status='Pending')[:25]))
+        self.assertIndexed(lambda: LoanApplication.objects.filter(
+            assigned_to=self.employee, status='New').count())
+
+    def test_employee_report(self):
+        self.assertIndexed(lambda: list(Employee.objects.annotate(
+            total_sales_amount=Sum('disbursements__amount'), deals_closed=Count('disbursements'),
+        )))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), BATCH_WRITE_PAUSE=0)
+class SampleDataTests(CRMTestCase):
+    def generate(self, applications=300, seed=3):
+        call_command(
+            'generate_sample_data', applications=applications, employees=6, batch_size=120, seed=seed,
+            stdout=io.StringIO(),
+        )
+
+    def test_generated_dataset_is_consistent(self):
+        self.generate()
+        self.assertEqual(
+            set(Employee.objects.values_list('designation', flat=True)),
+            {name for name, _ in Employee.DESIGNATION_CHOICES},
+        )
+        self.assertEqual(
+            set(LoanProduct.objects.values_list('name', flat=True)), {name for name, _ in LoanProduct.LOAN_TYPE_CHOICES},
+        )
+        self.assertEqual(LoanApplication.objects.count(), 300)
+        self.assertGreater(len(set(LoanApplication.objects.values_list('status', flat=True))), 3)
+        self.assertEqual(Disbursement.objects.count(), LoanApplication.objects.filter(status='Converted').count())
+        self.assertTrue(ApplicationDocument.objects.exists())
+        self.assertLess(
+            LoanApplication.objects.earliest('created_at').created_at, timezone.now() - timedelta(days=30),
+        )
+        self.assertEqual(ApplicationStatusEvent.objects.count(), 600)
+        self.assertEqual(verify_employee_stats(), {})
+
+    def test_same_seed_gives_same_applications(self):
+        fields = ('name', 'amount', 'status', 'loan_type__name')
+        self.generate(applications=50)
+        first = list(LoanApplication.objects.order_by('pk').values_list(*fields))
+        self.generate(applications=50)
+        self.assertEqual(list(LoanApplication.objects.order_by('pk').values_list(*fields))[50:], first)
+        self.assertEqual(Employee.objects.filter(email__endswith='@fincorp.example').count(), 6)
+
+    def test_benchmark_views_covers_every_url(self):
+        self.generate(applications=40)
+        get_user_model().objects.create_superuser('admin', 'admin@fincorp.com', 'pw')
+        path = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        self.addCleanup(os.remove, path)
+        employees = Employee.objects.count()
+        call_command('benchmark_views', repeat=2, warmup=1, json_path=path, stdout=io.StringIO())
+        with open(path) as handle:
+            report = json.load(handle)
+        rows = {row['name']: row for row in report['results']}
+        self.assertEqual(set(rows), {pattern.name for pattern in crm_urls.urlpatterns})
+        self.assertEqual(report['dataset']['applications'], 40)
+        self.assertEqual(rows['employee_delete']['skipped'], 'deletes the employee on GET')
+        self.assertEqual(rows['application_bulk_status']['skipped'], 'GET not allowed')
+        self.assertEqual(Employee.objects.count(), employees)
+        for name in ('dashboard', 'application_export', 'document_download', 'api_disbursement_detail'):
+            self.assertEqual(rows[name]['status'], 200)
+            self.assertLessEqual(rows[name]['p50_ms'], rows[name]['p95_ms'])
+            self.assertLessEqual(rows[name]['queries'], QUERY_BUDGETS[name])
+
+
+LOGIN_REQUIRED_URLS = {'settings', 'document_download', 'document_bundle', 'application_documents_zip', 'metrics'}
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class QueryBudgetTests(QueryBudgetMixin, CRMTestCase):
+    """Every crm URL must stay within its QUERY_BUDGETS entry."""
+
+    def setUp(self):
+        super().setUp()
+        other = Employee.objects.create(name='Dev', email='dev@fincorp.com')
+        self.throwaway = Employee.objects.create(name='Temp', email='temp@fincorp.com')
+        second_product = LoanProduct.objects.create(name='Home Loan')
+        for i, status in enumerate(['New', 'Follow-up', 'Verified', 'Converted', 'Follow-up', 'New']):
+            app = self.create_application(
+                name=f'Applicant {i}', status=status,
+                assigned_to=other if i % 2 else self.employee,
+                loan_type=second_product if i % 3 else self.product,
+            )
+            self.document = ApplicationDocument.objects.create(
+                application=app, title='ID Proof', file=SimpleUploadedFile(f'id{i}.pdf', b'%PDF-1.4'),
+            )
+        self.application = app
+        self.job = enqueue('export_applications')
+        User = get_user_model()
+        User.objects.create_superuser('admin', 'admin@fincorp.com', 'pw')
+
+    def url_kwargs(self, name):
+        if name == 'employee_delete':
+            return {'pk': self.throwaway.pk}
+        if name.startswith('employee_'):
+            return {'pk': self.employee.pk}
+        if name.startswith('application_'):
+            return {'pk': self.application.pk}
+        if name.startswith('job_'):
+            return {'pk': self.job.pk}
+        if name == 'document_download':
+            return {'pk': self.document.pk}
+        if name.startswith('api_'):
+            return {'pk': self.application.pk} if name == 'api_application_detail' else {'pk': 1}
+        return {}
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in crm_urls.urlpatterns}
+        self.assertEqual(names - set(QUERY_BUDGETS), set())
+
+    def test_views_stay_within_budget(self):
+        for pattern in crm_urls.urlpatterns:
+            with self.subTest(url=pattern.name):
+                kwargs = self.url_kwargs(pattern.name) if pattern.pattern.converters else {}
+                if pattern.name in LOGIN_REQUIRED_URLS:
+                    self.client.force_login(get_user_model().objects.get(username='admin'))
+                self.assertWithinQueryBudget(pattern.name, reverse(pattern.name, kwargs=kwargs))
+                self.client.logout()
+
+    def test_filtered_and_searched_lists_stay_within_budget(self):
+        url = reverse('application_list')
+        for params in ({'status': 'Follow-up', 'sort': 'amount'}, {'q': 'applicant'}, {'sort': 'name', 'banker': 1}):
+            with self.subTest(params=params):
+                self.assertWithinQueryBudget('application_list', url, data=params)
+        self.assertWithinQueryBudget('application_search', reverse('application_search'), data={'q': 'applicant'})
+
+    @override_settings(DEBUG=True)
+    async def test_debug_query_count_under_asgi(self):
+        url = reverse('application_list')
+        await sync_to_async(self.client.get)(url)  # warm the reference caches
+        expected = (await sync_to_async(self.client.get)(url))['X-Query-Count']
+        response = await self.async_client.get(url)
+        self.assertNotEqual(expected, '0')
+        self.assertEqual(response['X-Query-Count'], expected)
@@ -0,0 +1,92 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.fields.files import FieldFile
+
+
+def _comparable(value):
+    # FieldFile objects are mutated in place when saved; remember the name.
+    return value.name if isinstance(value, FieldFile) else value
+
+
+class ChangeTrackingMixin:
+    """Remember the column values a model instance was loaded with.
+
+    ``changed_fields`` reports what has been modified in memory since, and
+    ``previous(name)`` returns a field's loaded value, so callers no longer
+    need to re-fetch a row to learn what it looked like. ``save()`` on a
+    loaded instance writes only the changed columns (plus ``auto_now`` ones)
+    and skips the UPDATE entirely when nothing changed.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    def _snapshot_loaded_values(self, attnames=None):
+        deferred = self.get_deferred_fields()
+        values = {
+            field.attname: _comparable(getattr(self, field.attname))
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred and (attnames is None or field.attname in attnames)
+        }
+        if attnames is None or not self.is_tracked:
+            self._loaded_values = values
+        else:
+            self._loaded_values.update(values)
+
+    @property
+    def is_tracked(self):
+        """True once the instance has been loaded from or saved to the database."""
+        return getattr(self, '_loaded_values', None) is not None
+
+    @property
+    def changed_fields(self):
+        """Names of the fields modified since load; every field for an unsaved instance."""
+        if not self.is_tracked:
+            return {field.name for field in self._meta.concrete_fields}
+        return {
+            field.name
+            for field in self._meta.concrete_fields
+            if field.attname in self._loaded_values
+            and _comparable(getattr(self, field.attname)) != self._loaded_values[field.attname]
+        }
+
+    def has_changed(self, name):
+        return name in self.changed_fields
+
+    def previous(self, name):
+        """The value ``name`` had when loaded, or None for an unsaved instance."""
+        if not self.is_tracked:
+            return None
+        return self._loaded_values.get(self._meta.get_field(name).attname)
+
+    def save(self, *args, **kwargs):
+        if (
+            self.is_tracked and not self._state.adding and not args
+            and kwargs.get('update_fields') is None and not kwargs.get('force_insert')
+        ):
+            changed = self.changed_fields
+            if not changed:
+                return
+            auto_now = {field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)}
+            kwargs['update_fields'] = changed | auto_now
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        # Columns left out of update_fields still differ from the database.
+        self._snapshot_loaded_values(None if update_fields is None else self._attnames(update_fields))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot_loaded_values(None if fields is None else self._attnames(fields))
+
+    def _attnames(self, names):
+        attnames = set()
+        for name in names:
+            try:
+                attname = getattr(self._meta.get_field(name), 'attname', None)
+            except FieldDoesNotExist:
+                attname = name
+            if attname:
+                attnames.add(attname)
+        return attnames
@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .events import Transition, record_transitions
+from .metrics import invalidate_dashboard
+from .models import Disbursement, LoanApplication
+from .stats import record_applications, record_disbursements
+
+# Keep each IN (...) list well below SQLite's bound-parameter limit.
+CHUNK_SIZE = 500
+
+STATUS_VALUES = {value for value, _ in LoanApplication.STATUS_CHOICES}
+
+
+class TransitionResult:
+    """Outcome of moving one application in a bulk transition."""
+
+    UPDATED = 'updated'
+    UNCHANGED = 'unchanged'
+    NOT_FOUND = 'not_found'
+
+    def __init__(self, pk, outcome, name='', old_status=None, new_status=None, disbursed=False):
+        self.pk = pk
+        self.outcome = outcome
+        self.name = name
+        self.old_status = old_status
+        self.new_status = new_status
+        self.disbursed = disbursed
+
+    def as_dict(self):
+        return {
+            'id': self.pk,
+            'outcome': self.outcome,
+            'name': self.name,
+            'old_status': self.old_status,
+            'new_status': self.new_status,
+            'disbursement_created': self.disbursed,
+        }
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def bulk_transition(ids, status):
+    """Move the applications in ``ids`` to ``status`` in one transaction.
+
+    Mirrors the per-row save path (``create_disbursement_on_conversion``, the
+    EmployeeStats and status-event receivers) with set-based queries: one UPDATE per chunk
+    of ids and one ``bulk_create`` for the disbursements that converting
+    applications are owed. Returns a TransitionResult per requested id, in
+    request order.
+    """
+    if status not in STATUS_VALUES:
+        raise ValueError(f'Unknown status "{status}".')
+    ids = list(dict.fromkeys(int(pk) for pk in ids))
+    now = timezone.now()
+
+    with transaction.atomic():
+        rows = {}
+        for chunk in _chunks(ids):
+            for row in (
+                LoanApplication.objects.filter(pk__in=chunk)
+                .annotate(has_disbursement=Exists(Disbursement.objects.filter(application=OuterRef('pk'))))
+                .values(
+                    'pk', 'name', 'status', 'status_changed_at', 'assigned_to_id', 'amount', 'loan_type_id',
+                    'has_disbursement',
+                )
+            ):
+                rows[row['pk']] = row
+
+        changing = [pk for pk, row in rows.items() if row['status'] != status]
+        for chunk in _chunks(changing):
+            LoanApplication.objects.filter(pk__in=chunk).update(status=status, status_changed_at=now, updated_at=now)
+        # Same rule as create_disbursement_on_conversion: only a real move to
+        # Converted creates a missing disbursement; rows already Converted are
+        # left alone.
+        owed = []
+        if status == 'Converted':
+            owed = [rows[pk] for pk in changing if not rows[pk]['has_disbursement']]
+        Disbursement.objects.bulk_create(
+            Disbursement(
+                application_id=row['pk'], banker_id=row['assigned_to_id'],
+                amount=row['amount'], product_id=row['loan_type_id'],
+            )
+            for row in owed
+        )
+
+        # bulk_create and update() send no signals; keep the rollups and
+        # the status event log in step.
+        record_applications([(rows[pk]['assigned_to_id'], rows[pk]['status']) for pk in changing], sign=-1)
+        record_applications((rows[pk]['assigned_to_id'], status) for pk in changing)
+        record_disbursements((row['assigned_to_id'], row['amount']) for row in owed)
+        record_transitions(
+            Transition(pk, 'status', rows[pk]['status'], status, now, since=rows[pk]['status_changed_at'])
+            for pk in changing
+        )
+        if changing or owed:
+            invalidate_dashboard()
+
+    disbursed = {row['pk'] for row in owed}
+    results = []
+    for pk in ids:
+        row = rows.get(pk)
+        if row is None:
+            results.append(TransitionResult(pk, TransitionResult.NOT_FOUND))
+            continue
+        outcome = TransitionResult.UPDATED if row['status'] != status else TransitionResult.UNCHANGED
+        results.append(TransitionResult(
+            pk, outcome, row['name'], row['status'], status, disbursed=pk in disbursed,
+        ))
+    return results
@@ -0,0 +1,186 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .metrics import _day_bounds
+from .models import (
+    DailyApplicationStat, DailyDisbursementStat, Disbursement, Employee, LoanApplication, LoanProduct,
+    RollupDirtyDay, RollupState,
+)
+from .writes import batch_write
+
+WATERMARK = 'daily_rollups'
+
+# Re-scan this far behind the watermark so rows committed by transactions
+# that started before the last run are not missed.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def _day_runs(days):
+    """Group sorted days into (first, last) runs of consecutive dates."""
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def recompute_days(days):
+    """Rebuild the rollup rows for ``days`` from the source tables."""
+    days = sorted(set(days))
+    if not days:
+        return 0
+    with transaction.atomic():
+        DailyApplicationStat.objects.filter(day__in=days).delete()
+        DailyDisbursementStat.objects.filter(day__in=days).delete()
+        for first, last in _day_runs(days):
+            start, _ = _day_bounds(first)
+            _, end = _day_bounds(last)
+            DailyApplicationStat.objects.bulk_create(
+                DailyApplicationStat(day=row['day'], status=row['status'], product_id=row['loan_type'], count=row['n'])
+                for row in LoanApplication.objects.filter(created_at__gte=start, created_at__lt=end)
+                .annotate(day=TruncDate('created_at'))
+                .values('day', 'status', 'loan_type')
+                .annotate(n=Count('id'))
+                .order_by()
+            )
+            DailyDisbursementStat.objects.bulk_create(
+                DailyDisbursementStat(day=row['day'], product_id=row['product'], count=row['n'], amount=row['total'])
+                for row in Disbursement.objects.filter(date__gte=start, date__lt=end)
+                .annotate(day=TruncDate('date'))
+                .values('day', 'product')
+                .annotate(n=Count('id'), total=Sum('amount'))
+                .order_by()
+            )
+        RollupDirtyDay.objects.filter(day__in=days).delete()
+    return len(days)
+
+
+def touched_days(since):
+    """Days with an application or disbursement written at or after ``since``."""
+    days = set(
+        LoanApplication.objects.filter(updated_at__gte=since)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('day', flat=True)
+        .distinct()
+    )
+    days.update(
+        Disbursement.objects.filter(updated_at__gte=since)
+        .annotate(day=TruncDate('date'))
+        .values_list('day', flat=True)
+        .distinct()
+    )
+    days.update(RollupDirtyDay.objects.values_list('day', flat=True))
+    return days
+
+
+def all_days():
+    days = set(LoanApplication.objects.annotate(day=TruncDate('created_at')).values_list('day', flat=True).distinct())
+    days.update(Disbursement.objects.annotate(day=TruncDate('date')).values_list('day', flat=True).distinct())
+    # Also clear rollup rows whose source rows are all gone.
+    days.update(DailyApplicationStat.objects.values_list('day', flat=True).distinct())
+    days.update(DailyDisbursementStat.objects.values_list('day', flat=True).distinct())
+    return days
+
+
+def refresh_rollups(full=False):
+    """Bring the daily rollups up to date; returns the number of days rebuilt.
+
+    Only days touched since the previous run are recomputed, unless ``full``
+    is set or the rollups have never been built.
+    """
+    started = timezone.now()
+    state = RollupState.objects.filter(name=WATERMARK).first()
+    if full or state is None:
+        days = all_days()
+    else:
+        days = touched_days(state.watermark - WATERMARK_OVERLAP)
+    with batch_write():
+        rebuilt = recompute_days(days)
+        RollupState.objects.update_or_create(name=WATERMARK, defaults={'watermark': started})
+    return rebuilt
+
+
+def last_refreshed():
+    return RollupState.objects.filter(name=WATERMARK).values_list('watermark', flat=True).first()
+
+
+def trend_series(start, end, product_id=None):
+    """Chart data for ``start``..``end`` (inclusive) read from the rollup tables."""
+    labels = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    position = {day: i for i, day in enumerate(labels)}
+
+    applications = DailyApplicationStat.objects.filter(day__gte=start, day__lte=end)
+    disbursements = DailyDisbursementStat.objects.filter(day__gte=start, day__lte=end)
+    if product_id is not None:
+        applications = applications.filter(product_id=product_id)
+        disbursements = disbursements.filter(product_id=product_id)
+
+    created = {status: [0] * len(labels) for status, _ in LoanApplication.STATUS_CHOICES}
+    for day, status, count in applications.values_list('day', 'status', 'count'):
+        if status in created:
+            created[status][position[day]] += count
+
+    disbursed_count = [0] * len(labels)
+    disbursed_amount = [0.0] * len(labels)
+    for day, count, amount in disbursements.values_list('day', 'count', 'amount'):
+        disbursed_count[position[day]] += count
+        disbursed_amount[position[day]] += float(amount)
+
+    return {
+        'labels': [day.isoformat() for day in labels],
+        'created': created,
+        'disbursed_count': disbursed_count,
+        'disbursed_amount': disbursed_amount,
+    }
+
+
+# --- Signal receivers ---
+# Created and edited rows carry an updated_at the watermark scan finds.
+# Deleted rows leave no trace, and on_delete cascades and SET_NULL updates
+# bypass updated_at, so the days they touch are queued explicitly.
+
+def _mark_days(days):
+    RollupDirtyDay.objects.bulk_create(
+        [RollupDirtyDay(day=day) for day in set(days) if day is not None], ignore_conflicts=True,
+    )
+
+
+def _related_days(applications, disbursements):
+    return (
+        list(applications.annotate(day=TruncDate('created_at')).values_list('day', flat=True).distinct())
+        + list(disbursements.annotate(day=TruncDate('date')).values_list('day', flat=True).distinct())
+    )
+
+
+@receiver(pre_delete, sender=Employee)
+def mark_days_for_employee_delete(sender, instance, **kwargs):
+    _mark_days(_related_days(instance.applications.all(), instance.disbursements.all()))
+
+
+@receiver(pre_delete, sender=LoanProduct)
+def mark_days_for_product_delete(sender, instance, **kwargs):
+    # The product's rollup rows cascade away while its applications and
+    # disbursements only lose their product, keeping their updated_at.
+    _mark_days(_related_days(
+        LoanApplication.objects.filter(loan_type=instance), Disbursement.objects.filter(product=instance),
+    ))
+
+
+@receiver(post_delete, sender=LoanApplication)
+def mark_day_for_application_delete(sender, instance, origin=None, **kwargs):
+    if not isinstance(origin, Employee):
+        _mark_days([timezone.localdate(instance.created_at)])
+
+
+@receiver(post_delete, sender=Disbursement)
+def mark_day_for_disbursement_delete(sender, instance, origin=None, **kwargs):
+    if not isinstance(origin, Employee):
+        _mark_days([timezone.localdate(instance.date)])
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
@@ -8,13 +8,42 @@ urlpatterns = [
     path('employees/<int:pk>/edit/', views.employee_update, name='employee_update'),
     path('employees/<int:pk>/delete/', views.employee_delete, name='employee_delete'),
     path('applications/', views.application_list, name='application_list'),
+    path('applications/search/', views.application_search, name='application_search'),
     path('applications/add/', views.application_create, name='application_create'),
+    path('applications/quote/', views.application_quote, name='application_quote'),
+    path('applications/autocomplete/', views.application_autocomplete, name='application_autocomplete'),
     path('applications/import/', views.import_leads, name='import_applications'), # Keeping import_leads view name but changing url name
+    path('applications/export/', views.application_export, name='application_export'),
+    path('applications/export/background/', views.application_export_job, name='application_export_job'),
+    path('applications/bulk-status/', views.application_bulk_status, name='application_bulk_status'),
     path('applications/<int:pk>/edit/', views.application_update, name='application_update'),
+    path('applications/<int:pk>/documents.zip', views.application_documents_zip, name='application_documents_zip'),
     path('loan-products/', views.loan_product_list, name='loan_product_list'),
     path('loan-products/add/', views.loan_product_create, name='loan_product_create'),
     path('documents/', views.documents, name='documents'),
+    path('documents/<int:pk>/download/', views.document_download, name='document_download'),
+    path('documents/bundle/', views.document_bundle, name='document_bundle'),
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>/status/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/cancel/', views.job_cancel, name='job_cancel'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
     path('settings/', views.settings, name='settings'),
+    path('metrics', views.metrics, name='metrics'),
     path('reports/employees/', views.employee_sales_report, name='employee_report'),
+    path('reports/employees/export/', views.employee_report_export, name='employee_report_export'),
+    path('disbursements/export/', views.disbursement_export, name='disbursement_export'),
+    path('reports/trends/', views.pipeline_trends, name='pipeline_trends'),
+    path('reports/funnel/', views.funnel_report, name='funnel_report'),
+    path('reports/portfolio/', views.portfolio_projection, name='portfolio_projection'),
     path('setup-admin/', views.setup_admin, name='setup_admin'),
+
+    # Read-only JSON API (crm/api.py)
+    path('api/applications/', api.list_resource, {'name': 'applications'}, name='api_application_list'),
+    path('api/applications/<int:pk>/', api.detail_resource, {'name': 'applications'}, name='api_application_detail'),
+    path('api/products/', api.list_resource, {'name': 'products'}, name='api_product_list'),
+    path('api/products/<int:pk>/', api.detail_resource, {'name': 'products'}, name='api_product_detail'),
+    path('api/employees/', api.list_resource, {'name': 'employees'}, name='api_employee_list'),
+    path('api/employees/<int:pk>/', api.detail_resource, {'name': 'employees'}, name='api_employee_detail'),
+    path('api/disbursements/', api.list_resource, {'name': 'disbursements'}, name='api_disbursement_list'),
+    path('api/disbursements/<int:pk>/', api.detail_resource, {'name': 'disbursements'}, name='api_disbursement_detail'),
 ]
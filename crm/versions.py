@@ -0,0 +1,31 @@
+import time
+
+from django.core.cache import cache
+
+
+# Version counters live in the shared cache so that every worker sees a bump
+# made by any other worker. Cached values embed the version in their key, so
+# bumping the counter is enough to invalidate them.
+
+def _key(name):
+    return f'crm:version:{name}'
+
+
+def get_version(name):
+    key = _key(name)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a lost counter never reuses an old version.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_version(name):
+    key = _key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, None)
+        return version
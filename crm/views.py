@@ -1,53 +1,44 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Sum, Count
-from .models import Employee, LoanApplication, Disbursement, ApplicationDocument, LoanProduct
+import json
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.http import JsonResponse
+from django.urls import reverse
+from django.db.models import F
+from django.utils import timezone
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST, require_safe
+from .models import Employee, LoanApplication, ApplicationDocument, Job
 from django.contrib import messages
+from . import reference
 from .forms import LoanProductForm, LoanApplicationForm, ApplicationDocumentForm, CSVUploadForm, EmployeeForm
+from .amortization import project_portfolio, quote
+from .bundles import bundle_applications, bundle_documents, streaming_zip_response
+from .downloads import serve_document
+from .eligibility import product_rules
+from .events import funnel_summary, weekly_conversion
+from .exports import application_rows, disbursement_rows, employee_report_rows, streaming_csv_response
+from .jobs import cancel_job, enqueue
+from .metrics import aget_dashboard_metrics
+from .listing import SORT_FIELDS, Page, filter_applications, paginate_applications, paginate_documents, parse_int
+from .search import MAX_PAGE as MAX_SEARCH_PAGE, PAGE_SIZE as SEARCH_PAGE_SIZE, search_applications
+from .transitions import STATUS_VALUES as TRANSITION_STATUSES, TransitionResult, bulk_transition
+from .trends import last_refreshed, trend_series
 
-from django.utils import timezone
+# The dashboard, performance report and exports are async so that, under
+# ASGI, a worker keeps serving other requests while their queries run or
+# their downloads stream. Rendering stays synchronous: context processors
+# read the session and user lazily.
+arender = sync_to_async(render)
 
-def dashboard(request):
-    today = timezone.now().date()
-    
-    # Summary Cards
-    total_applications_count = LoanApplication.objects.count()
-    new_today_count = LoanApplication.objects.filter(created_at__date=today).count()
-    converted_count = LoanApplication.objects.filter(status='Converted').count()
-    pending_docs_count = LoanApplication.objects.filter(document_status='Pending').count()
-    
-    # Pipeline Stages
-    pipeline_counts = {
-        'New': LoanApplication.objects.filter(status='New').count(),
-        'Contacted': LoanApplication.objects.filter(status='Contacted').count(),
-        'Follow_up': LoanApplication.objects.filter(status='Follow-up').count(),
-        'Verified': LoanApplication.objects.filter(status='Verified').count(),
-        'Converted': converted_count,
-        'Rejected': LoanApplication.objects.filter(status='Rejected').count(),
-    }
-    
-    # Follow-Ups
-    follow_ups = LoanApplication.objects.filter(status='Follow-up').order_by('-updated_at')[:5]
-    
-    # Application Table
-    recent_applications = LoanApplication.objects.all().order_by('-created_at')[:10]
-    
-    # Employee Performance
-    top_employees = Employee.objects.annotate(total_disbursed=Sum('disbursements__amount')).order_by('-total_disbursed')[:5]
-    
-    context = {
-        'total_applications_count': total_applications_count,
-        'new_today_count': new_today_count,
-        'converted_count': converted_count,
-        'pending_docs_count': pending_docs_count,
-        'pipeline_counts': pipeline_counts,
-        'follow_ups': follow_ups,
-        'recent_applications': recent_applications,
-        'top_employees': top_employees,
-    }
-    return render(request, 'crm/dashboard.html', context)
+async def dashboard(request):
+    context = await aget_dashboard_metrics()
+    return await arender(request, 'crm/dashboard.html', context)
 
 def employee_list(request):
-    employees = Employee.objects.all()
+    employees = reference.employees()
     return render(request, 'crm/employee_list.html', {'employees': employees})
 
 def employee_create(request):
@@ -81,12 +72,83 @@ def employee_delete(request, pk):
 
 
 def application_list(request):
-    status = request.GET.get('status')
-    if status:
-        applications = LoanApplication.objects.filter(status=status).order_by('-created_at')
-    else:
-        applications = LoanApplication.objects.all().order_by('-created_at')
-    return render(request, 'crm/application_list.html', {'applications': applications})
+    query = request.GET.get('q', '').strip()
+    if query:
+        return _application_search_results(request, query)
+
+    applications = filter_applications(
+        LoanApplication.objects.select_related('loan_type', 'assigned_to'), request.GET
+    )
+    page = paginate_applications(applications, request.GET)
+    current = page.sort.lstrip('-')
+    sort_links = {
+        name: name if page.sort == f'-{name}' else f'-{name}' if name == current else name
+        for name in SORT_FIELDS
+    }
+    return render(request, 'crm/application_list.html', {
+        'applications': page,
+        'page': page,
+        'sort_links': sort_links,
+        'current_sort': current,
+        'sort_descending': page.sort.startswith('-'),
+        **_application_filter_options(),
+    })
+
+def _application_filter_options():
+    return {
+        'status_choices': LoanApplication.STATUS_CHOICES,
+        'products': reference.products(),
+        'bankers': reference.employees(),
+    }
+
+def _search_page_number(request):
+    try:
+        return max(1, min(int(request.GET.get('page', 1)), MAX_SEARCH_PAGE))
+    except ValueError:
+        return 1
+
+def _application_search_results(request, query):
+    page_number = _search_page_number(request)
+    results, has_more = search_applications(query, request.GET, page=page_number)
+    page = Page(
+        results, 'relevance',
+        next_page=page_number + 1 if has_more else None,
+        prev_page=page_number - 1 if page_number > 1 else None,
+    )
+    return render(request, 'crm/application_list.html', {
+        'applications': page,
+        'page': page,
+        'search_query': query,
+        **_application_filter_options(),
+    })
+
+def application_search(request):
+    """Ranked, paginated JSON search over applications."""
+    query = request.GET.get('q', '').strip()
+    page_number = _search_page_number(request)
+    try:
+        page_size = int(request.GET.get('per_page', SEARCH_PAGE_SIZE))
+    except ValueError:
+        page_size = SEARCH_PAGE_SIZE
+    results, has_more = search_applications(query, request.GET, page=page_number, page_size=page_size)
+    return JsonResponse({
+        'query': query,
+        'page': page_number,
+        'has_next': has_more,
+        'results': [
+            {
+                'id': app.pk,
+                'name': app.name,
+                'phone': app.phone,
+                'email': app.email,
+                'status': app.status,
+                'loan_type': app.loan_type.name if app.loan_type else None,
+                'banker': app.assigned_to.name,
+                'url': reverse('application_update', args=[app.pk]),
+            }
+            for app in results
+        ],
+    })
 
 def application_create(request):
     if request.method == 'POST':
@@ -97,6 +159,8 @@ def application_create(request):
                 messages.success(request, 'Application created and Disbursement recorded!')
             else:
                 messages.success(request, 'Application created successfully.')
+            if form.eligibility_warning:
+                messages.warning(request, form.eligibility_warning)
             return redirect('application_list')
     else:
         form = LoanApplicationForm()
@@ -108,25 +172,111 @@ def application_update(request, pk):
     if request.method == 'POST':
         form = LoanApplicationForm(request.POST, instance=application)
         if form.is_valid():
-            old_status = LoanApplication.objects.get(pk=pk).status
-            application = form.save(commit=False)
-            new_status = application.status
-            application.save()
+            # The form has applied the posted values; the tracker still knows the loaded ones.
+            converted = application.previous('status') != 'Converted' and application.status == 'Converted'
+            application = form.save()
             
-            if old_status != 'Converted' and new_status == 'Converted':
+            if converted:
                  messages.success(request, 'Application updated to Converted! Disbursement recorded.')
             else:
                  messages.success(request, 'Application updated successfully.')
+            if form.eligibility_warning:
+                messages.warning(request, form.eligibility_warning)
             return redirect('application_list')
     else:
         form = LoanApplicationForm(instance=application)
         
     return render(request, 'crm/application_form.html', {'form': form, 'application': application})
 
+MAX_TENURE_MONTHS = 480
+# Largest LoanApplication.amount (max_digits=12, decimal_places=2).
+MAX_QUOTE_AMOUNT = Decimal('9999999999.99')
+
+@require_safe
+def application_quote(request):
+    """EMI, totals and repayment schedule for the product/amount/tenure on the application form."""
+    product = reference.product(parse_int(request.GET.get('product')))
+    if product is None:
+        return JsonResponse({'error': 'Choose a loan type.'}, status=400)
+    try:
+        amount = Decimal(request.GET.get('amount', ''))
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite() or not 0 < amount <= MAX_QUOTE_AMOUNT:
+        return JsonResponse({'error': 'Enter a loan amount.'}, status=400)
+    tenure = parse_int(request.GET.get('tenure')) or product.tenure_months
+    if not 1 <= tenure <= MAX_TENURE_MONTHS:
+        return JsonResponse({'error': f'Tenure must be between 1 and {MAX_TENURE_MONTHS} months.'}, status=400)
+
+    data = quote(amount, product, tenure)
+    data['within_limits'] = product.min_amount <= amount <= product.max_amount
+    data['eligibility_failures'] = product_rules(product).failures(
+        amount, request.GET.get('employment_type') or 'Salaried', tenure,
+    )
+    return JsonResponse(data)
+
+AUTOCOMPLETE_PAGE_SIZE = 20
+
+@require_safe
+def application_autocomplete(request):
+    """One page of applications matching ``q`` (newest first when empty) for pickers."""
+    query = request.GET.get('q', '').strip()
+    page_number = _search_page_number(request)
+    if query:
+        applications, has_more = search_applications(query, page=page_number, page_size=AUTOCOMPLETE_PAGE_SIZE)
+    else:
+        offset = (page_number - 1) * AUTOCOMPLETE_PAGE_SIZE
+        applications = list(
+            LoanApplication.objects.select_related('loan_type')
+            .order_by('-created_at', '-pk')[offset:offset + AUTOCOMPLETE_PAGE_SIZE + 1]
+        )
+        has_more = len(applications) > AUTOCOMPLETE_PAGE_SIZE
+        applications = applications[:AUTOCOMPLETE_PAGE_SIZE]
+    return JsonResponse({
+        'results': [{'id': app.pk, 'text': str(app)} for app in applications],
+        'page': page_number,
+        'more': has_more,
+    })
+
+MAX_BULK_TRANSITION = 5000
+
+@require_POST
+def application_bulk_status(request):
+    """Move many applications to one status; JSON in/out for API clients, a results page for forms."""
+    wants_json = request.content_type == 'application/json'
+    if wants_json:
+        try:
+            payload = json.loads(request.body)
+            ids, status = payload['ids'], payload['status']
+            ids = [int(pk) for pk in ids]
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Expected {"ids": [...], "status": "..."}.'}, status=400)
+    else:
+        ids = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()]
+        status = request.POST.get('status', '')
+
+    if status not in TRANSITION_STATUSES or not ids or len(ids) > MAX_BULK_TRANSITION:
+        message = f'Choose a valid status and between 1 and {MAX_BULK_TRANSITION} applications.'
+        if wants_json:
+            return JsonResponse({'error': message}, status=400)
+        messages.error(request, message)
+        return redirect('application_list')
+
+    results = bulk_transition(ids, status)
+    summary = {
+        outcome: sum(1 for result in results if result.outcome == outcome)
+        for outcome in (TransitionResult.UPDATED, TransitionResult.UNCHANGED, TransitionResult.NOT_FOUND)
+    }
+    summary['disbursements_created'] = sum(1 for result in results if result.disbursed)
+    if wants_json:
+        return JsonResponse({'status': status, 'summary': summary, 'results': [r.as_dict() for r in results]})
+    return render(request, 'crm/bulk_status_results.html', {
+        'status': status, 'summary': summary, 'results': results,
+    })
+
 # --- Documents View ---
 def documents(request):
-    documents = ApplicationDocument.objects.all().order_by('-uploaded_at')
-    pending_docs = LoanApplication.objects.filter(document_status='Pending')
+    documents = ApplicationDocument.objects.select_related('application')
     
     if request.method == 'POST':
         form = ApplicationDocumentForm(request.POST, request.FILES)
@@ -137,14 +287,40 @@ def documents(request):
     else:
         form = ApplicationDocumentForm()
         
+    page = paginate_documents(documents, request.GET)
     return render(request, 'crm/documents.html', {
-        'documents': documents,
-        'pending_docs': pending_docs,
+        'documents': page,
+        'page': page,
+        'document_count': ApplicationDocument.objects.count(),
+        'status_choices': LoanApplication.STATUS_CHOICES,
         'form': form
     })
 
+@login_required
+@require_safe
+async def document_download(request, pk):
+    document = await aget_object_or_404(ApplicationDocument, pk=pk)
+    return await sync_to_async(serve_document)(request, document, as_attachment='download' in request.GET)
+
+@login_required
+@require_safe
+async def application_documents_zip(request, pk):
+    application = await aget_object_or_404(LoanApplication, pk=pk)
+    return streaming_zip_response(
+        bundle_documents(LoanApplication.objects.filter(pk=application.pk)),
+        f'APP-{application.pk + 1000}-documents.zip',
+    )
+
+@login_required
+@require_safe
+async def document_bundle(request):
+    # Same filters as the application list, plus created_from/created_to dates.
+    applications = bundle_applications(request.GET)
+    return streaming_zip_response(
+        bundle_documents(applications), f'documents-{timezone.localdate():%Y%m%d}.zip',
+    )
+
 # --- Settings View ---
-from django.contrib.auth.decorators import login_required
 from django.contrib.auth import update_session_auth_hash
 
 @login_required
@@ -179,7 +355,7 @@ def settings(request):
 # --- Product Views ---
 
 def loan_product_list(request):
-    products = LoanProduct.objects.all()
+    products = reference.products()
     return render(request, 'crm/loan_product_list.html', {'products': products})
 
 def loan_product_create(request):
@@ -194,55 +370,162 @@ def loan_product_create(request):
     return render(request, 'crm/loan_product_form.html', {'form': form})
 
 # --- CSV Import ---
-import csv
-import io
 
 def import_leads(request):
     if request.method == 'POST':
         form = CSVUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            csv_file = request.FILES['csv_file']
-            decoded_file = csv_file.read().decode('utf-8')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            
-            count = 0
-            for row in reader:
-                try:
-                    emp_email = row.get('assigned_to_email')
-                    employee = Employee.objects.filter(email=emp_email).first()
-                    if not employee:
-                        employee = Employee.objects.first() # Fallback
-                    
-                    LoanApplication.objects.create(
-                        name=row.get('name', 'Untitled Application'),
-                        amount=row.get('amount', 0),
-                        assigned_to=employee,
-                        status='New',
-                        email=row.get('email'),
-                        phone=row.get('phone')
-                    )
-                    count += 1
-                except Exception as e:
-                    print(f"Error importing row: {e}")
-            
-            messages.success(request, f'{count} applications imported successfully.')
-            return redirect('application_list')
+            job = enqueue('import_applications', input_file=request.FILES['csv_file'])
+            messages.info(request, 'Import queued. You can leave this page; progress is shown below.')
+            return redirect('job_detail', pk=job.pk)
     else:
         form = CSVUploadForm()
     return render(request, 'crm/import_applications.html', {'form': form})
 
+# --- CSV Exports ---
+# Streamed straight from a chunked values_list() iterator; large exports can
+# also be run as a background job below.
+
+async def application_export(request):
+    return streaming_csv_response(application_rows(request.GET), 'applications.csv')
+
+async def disbursement_export(request):
+    return streaming_csv_response(disbursement_rows(request.GET), 'disbursements.csv')
+
+async def employee_report_export(request):
+    return streaming_csv_response(employee_report_rows(), 'banker-performance.csv')
+
+# --- Background Jobs ---
+from django.http import FileResponse, Http404
+
+EXPORT_FILTERS = ('status', 'product', 'banker')
+
+@require_POST
+def application_export_job(request):
+    filters = {key: request.POST[key] for key in EXPORT_FILTERS if request.POST.get(key)}
+    job = enqueue('export_applications', payload={'filters': filters})
+    messages.info(request, 'Export queued. The download link appears here when it is ready.')
+    return redirect('job_detail', pk=job.pk)
+
+def _job_status_data(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'finished': job.is_finished,
+        'progress': {'done': job.progress_done, 'total': job.progress_total, 'percent': job.percent},
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'cancel_requested': job.cancel_requested,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+        'download_url': reverse('job_download', args=[job.pk]) if job.result_file else None,
+    }
+
+def job_detail(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return render(request, 'crm/job_detail.html', {'job': job, 'job_data': _job_status_data(job)})
+
+def job_status(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return JsonResponse(_job_status_data(job))
+
+@require_POST
+def job_cancel(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    cancel_job(job)
+    job.refresh_from_db()
+    return JsonResponse(_job_status_data(job))
+
+async def job_download(request, pk):
+    job = await aget_object_or_404(Job, pk=pk)
+    if not job.result_file:
+        raise Http404('This job has no output file.')
+    return FileResponse(job.result_file.open('rb'), as_attachment=True, filename=job.result_file.name.rsplit('/', 1)[-1])
+
 # --- Reports ---
-def employee_sales_report(request):
-    employees = Employee.objects.annotate(
-        total_sales_amount=Sum('disbursements__amount'),
-        deals_closed=Count('disbursements')
-    ).order_by('-total_sales_amount')
-    return render(request, 'crm/employee_report.html', {'employees': employees})
+async def employee_sales_report(request):
+    # Totals come from the EmployeeStats rollup rather than aggregating disbursements.
+    employees = Employee.objects.select_related('stats').order_by(
+        F('stats__disbursed_total').desc(nulls_last=True), 'name'
+    )
+    employees = [employee async for employee in employees]
+    return await arender(request, 'crm/employee_report.html', {'employees': employees})
+
+def funnel_report(request):
+    """Stage totals and time in stage, from the per-event FunnelStageStat aggregates."""
+    weekly = weekly_conversion()
+    return render(request, 'crm/funnel_report.html', {
+        'funnel_tables': [
+            ('Application Status', funnel_summary('status')),
+            ('Document Status', funnel_summary('document')),
+        ],
+        'weekly_chart': {
+            'labels': [week.isoformat() for week, _, _, _ in weekly],
+            'created': [created for _, created, _, _ in weekly],
+            'converted': [converted for _, _, converted, _ in weekly],
+            'rate': [rate for _, _, _, rate in weekly],
+        },
+    })
+
+PROJECTION_RANGES = (12, 24, 36, 60)
+
+def portfolio_projection(request):
+    """Scheduled principal and interest collections across the disbursed book."""
+    months = parse_int(request.GET.get('months'))
+    months = months if months in PROJECTION_RANGES else 12
+    projection = project_portfolio(months)
+    return render(request, 'crm/portfolio_projection.html', {
+        'projection': projection,
+        'months': months,
+        'ranges': PROJECTION_RANGES,
+        'chart': {
+            'labels': [f"{row['month']:%b %Y}" for row in projection],
+            'principal': [float(row['principal']) for row in projection],
+            'interest': [float(row['interest']) for row in projection],
+        },
+        'totals': {
+            field: sum((row[field] for row in projection), Decimal('0'))
+            for field in ('principal', 'interest', 'total')
+        },
+    })
+
+TREND_RANGES = (30, 90, 365, 730)
+
+def pipeline_trends(request):
+    """Daily pipeline charts, read from the rollups kept by `manage.py rollup_daily_stats`."""
+    days = request.GET.get('days', '90')
+    days = int(days) if days.isdigit() and int(days) in TREND_RANGES else 90
+    product = request.GET.get('product', '')
+    product_id = int(product) if product.isdigit() else None
+
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    return render(request, 'crm/trends.html', {
+        'series': trend_series(start, end, product_id),
+        'days': days,
+        'ranges': TREND_RANGES,
+        'product_id': product_id,
+        'products': reference.products(),
+        'refreshed_at': last_refreshed(),
+    })
+
+# --- Metrics ---
+from django.http import HttpResponse
+
+from .instrumentation import collect, metrics_authorized, render_prometheus
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+@require_safe
+def metrics(request):
+    """Request latency, SQL and template totals for every worker, in Prometheus format."""
+    if not metrics_authorized(request):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(render_prometheus(collect()), content_type=PROMETHEUS_CONTENT_TYPE)
 
 # --- Setup Admin (One-time use) ---
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
 
 def setup_admin(request):
     """Create admin user - visit /setup-admin/ once to create the admin account"""
@@ -0,0 +1,45 @@
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+# SQLite allows one writer at a time and does not queue the others fairly: a
+# job that commits batch after batch can grab the lock again before a
+# request's busy handler wakes up. Batch jobs therefore take turns through a
+# file lock shared by every process, and back off briefly after each commit.
+
+_local_lock = threading.Lock()  # flock() does not exclude threads of one process
+
+
+@contextmanager
+def batch_writer_lock():
+    """Hold the lock that lets only one batch writer run at a time."""
+    path = settings.BATCH_WRITE_LOCK
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _local_lock, open(path, 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+@contextmanager
+def batch_write(using=None):
+    """One short write transaction of a long-running batch.
+
+    Use it around each batch rather than around the whole job, so that the
+    database write lock is released between batches.
+    """
+    connection = transaction.get_connection(using)
+    committing = not connection.in_atomic_block
+    with batch_writer_lock():
+        with transaction.atomic(using=using):
+            yield
+    if committing and settings.BATCH_WRITE_PAUSE:
+        # Let requests waiting on busy_timeout in before the next batch.
+        time.sleep(settings.BATCH_WRITE_PAUSE)
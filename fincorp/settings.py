@@ -42,8 +42,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Streams CSV, ZIP and file bodies chunk by chunk when served over ASGI.
+    'crm.middleware.AsyncStreamingMiddleware',
+    # Server-Timing headers and the /metrics histograms (crm/instrumentation.py).
+    'crm.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise, wrapped so the chain stays async under ASGI.
+    'crm.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,11 +57,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if DEBUG:
+    # Logs views that exceed their query budget (crm/query_budget.py).
+    MIDDLEWARE.append('crm.middleware.QueryBudgetMiddleware')
+
 ROOT_URLCONF = 'fincorp.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders for the Server-Timing header.
+        'BACKEND': 'crm.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'crm/templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,10 +85,51 @@ WSGI_APPLICATION = 'fincorp.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Production SQLite profile. Every worker shares one database file, so each
+# connection switches to WAL (readers no longer block the writer), waits up
+# to SQLITE_BUSY_TIMEOUT_MS for the write lock instead of failing with
+# "database is locked", and takes that lock at BEGIN (transaction_mode) so
+# a read-then-write transaction never has to upgrade its lock midway.
+#
+# Connections persist for CONN_MAX_AGE seconds under WSGI and in management
+# commands such as run_jobs, where one thread serves request after request.
+# Under ASGI (gunicorn.conf.py) Django runs each request's sync code in a
+# thread of its own, so a kept connection is never reused and only lingers
+# until its thread is collected; deployments there set CONN_MAX_AGE=0 and
+# pay one SQLite open (a file open plus the pragmas) per request instead.
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 20000))
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+    'cache_size': -20000,  # KiB, i.e. ~20 MB of page cache per connection
+    'mmap_size': 134217728,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+        },
+    }
+}
+
+
+# Cache
+# Shared between gunicorn workers so cached snapshots and version counters
+# stay consistent across processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / '.cache')),
     }
 }
 
@@ -121,6 +172,37 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Uploaded files (documents, job inputs and outputs)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
+
+# Let the web server send document downloads: 'X-Sendfile' (Apache, lighttpd)
+# passes the file path, 'X-Accel-Redirect' (nginx) an internal location that
+# maps DOCUMENT_SENDFILE_PREFIX onto MEDIA_ROOT. Empty streams from Django.
+DOCUMENT_SENDFILE_HEADER = os.environ.get('DOCUMENT_SENDFILE_HEADER', '')
+DOCUMENT_SENDFILE_PREFIX = os.environ.get('DOCUMENT_SENDFILE_PREFIX', '/protected-media/')
+
+# New applications without a banker (imports, the application form) are
+# assigned to employees with these designations: 'least_loaded' picks the one
+# with the fewest open applications, 'round_robin' rotates through them.
+ASSIGNMENT_DESIGNATIONS = ['Loan Officer', 'Sales Executive']
+ASSIGNMENT_STRATEGY = os.environ.get('ASSIGNMENT_STRATEGY', 'least_loaded')
+
+# Long write batches (imports, rollup and stats rebuilds) run one at a time
+# across all processes, committing in short transactions and pausing between
+# them so interactive requests waiting on the write lock get a turn.
+BATCH_WRITE_LOCK = os.environ.get('BATCH_WRITE_LOCK', str(BASE_DIR / '.cache' / 'batch-write.lock'))
+BATCH_WRITE_PAUSE = float(os.environ.get('BATCH_WRITE_PAUSE', 0.05))
+
+# Request latency histograms, one file per process, summed at /metrics.
+# Only staff may read it, unless METRICS_TOKEN is set; then scrapers send
+# "Authorization: Bearer <token>" instead.
+METRICS_DIR = os.environ.get('METRICS_DIR', str(BASE_DIR / '.cache' / 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,41 @@
+"""Gunicorn settings for serving FinCorp CRM over ASGI.
+
+    gunicorn fincorp.asgi:application -c gunicorn.conf.py
+
+Each worker process runs an asyncio event loop (uvicorn), so while one
+request awaits its dashboard queries or streams a large export, the same
+worker keeps serving other clients. Synchronous views still work; Django
+runs them in a thread.
+
+Run with CONN_MAX_AGE=0. Django's persistent connections belong to the
+thread that opened them, and under ASGI every request's sync code runs in a
+fresh thread, so a kept connection is never handed to another request; it
+just stays open until the thread goes away. Opening a SQLite connection is
+cheap, so closing it at the end of each request costs little.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+# Exports and ZIP bundles may stream for a while; uvicorn workers keep
+# heartbeating during a request, so this only catches a hung worker.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to cap memory growth.
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+
+
+def child_exit(server, worker):
+    # Fold the worker's /metrics totals into the aggregate before its pid can
+    # be reused; see crm.instrumentation.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fincorp.settings')
+    from crm.instrumentation import fold_exited_worker
+
+    fold_exited_worker(worker.pid)
@@ -0,0 +1,10 @@
+#!/usr/bin/env bash
+# exit on error
+set -o errexit
+
+# Background jobs (imports, exports) read uploads from MEDIA_ROOT, write
+# db.sqlite3 and bump versions in the file cache, so they run on this
+# instance, next to gunicorn. The loop restarts run_jobs if it exits.
+(while true; do python manage.py run_jobs --processes 1 || true; sleep 5; done) &
+
+exec gunicorn fincorp.asgi:application -c gunicorn.conf.py
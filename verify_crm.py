@@ -1,46 +1,74 @@
+"""Smoke-test the conversion flow against the configured database.
+
+Creates a banker, a product and an application, converts the application
+and checks that a Disbursement was created and EmployeeStats followed.
+Everything runs in one transaction that is rolled back, so the database is
+left as it was. Exits non-zero on failure.
+"""
 import os
+import sys
+
 import django
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sales_crm.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fincorp.settings')
 django.setup()
 
-from crm.models import Employee, Lead, Sale
+from decimal import Decimal
+
+from django.db import transaction
+
+from crm.models import Disbursement, Employee, EmployeeStats, LoanApplication, LoanProduct
+
+
+class Rollback(Exception):
+    pass
+
 
 def verify():
     print("Verifying CRM Logic...")
-    
-    # 1. Create Employee
-    emp, created = Employee.objects.get_or_create(email="john@example.com", defaults={'name': "John Doe", 'commission_percentage': 10.0})
-    if not created:
-        print(f"Using existing Employee: {emp}")
+    failures = []
+
+    # 1. Create banker and product
+    emp = Employee.objects.create(name="Verify Banker", email="verify.banker@fincorp.example", designation="Loan Officer")
+    product = LoanProduct.objects.create(name="Personal Loan", min_amount=10000, max_amount=500000)
+    print(f"Created Employee: {emp}")
+
+    # 2. Create application
+    app = LoanApplication.objects.create(name="Verify Applicant", loan_type=product, assigned_to=emp, amount=Decimal('150000'))
+    print(f"Created Application: {app} ({app.status})")
+
+    # 3. Convert it
+    app.status = 'Converted'
+    app.save()
+
+    # Check the disbursement
+    disbursement = Disbursement.objects.filter(application=app).first()
+    if disbursement is None:
+        failures.append("Disbursement not created on conversion.")
     else:
-        print(f"Created Employee: {emp}")
-    
-    # 2. Create Lead
-    lead = Lead.objects.create(title="Big Corp Deal", assigned_to=emp, value=1000.00, status="New")
-    print(f"Created Lead: {lead}")
-    
-    # 3. Convert to Won
-    lead.status = 'Won'
-    lead.save()
-    
-    # Check if Sale created
-    try:
-        sale = Sale.objects.get(lead=lead)
-        print(f"Sale created: {sale}")
-        print(f"Commission Earned: {sale.commission_earned}")
-        
-        expected_commission = 1000.00 * 0.10
-        if float(sale.commission_earned) == expected_commission:
-            print("SUCCESS: Commission calculation correct!")
-        else:
-            print(f"FAILURE: Commission mismatch. Expected {expected_commission}, got {sale.commission_earned}")
-            
-    except Sale.DoesNotExist:
-        print("FAILURE: Sale not created automatically.")
-
-    # 4. Check Dashboard logic (simple count)
-    print(f"Total Sales Count: {Sale.objects.count()}")
+        print(f"Disbursement created: {disbursement.amount} by {disbursement.banker}")
+        if disbursement.amount != app.amount or disbursement.product_id != product.pk:
+            failures.append(f"Disbursement mismatch: {disbursement.amount} for product {disbursement.product_id}")
+
+    # 4. Check the banker's stats
+    stats = EmployeeStats.objects.get(employee=emp)
+    if stats.converted_count != 1 or stats.new_count != 0 or stats.disbursed_total != app.amount:
+        failures.append(
+            f"EmployeeStats mismatch: converted={stats.converted_count}, new={stats.new_count}, "
+            f"disbursed={stats.disbursed_total}"
+        )
+    return failures
+
 
 if __name__ == '__main__':
-    verify()
+    try:
+        with transaction.atomic():
+            failures = verify()
+            raise Rollback
+    except Rollback:
+        pass
+    for failure in failures:
+        print(f"FAILURE: {failure}")
+    if failures:
+        sys.exit(1)
+    print("SUCCESS: conversion creates the disbursement and updates stats (changes rolled back)")